@@ -1,132 +1,377 @@
 from fastapi import UploadFile
+from typing import Callable, Optional
 import os
+import tempfile
+import threading
+import time
 from src.utility.logger import get_logger
-from src.utility.data_loader import process_and_generate_embeddings
-from src.utility.vector_database import initialize_database, insert_product
+from src.utility.model_registry import model_registry, EMBEDDING_MODEL
+from src.utility.vector_database import initialize_database, insert_products, save_vector_store
+from src.utility.bm25_search import add_documents, mark_ingest, payload_text
+from src.utility.gazetteer import normalize_term
+from src.utility.metrics import INGEST_BATCH_SECONDS, INGEST_PRODUCTS, INGEST_STAGE_SECONDS
+from src.utility.dedup import DEDUP_ENABLED, near_duplicates
+from src.controllers.search_controller import schedule_search_rebuild
 
 logger = get_logger(__name__)
 
+OFFER_SIDES = ["_left", "_right"]
+PAYLOAD_FIELDS = ["title", "description", "brand", "category"]
+# Typed, indexed payload fields of each offer (see vector_store.PAYLOAD_INDEXES)
+TYPED_FIELDS = ["price", "brand", "category"]
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or tempfile.gettempdir()
+
 async def save_temp_file(file: UploadFile) -> str:
     """
-    Save uploaded file temporarily.
-    
+    Stream an uploaded file to a unique temporary file.
+
+    The upload is copied in chunks of UPLOAD_CHUNK_SIZE bytes, so memory use
+    does not depend on the file size, and concurrent uploads never share a path.
+
     Args:
         file: Uploaded file object
-        
+
     Returns:
         Path to the temporary file
     """
-    contents = await file.read()
-    temp_file = "temp_products.csv"
-    with open(temp_file, "wb") as f:
-        f.write(contents)
+    fd, temp_file = tempfile.mkstemp(prefix="products_", suffix=".csv", dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
+    except Exception:
+        cleanup_temp_file(temp_file)
+        raise
     return temp_file
 
-def process_and_insert_products(data) -> dict:
+def _parse_prices(values):
     """
-    Process product data and insert into database.
+    Parse WDC price strings ('"USD 1,299.00"@en', '349.99', ...) into floats.
+
+    Thousands separators are dropped; unparseable or missing prices are NaN.
+    """
+    import pandas as pd
+
+    text = values.astype("string").str.replace(",", "", regex=False)
+    amounts = text.str.extract(r"(\d+(?:\.\d+)?)", expand=False)
+    return pd.to_numeric(amounts, errors="coerce").to_numpy(dtype=float)
+
+
+def _typed_fields(data, side: str) -> dict:
+    """Typed payload fields (numeric price, normalized brand and category) of one offer side."""
+    import numpy as np
+
+    n_rows = len(data)
+    fields = {}
+    price_col = f"price{side}"
+    fields["price"] = _parse_prices(data[price_col]) if price_col in data.columns else np.full(n_rows, np.nan)
+    for field in ("brand", "category"):
+        column = f"{field}{side}"
+        if column in data.columns:
+            # Same normalization as the gazetteer the query filters come from
+            fields[field] = data[column].map(normalize_term, na_action="ignore").fillna("").to_numpy(dtype=object)
+        else:
+            fields[field] = np.full(n_rows, "", dtype=object)
+    return fields
+
+
+def _typed_payload(offer) -> dict:
+    """Payload entries of an offer's typed fields, omitting missing values."""
+    payload = {}
+    if offer["price"] == offer["price"]:  # not NaN
+        payload["price"] = float(offer["price"])
+    for field in ("brand", "category"):
+        if offer[field]:
+            payload[field] = offer[field]
+    return payload
+
+
+def _build_offer_frame(data) -> tuple:
+    """
+    Flatten product pairs into one row per offer using column operations.
+
+    Offers keep the order the row-by-row import used to visit them (left offer
+    before right offer of the same row), so first-wins pair_id dedup still
+    picks the same product.
 
     Args:
-        data: Either a file path (str) or a pandas DataFrame containing product data
+        data: pandas DataFrame of WDC-style product pairs
 
     Returns:
-        Dictionary containing processing results
+        Tuple of (offers DataFrame with row, product_id, pair_id, merged_text
+        and the typed fields, DataFrame of the stringified payload fields of
+        every row)
+    """
+    import numpy as np
+    import pandas as pd
+
+    n_rows = len(data)
+
+    # str() every field the same way the payload always has ("nan", "None", ...)
+    fields = {}
+    for side in OFFER_SIDES:
+        for field in PAYLOAD_FIELDS:
+            column = f"{field}{side}"
+            if column in data.columns:
+                fields[column] = data[column].to_numpy(dtype=object).astype(str).astype(object)
+            else:
+                fields[column] = np.full(n_rows, "", dtype=object)
+    columns = pd.DataFrame(fields)
+
+    if "pair_id" in data.columns:
+        pair_ids = data["pair_id"].to_numpy(dtype=object)
+    else:
+        pair_ids = np.full(n_rows, "", dtype=object)
+
+    offers = []
+    for order, side in enumerate(OFFER_SIDES):
+        id_col = f"id{side}"
+        if id_col not in data.columns:
+            continue
+        merged_text = columns[f"title{side}"]
+        for field in PAYLOAD_FIELDS[1:]:
+            merged_text = merged_text + " " + columns[f"{field}{side}"]
+        offers.append(pd.DataFrame({
+            "row": np.arange(n_rows),
+            "order": order,
+            "product_id": pd.to_numeric(data[id_col], errors="coerce").to_numpy(),
+            "pair_id": pair_ids,
+            "merged_text": merged_text.to_numpy(),
+            **_typed_fields(data, side),
+        }))
+
+    if not offers:
+        return pd.DataFrame(columns=["row", "order", "product_id", "pair_id", "merged_text"] + TYPED_FIELDS), columns
+
+    offers = pd.concat(offers, ignore_index=True)
+    offers = offers.sort_values(["row", "order"], kind="mergesort", ignore_index=True)
+    return offers, columns
+
+
+def _iter_row_windows(data, window_size: int):
+    """
+    Yield fixed-size row windows of the product data.
+
+    CSV files are parsed with a chunked reader, so only one window of rows is
+    held in memory at a time regardless of the file size.
+
+    Args:
+        data: Either a file path (str) or a pandas DataFrame containing product data
+        window_size: Number of rows per window
+
+    Yields:
+        pandas DataFrame windows
     """
     import pandas as pd
-    from src.utility.embedding_model import EmbeddingModel
 
-    # If data is a file path, load it
     if isinstance(data, str):
         logger.info(f"Processing uploaded CSV file: {data}")
-        data = pd.read_csv(data)
+        # Keep pair_id as text so every chunk dedups on the same values
+        yield from pd.read_csv(data, chunksize=window_size, dtype={"pair_id": object})
     else:
         logger.info("Processing DataFrame")
+        for start in range(0, len(data), window_size):
+            yield data.iloc[start:start + window_size]
+
+
+def _select_offers(offers, inserted_pair_ids: set):
+    """
+    Drop offers without an ID and keep only the first offer per pair_id.
+
+    Pair_ids already inserted earlier in this import session are skipped.
+    Missing pair_ids never compare equal, so they are never deduplicated.
+    """
+    # Offers without an ID are skipped, as before
+    skipped = offers["product_id"].isna()
+    if skipped.any():
+        logger.debug(f"Skipping {int(skipped.sum())} offers without an ID")
+    offers = offers[~skipped]
+
+    has_pair_id = offers["pair_id"].notna()
+    pair_ids = offers["pair_id"].where(has_pair_id)
+    duplicates = has_pair_id & (pair_ids.duplicated(keep="first") | pair_ids.isin(inserted_pair_ids))
+    return offers[~duplicates]
+
+
+def count_csv_rows(file_path: str) -> int:
+    """
+    Estimate the number of data rows of a CSV file by counting newlines.
+
+    Quoted fields spanning several lines make this an upper bound; it is only
+    used for progress reporting.
+    """
+    lines = 0
+    with open(file_path, "rb") as f:
+        while True:
+            block = f.read(UPLOAD_CHUNK_SIZE)
+            if not block:
+                break
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+
+def _add_to_lexical_index(product_ids: list, payloads: list):
+    """Make freshly upserted products searchable by BM25 right away."""
+    try:
+        texts = [payload_text(payload) for payload in payloads]
+        keep = [i for i, text in enumerate(texts) if text]
+        add_documents(
+            [texts[i] for i in keep],
+            [payloads[i] for i in keep],
+            [product_ids[i] for i in keep],
+        )
+    except Exception as e:
+        logger.warning(f"Failed to add {len(product_ids)} products to the BM25 index: {e}")
+        # The index is missing these products until it is rebuilt from the collection
+        schedule_search_rebuild()
 
+
+def process_and_insert_products(
+    data,
+    batch_size: int = EMBED_BATCH_SIZE,
+    limit: Optional[int] = None,
+    progress_callback: Optional[Callable[[dict], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Process product data and insert into database.
+
+    Rows are read in windows of `batch_size`; the offers of each window are
+    embedded with one batched encode and written with one upsert, so peak
+    memory does not grow with the size of the input. Each batch's stages are
+    recorded in the ingestion histograms.
+
+    Near-duplicate offers (MinHash/LSH over the offer text against the whole
+    catalog, plus embedding cosine within the batch) are clustered before
+    the upsert; every payload records its cluster's "canonical_id", which
+    search uses to show each cluster once. Duplicates are still upserted, so
+    each offer keeps its own payload; the near-duplicate index is saved at
+    the end of the import.
+
+    Args:
+        data: Either a file path (str) or a pandas DataFrame containing product data
+        batch_size: Number of rows embedded and upserted per batch
+        limit: Optional maximum number of products to import
+        progress_callback: Optional callable receiving the running counters
+            after every window
+        cancel_event: Optional event; processing stops before the next window
+            once it is set
+
+    Returns:
+        Dictionary containing processing results
+    """
     # Initialize Qdrant database
     initialize_database()
-    model = EmbeddingModel()
+    # Any saved lexical snapshot is stale from the first upsert on
+    mark_ingest(complete=False)
+    # Shared process-wide model; held for the whole import so every vector of
+    # the run comes from the same model version
+    model = model_registry.get(EMBEDDING_MODEL)
 
     # Track already inserted pair_ids to avoid duplicates in this import session
     inserted_pair_ids = set()
 
-    # Process each offer in each pair
     success_count = 0
     total_products = 0
-    imported_products = 0
+    processed_rows = 0
+    near_duplicate_count = 0
+    errors = []
 
-    logger.info(f"Starting to process {len(data)} rows")
+    def report_progress():
+        if progress_callback:
+            progress_callback({
+                "rows_processed": processed_rows,
+                "total_products": total_products,
+                "successful_inserts": success_count,
+                "errors": errors,
+            })
 
-    for idx, row in data.iterrows():
-        # if imported_products >= 10:
-        #     break
+    for window in _iter_row_windows(data, batch_size):
+        if limit is not None and success_count >= limit:
+            break
+        if cancel_event is not None and cancel_event.is_set():
+            logger.info(f"Import cancelled after {processed_rows} rows")
+            break
 
-        # Extract both left and right fields for payload
-        fields = {}
-        for side in ["_left", "_right"]:
-            fields[f"title{side}"] = str(row.get(f"title{side}", ""))
-            fields[f"description{side}"] = str(row.get(f"description{side}", ""))
-            fields[f"brand{side}"] = str(row.get(f"brand{side}", ""))
-            fields[f"category{side}"] = str(row.get(f"category{side}", ""))
+        batch_started = time.perf_counter()
+        offers, columns = _build_offer_frame(window)
+        offers = _select_offers(offers, inserted_pair_ids)
+        if limit is not None:
+            offers = offers.iloc[:limit - success_count]
+        processed_rows += len(window)
+        if offers.empty:
+            report_progress()
+            continue
 
-        for offer_prefix in ["_left", "_right"]:
-            if imported_products >= 10:
-                break
-            id_col = f"id{offer_prefix}"
-            if id_col not in row or pd.isna(row[id_col]):
-                logger.debug(f"Skipping row {idx} with prefix {offer_prefix}: No ID")
-                continue
-
-            product_id = int(row[id_col])
-            title = fields[f"title{offer_prefix}"]
-            description = fields[f"description{offer_prefix}"]
-            brand = fields[f"brand{offer_prefix}"]
-            category = fields[f"category{offer_prefix}"]
-
-            logger.debug(f"Processing product {product_id} with title: {title}")
-
-            merged_text = f"{title} {description} {brand} {category}"
-            embedding = model.get_embedding(merged_text)
-
-            # Payload includes both left and right data
-            payload = {
-                "pair_id": row.get("pair_id", ""),
-                "title_left": fields["title_left"],
-                "title_right": fields["title_right"],
-                "description_left": fields["description_left"],
-                "description_right": fields["description_right"],
-                "brand_left": fields["brand_left"],
-                "brand_right": fields["brand_right"],
-                "category_left": fields["category_left"],
-                "category_right": fields["category_right"]
-            }
-
-            pair_id = payload["pair_id"]
-            if pair_id in inserted_pair_ids:
-                logger.debug(f"Skipping duplicate pair_id {pair_id}")
-                continue
-
-            try:
-                insert_product(
-                    product_id=product_id,
-                    description=merged_text,
-                    embedding=embedding,
-                    payload=payload
-                )
-                inserted_pair_ids.add(pair_id)
-                success_count += 1
-                imported_products += 1
-                logger.debug(f"Successfully inserted product {product_id}")
-            except Exception as e:
-                logger.error(f"Failed to insert product {product_id}: {e}")
-            total_products += 1
+        product_ids = offers["product_id"].astype("int64").tolist()
+        texts = offers["merged_text"].tolist()
+        pair_ids = offers["pair_id"].tolist()
+
+        # Payload includes both left and right data, plus the offer's own typed fields
+        payloads = columns.iloc[offers["row"].to_numpy()].to_dict("records")
+        typed = offers[TYPED_FIELDS].to_dict("records")
+        for payload, pair_id, offer in zip(payloads, pair_ids, typed):
+            payload["pair_id"] = pair_id
+            payload.update(_typed_payload(offer))
+        stage_started = time.perf_counter()
+        INGEST_STAGE_SECONDS.observe(stage_started - batch_started, "prepare")
+
+        try:
+            embeddings = model.get_embeddings(texts)
+            now = time.perf_counter()
+            INGEST_STAGE_SECONDS.observe(now - stage_started, "embedding")
+            stage_started = now
+            if DEDUP_ENABLED:
+                canonical_ids = near_duplicates.assign(product_ids, texts, embeddings)
+                for payload, product_id, canonical_id in zip(payloads, product_ids, canonical_ids):
+                    payload["canonical_id"] = canonical_id
+                    near_duplicate_count += canonical_id != product_id
+                now = time.perf_counter()
+                INGEST_STAGE_SECONDS.observe(now - stage_started, "dedup")
+                stage_started = now
+            insert_products(product_ids, embeddings, payloads)
+            now = time.perf_counter()
+            INGEST_STAGE_SECONDS.observe(now - stage_started, "upsert")
+            stage_started = now
+            inserted_pair_ids.update(pair_ids)
+            success_count += len(product_ids)
+            _add_to_lexical_index(product_ids, payloads)
+            INGEST_STAGE_SECONDS.observe(time.perf_counter() - stage_started, "bm25_add")
+            INGEST_PRODUCTS.inc("inserted", amount=len(product_ids))
+        except Exception as e:
+            INGEST_PRODUCTS.inc("failed", amount=len(product_ids))
+            logger.error(f"Failed to insert batch ending at row {processed_rows}: {e}")
+            errors.append(f"Batch ending at row {processed_rows}: {e}")
+        total_products += len(product_ids)
+        INGEST_BATCH_SECONDS.observe(time.perf_counter() - batch_started)
+
+        report_progress()
+
+    logger.info(
+        f"Processed {processed_rows} rows, inserted {success_count} of {total_products} products "
+        f"({near_duplicate_count} near-duplicates)"
+    )
+    save_vector_store()
+    if DEDUP_ENABLED:
+        try:
+            near_duplicates.save()
+        except Exception as e:
+            # The next import is only clustered against the offers of this process
+            logger.warning(f"Failed to save the near-duplicate index: {e}")
+    mark_ingest(complete=True)
 
     return {
         "total_products": total_products,
-        "successful_inserts": success_count
+        "successful_inserts": success_count,
+        "near_duplicates": near_duplicate_count,
     }
 
 
-
 def cleanup_temp_file(file_path: str):
     """
     Clean up temporary file after processing.
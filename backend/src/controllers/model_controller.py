@@ -0,0 +1,41 @@
+from typing import Any, Dict, Optional
+from src.utility.logger import get_logger
+from src.utility.model_registry import model_registry, EMBEDDING_MODEL, INTENT_MODEL
+
+logger = get_logger(__name__)
+
+
+def get_models_status() -> Dict[str, Any]:
+    """State, version and memory use of every registered model."""
+    return model_registry.status()
+
+
+def swap_model(name: str, source: Optional[str] = None, backend: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load a new version of a model and swap it in without a restart.
+
+    Args:
+        name: Registered model name ("embedding_model" or "intent_extractor")
+        source: Model name or local path of the new version; defaults to the configured one
+        backend: Embedding backend ("torch" or "onnx"), embedding model only
+
+    Returns:
+        Description of the model now serving
+
+    Raises:
+        KeyError: If no model is registered under `name`
+    """
+    if name == EMBEDDING_MODEL:
+        from src.utility.embedding_model import EmbeddingModel, EMBEDDING_BACKEND
+
+        # The new version must embed into the same vector space as the collection
+        factory = lambda: EmbeddingModel(backend=backend or EMBEDDING_BACKEND, model_name_or_path=source)
+    elif name == INTENT_MODEL:
+        from src.utility.intent_extractor import IntentExtractor
+
+        factory = lambda: IntentExtractor(model_name=source) if source else IntentExtractor()
+    else:
+        raise KeyError(f"Unknown model '{name}'")
+
+    logger.info(f"Swapping model '{name}' to source={source}, backend={backend}")
+    return model_registry.swap(name, factory)
@@ -1,205 +1,485 @@
-from typing import Optional, List, Dict, Any
-from src.utility.logger import get_logger
-from src.utility.embedding_model import EmbeddingModel
-from src.utility.vector_database import search_similar_products, client
-from src.utility.bm25_search import BM25_INSTANCE, search_products_bm25, initialize_bm25
-from src.utility.intent_extractor import IntentExtractor
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+from src.utility.logger import ContextThreadPoolExecutor, get_logger
+from src.utility.embedding_service import EmbeddingService
+from src.utility.vector_database import (
+    initialize_database, search_similar_products_batch, search_similar_products_async,
+    scroll_products, count_products, VECTOR_STORE,
+)
+from src.utility.bm25_search import (
+    search_products_bm25, search_products_bm25_batch, rebuild_bm25, payload_text, install_snapshot, load_snapshot, save_snapshot,
+    indexed_payloads, read_ingest_stamp, BM25_SNAPSHOT_DIR, is_initialized as bm25_is_initialized,
+)
+from src.utility.model_registry import embedding_model, intent_model
+from src.utility.query_cache import query_cache
+from src.utility.fusion import fuse_results, FUSION_METHOD
+from src.utility.vector_store import matches_filters
+from src.utility.dedup import DEDUP_ENABLED, collapse_duplicates
+from src.utility.readiness import ComponentUnavailable, LazyComponent, readiness, LOADING, FAILED
+from src.utility.metrics import SEARCH_ERRORS, observe_timings
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
 import numpy as np
 import os
+import threading
+import time
 
 logger = get_logger(__name__)
-model = EmbeddingModel()
-intent_extractor = IntentExtractor()
+# Query embeddings go through the shared model registry; a swapped model is
+# picked up by the next batch
+embedding_service = EmbeddingService(embedding_model.get)
 
-def initialize_search():
+# Worker pool for the search legs that run alongside the request thread;
+# tasks inherit the request's logging context
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "8"))
+search_executor = ContextThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+# Candidates fetched from each leg before hybrid fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "100"))
+# Queries processed together by batch search; results stream out per chunk
+BATCH_SEARCH_CHUNK = int(os.getenv("BATCH_SEARCH_CHUNK", "64"))
+
+# Page size used when scrolling the whole collection into the lexical index
+SCROLL_PAGE_SIZE = int(os.getenv("SCROLL_PAGE_SIZE", "1000"))
+
+# Single background worker for full index rebuilds
+rebuild_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-rebuild")
+_rebuild_lock = threading.Lock()
+_rebuild_queued = False
+_refresh_queued = False
+
+def _scroll_catalog() -> Tuple[List[str], List[dict], List[Any]]:
     """
-    Initialize search components.
+    Page through the entire vector store and build the BM25 documents.
+
+    Returns:
+        (corpus, payloads, product_ids) of every product with searchable text
     """
-    try:
-        # Load product data from Qdrant
-        collection_name = os.getenv("QDRANT_COLLECTION", "ecommerce")
-        points, _ = client.scroll(
-            collection_name=collection_name,
-            limit=1000  # Adjust limit based on your dataset size
-        )
-        
-        # Extract text data for BM25
-        corpus = []
-        payloads = []
+    corpus = []
+    payloads = []
+    product_ids = []
+    offset = None
+    while True:
+        points, offset = scroll_products(limit=SCROLL_PAGE_SIZE, offset=offset)
         for point in points:
-            fields = []
-            for key in [
-                "title_left", "title_right",
-                "description_left", "description_right",
-                "brand_left", "brand_right",
-                "category_left", "category_right"
-            ]:
-                value = point.payload.get(key, "")
-                if value and value != "None":
-                    fields.append(str(value))
-            text = " ".join(fields).strip()
+            text = payload_text(point.payload)
             if text:
                 corpus.append(text)
                 payloads.append(point.payload)
-        
+                product_ids.append(point.id)
+        if offset is None:
+            break
+    return corpus, payloads, product_ids
+
+def _catalog_fingerprint() -> Dict[str, Any]:
+    """Describe the collection contents a lexical index snapshot is valid for."""
+    collection_name = os.getenv("QDRANT_COLLECTION", "ecommerce")
+    return {
+        "collection": collection_name,
+        "store": VECTOR_STORE,
+        "points_count": count_products(),
+        # Changes on every import, including ones that only replace products
+        "ingest": read_ingest_stamp(BM25_SNAPSHOT_DIR),
+    }
+
+def initialize_search(use_snapshot: bool = True):
+    """
+    Initialize search components.
+
+    Loads the persisted BM25 snapshot when its fingerprint still matches the
+    collection; otherwise builds the index from every product in the
+    collection, swaps it in atomically (queries keep using the previous index
+    until it is ready) and saves a new snapshot.
+
+    Args:
+        use_snapshot: Try the on-disk snapshot before rebuilding
+    """
+    def load_documents():
+        corpus, payloads, product_ids = _scroll_catalog()
+
+        # Rebuild the intent gazetteer from the catalog vocabulary
+        intent_model.get().update_catalog(payloads)
+        query_cache.clear_intents()
+
         if not corpus:
-            logger.warning("No documents found to initialize BM25. Skipping BM25 initialization.")
-            return
-        
-        # Initialize BM25 with the corpus and payloads
-        initialize_bm25(corpus, payloads)
-        logger.info("BM25 initialized successfully with %d documents", len(corpus))
-        
+            logger.warning("No documents found to initialize BM25. Starting with an empty index.")
+        return corpus, payloads, product_ids
+
+    try:
+        fingerprint = _catalog_fingerprint()
+        ingest = fingerprint["ingest"]
+        # An import that never finished may have upserted products after any snapshot was saved
+        if use_snapshot and (ingest is None or ingest.get("complete")):
+            snapshot = load_snapshot(BM25_SNAPSHOT_DIR, fingerprint)
+            if snapshot is not None:
+                intent_model.get().update_catalog(snapshot.payloads)
+                query_cache.clear_intents()
+                install_snapshot(snapshot)
+                return
+
+        snapshot = rebuild_bm25(load_documents)
     except Exception as e:
-        logger.error(f"Error initializing search: {e}")
+        logger.error("Error initializing search: %s", e)
         raise
 
-def bm25_search_with_lazy_init(query: str, top_k: int = 5):
-    if BM25_INSTANCE is None:
-        initialize_search()
-    return search_products_bm25(query, top_k=top_k)
+    try:
+        save_snapshot(BM25_SNAPSHOT_DIR, fingerprint, snapshot)
+    except Exception as e:
+        logger.warning("Failed to save BM25 snapshot: %s", e)
 
-def semantic_search(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+vector_store = readiness.register(LazyComponent("vector_store", initialize_database))
+lexical_index = readiness.register(
+    LazyComponent("lexical_index", initialize_search, depends_on=[vector_store, intent_model])
+)
+
+def _run_scheduled_rebuild():
+    global _rebuild_queued
+    with _rebuild_lock:
+        _rebuild_queued = False
+    try:
+        # The in-memory index may be ahead of the snapshot, so always rescan
+        initialize_search(use_snapshot=False)
+    except Exception:
+        # Already logged; the previous index stays in service
+        pass
+
+def schedule_search_rebuild():
     """
-    Perform semantic search using embeddings, analyzing intent first.
+    Rebuild the search indexes in the background.
+
+    Requests made while a rebuild is already queued are coalesced into it.
     """
+    global _rebuild_queued
+    with _rebuild_lock:
+        if _rebuild_queued:
+            return
+        _rebuild_queued = True
+    rebuild_executor.submit(_run_scheduled_rebuild)
+
+def _run_scheduled_refresh():
+    global _refresh_queued
+    with _rebuild_lock:
+        _refresh_queued = False
+    if not bm25_is_initialized():
+        _run_scheduled_rebuild()
+        return
     try:
-        # 1. Extract intent
-        intent = intent_extractor.extract_intent_components(query)
-        logger.info(f"Intent extracted: {intent}")
-
-        # 2. Continue with embedding and search
-        logger.info(f"Performing semantic search for query: {query}")
-        query_embedding = model.get_embedding(query)
-        logger.info("Generated embedding for the query.")
-        
-        results = search_similar_products(query_embedding, top_k=top_k)
-        logger.info(f"Semantic search completed successfully. Found {len(results)} results")
-
-        # 3. Intent-based filtering (demo: filter by constraints, e.g., price)
-        filtered_results = results
-        if intent.get("constraints"):
-            constraints = intent["constraints"]
-            filtered_results = []
-            for result in results:
-                payload = result.get("payload", {})
-                # Example: filter for price constraints like 'under $500'
-                for constraint in constraints:
-                    if "under $" in constraint.lower():
-                        try:
-                            max_price = float(constraint.lower().split("under $")[-1].replace(",", "").strip())
-                            price = float(payload.get("price", 0))
-                            if price > 0 and price < max_price:
-                                filtered_results.append(result)
-                        except Exception:
-                            continue
-            # If no results matched constraints, fallback to original results
-            if not filtered_results:
-                filtered_results = results
-        
-        # Attach intent to response for transparency
-        return {"intent": intent, "results": filtered_results}
-        
+        intent_model.get().update_catalog(indexed_payloads())
+        query_cache.clear_intents()
+        save_snapshot(BM25_SNAPSHOT_DIR, _catalog_fingerprint())
     except Exception as e:
-        logger.error(f"Error during semantic search: {e}")
-        raise
+        logger.warning("Failed to refresh search after import: %s", e)
+
+def schedule_search_refresh():
+    """
+    Bring search up to date with a finished import in the background.
+
+    Imported products are already in the lexical index through incremental
+    adds, so only the intent gazetteer is rebuilt from the indexed payloads
+    and the index is saved as the new snapshot. Without an index yet, a full
+    rebuild runs instead.
+    """
+    global _refresh_queued
+    with _rebuild_lock:
+        if _refresh_queued:
+            return
+        _refresh_queued = True
+    rebuild_executor.submit(_run_scheduled_refresh)
+
+def bm25_search_with_lazy_init(query: str, top_k: int = 5):
+    # Never block a query on an index build; BM25 contributes nothing until ready
+    if not bm25_is_initialized():
+        # A failed index is reloaded by its own background retry
+        if lexical_index.state not in (LOADING, FAILED):
+            schedule_search_rebuild()
+        return []
+    return search_products_bm25(query, top_k=top_k)
+
+def _timed(timings: Optional[Dict[str, float]], stage: str, fn, *args, **kwargs):
+    """Call `fn` and record its wall time in milliseconds under `stage`."""
+    start = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        if timings is not None:
+            timings[stage] = (time.perf_counter() - start) * 1000.0
+
+async def _timed_async(timings: Optional[Dict[str, float]], stage: str, awaitable):
+    """Await `awaitable` and record its wall time in milliseconds under `stage`."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        if timings is not None:
+            timings[stage] = (time.perf_counter() - start) * 1000.0
+
+def _extract_intent(query: str) -> Dict[str, Any]:
+    # Head queries are served from the query cache without model inference
+    intent = query_cache.get_intent(query, lambda text: intent_model.get().extract_intent_components(text))
+    logger.info("Intent extracted: %s", intent)
+    return intent
+
+async def _filtered_vector_search_async(
+    query_embedding,
+    top_k: int,
+    filters: Optional[Dict[str, Any]],
+    timings: Optional[Dict[str, float]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+    """
+    Search the vector store with the intent filters pushed down.
+
+    If nothing in the catalog satisfies the filters, the search is repeated
+    without them rather than returning an empty page; callers mark those
+    results with "filters_relaxed".
+
+    Returns:
+        (results, filters that were actually applied or None)
+    """
+    filters = filters or None
+    results = await _timed_async(
+        timings, "vector_search", search_similar_products_async(query_embedding, top_k=top_k, filters=filters)
+    )
+    if filters and not results:
+        logger.info("No products match filters %s; falling back to unfiltered search", filters)
+        filters = None
+        results = await _timed_async(
+            timings, "vector_search_unfiltered", search_similar_products_async(query_embedding, top_k=top_k)
+        )
+    logger.info("Semantic search completed successfully. Found %d results", len(results))
+    return results, filters
 
 def bm25_search(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """
     Perform BM25 search.
     """
     try:
-        logger.info(f"Performing BM25 search for query: {query}")
-        results = bm25_search_with_lazy_init(query, top_k=top_k)
-        logger.info(f"BM25 search completed successfully. Found {len(results)} results")
+        logger.info("Performing BM25 search for query: %s", query)
+        timings = {}
+        results = _timed(timings, "bm25", bm25_search_with_lazy_init, query, top_k=top_k)
+        timings["total"] = timings["bm25"]
+        observe_timings("bm25", timings)
+        logger.info("BM25 search completed successfully. Found %d results", len(results))
         
         return results
         
     except Exception as e:
-        logger.error(f"Error during BM25 search: {e}")
+        SEARCH_ERRORS.inc("bm25")
+        logger.error("Error during BM25 search: %s", e)
         raise
 
-def hybrid_search(query: str, top_k: int = 5, semantic_weight: float = 0.7) -> List[Dict[str, Any]]:
+def _record_fusion(timings: Dict[str, float], fusion_started: float, started: float):
+    now = time.perf_counter()
+    timings["fusion"] = (now - fusion_started) * 1000.0
+    timings["total"] = (now - started) * 1000.0
+
+def _filter_lexical(bm25_results: List[Dict[str, Any]], filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Same constraints as the vector leg, evaluated on the BM25 payloads
+    if not filters:
+        return bm25_results
+    return [r for r in bm25_results if matches_filters(r.get("payload", {}), filters)]
+
+def _combine_results(
+    semantic_results: List[Dict[str, Any]],
+    bm25_results: List[Dict[str, Any]],
+    top_k: int,
+    semantic_weight: float,
+    fusion: Optional[str],
+    filters_relaxed: bool = False,
+) -> List[Dict[str, Any]]:
+    # One result per near-duplicate cluster (see utility.dedup)
+    if DEDUP_ENABLED:
+        semantic_results, bm25_results = collapse_duplicates(semantic_results, bm25_results)
+
+    # If BM25 has no data, return semantic results as hybrid
+    if not bm25_results:
+        combined = [
+            {
+                "id": result["product_id"],
+                "score": result.get("score", 0.0),
+                "payload": result.get("payload", {}),
+                "source": "hybrid"
+            }
+            for result in semantic_results[:top_k]
+        ]
+    else:
+        # Both legs are keyed by product id, so overlapping products combine
+        combined = fuse_results(
+            semantic_results,
+            bm25_results,
+            top_k,
+            method=fusion or FUSION_METHOD,
+            semantic_weight=semantic_weight,
+        )
+    # The intent filters matched nothing and were dropped; say so on every result
+    if filters_relaxed:
+        for result in combined:
+            result["filters_relaxed"] = True
+    return combined
+
+
+async def hybrid_search_async(
+    query: str,
+    top_k: int = 5,
+    semantic_weight: float = 0.7,
+    timings: Optional[Dict[str, float]] = None,
+    fusion: Optional[str] = None,
+    degraded: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
     """
     Perform hybrid search combining semantic (vector) and BM25 (text) results.
     If BM25 finds no products, return only semantic results.
+
+    Each leg over-fetches HYBRID_CANDIDATES candidates; they are fused on
+    product id with weighted min-max normalization or reciprocal rank fusion
+    (`fusion`, default FUSION_METHOD). Intent constraints filter the vector
+    search inside the store and the BM25 candidates before fusion; if no
+    product satisfies them they are dropped and every result carries
+    "filters_relaxed": true.
+
+    Nothing blocks the event loop: intent extraction and BM25 run on the
+    search pool, the query is encoded by the embedding service, and the
+    vector search is awaited on the async Qdrant client, so one worker keeps
+    many searches in flight. Per-stage wall times in ms are written to
+    `timings` if given and recorded in the stage histograms.
+
+    If the vector search fails the query is answered from BM25 alone and
+    "vector_search" is appended to `degraded`, so callers can keep the
+    partial results out of the result cache.
     """
+    if timings is None:
+        timings = {}
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
     try:
-        logger.info(f"Performing hybrid search for query: {query}")
-        semantic_results = semantic_search(query, top_k=top_k)
-        bm25_results = bm25_search_with_lazy_init(query, top_k=top_k)
-
-        # Build dictionaries for fast lookup
-        bm25_dict = {r.get("id"): r for r in bm25_results if r.get("id") is not None}
-        semantic_dict = {r.get("id"): r for r in semantic_results["results"] if r.get("id") is not None}
-
-        # --- Hybrid (BM25 + Semantic) search following Qdrant/BM25 demo logic ---
-        # 1. Build BM25 score map for all valid doc ids
-        bm25_score_map = {}
-        for r in bm25_results:
-            pid = r.get("id")
-            if pid is not None:
-                bm25_score_map[pid] = float(r.get("score", 0))
-
-        # 2. Build semantic (vector) score map for all valid doc ids
-        sem_score_map = {}
-        for r in semantic_results["results"]:
-            pid = r.get("id")
-            if pid is not None:
-                sem_score_map[pid] = float(r.get("score", 0))
-
-        # 3. Normalize scores (min-max normalization for fair hybridization)
-        def min_max_norm(scores):
-            if not scores:
-                return {}
-            values = list(scores.values())
-            min_v, max_v = min(values), max(values)
-            if max_v == min_v:
-                return {k: 0.0 for k in scores}  # avoid div by zero
-            return {k: (v - min_v) / (max_v - min_v) for k, v in scores.items()}
-
-        bm25_norm = min_max_norm(bm25_score_map)
-        sem_norm = min_max_norm(sem_score_map)
-
-        # If BM25 has no data, return semantic results as hybrid
-        if not bm25_score_map:
-            logger.warning(f"semantic_results: {semantic_results}")
-            combined_results = []
-            for idx, result in enumerate(semantic_results["results"]):
-                pid = result.get("id", idx)  # fallback to index if id is missing
-                combined_results.append({
-                    "id": int(pid) if pid is not None else idx,
-                    "score": result.get("score", 0.0),
-                    "payload": result.get("payload", {}),
-                    "source": "hybrid"
-                })
-            combined_results.sort(key=lambda x: x["score"], reverse=True)
-            logger.info(f"Hybrid search (semantic-only fallback). Found {len(combined_results[:top_k])} results")
-            return combined_results[:top_k]
-
-        all_ids = set(bm25_score_map.keys()).union(set(sem_score_map.keys()))
-        alpha = semantic_weight  # user can tune this
-        combined_results = []
-        for pid in all_ids:
-            if pid is None:
-                continue
-            hybrid_score = bm25_norm.get(pid, 0.0) * (1 - alpha) + sem_norm.get(pid, 0.0) * alpha
-            # Prefer semantic payload if available, else bm25
-            payload = None
-            if pid in sem_score_map:
-                payload = semantic_dict.get(pid, {}).get("payload", {})
-            elif pid in bm25_score_map:
-                payload = bm25_dict.get(pid, {}).get("payload", {})
-            combined_results.append({
-                "id": int(pid),
-                "score": hybrid_score,
-                "payload": payload,
-                "source": "hybrid"
-            })
-        combined_results.sort(key=lambda x: x["score"], reverse=True)
-        logger.info(f"Hybrid search completed successfully. Found {len(combined_results[:top_k])} results")
-        return combined_results[:top_k]
+        logger.info("Performing hybrid search for query: %s", query)
+        intent_future = loop.run_in_executor(search_executor, _timed, timings, "intent", _extract_intent, query)
+        candidates = max(top_k, HYBRID_CANDIDATES)
+        bm25_future = loop.run_in_executor(
+            search_executor, functools.partial(_timed, timings, "bm25", bm25_search_with_lazy_init, query, top_k=candidates)
+        )
+
+        semantic_started = time.perf_counter()
+        logger.info("Performing semantic search for query: %s", query)
+        query_embedding = await _timed_async(
+            timings, "embedding", query_cache.get_embedding_async(query, embedding_service.embed_async)
+        )
+        intent = await intent_future
+        try:
+            vector_results, filters = await _filtered_vector_search_async(
+                query_embedding, candidates, intent.get("filters"), timings
+            )
+        except ComponentUnavailable:
+            raise
+        except Exception as e:
+            SEARCH_ERRORS.inc("vector_search")
+            logger.warning("Vector search failed; answering from BM25 only: %s", e)
+            if degraded is not None:
+                degraded.append("vector_search")
+            vector_results, filters = [], intent.get("filters") or None
+        filters_relaxed = bool(intent.get("filters")) and filters is None
+        timings["semantic"] = (time.perf_counter() - semantic_started) * 1000.0
+
+        bm25_results = _filter_lexical(await bm25_future, filters)
+        fusion_started = time.perf_counter()
+
+        combined_results = _combine_results(vector_results, bm25_results, top_k, semantic_weight, fusion, filters_relaxed)
+        if bm25_results:
+            logger.info("Hybrid search completed successfully. Found %d results", len(combined_results))
+        else:
+            logger.info("Hybrid search (semantic-only fallback). Found %d results", len(combined_results))
+        _record_fusion(timings, fusion_started, started)
+        observe_timings("hybrid", timings)
+        return combined_results
 
     except Exception as e:
-        logger.error(f"Error during hybrid search: {e}")
-        raise
\ No newline at end of file
+        SEARCH_ERRORS.inc("hybrid")
+        logger.error("Error during hybrid search: %s", e)
+        raise
+
+def _bm25_batch_with_lazy_init(queries: List[str], top_k: List[int]) -> List[List[Dict[str, Any]]]:
+    if not bm25_is_initialized():
+        # A failed index is reloaded by its own background retry
+        if lexical_index.state not in (LOADING, FAILED):
+            schedule_search_rebuild()
+        return [[] for _ in queries]
+    return search_products_bm25_batch(queries, top_k)
+
+def _extract_intents(queries: List[str]) -> List[Dict[str, Any]]:
+    return query_cache.get_intents(queries, lambda texts: intent_model.get().extract_intent_components_batch(texts))
+
+def _embed_queries(queries: List[str]) -> np.ndarray:
+    # Already a batch, so encode directly rather than through the micro-batcher
+    return np.stack(query_cache.get_embeddings(queries, lambda texts: embedding_model.get().get_embeddings(texts)))
+
+def _hybrid_search_chunk(requests: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Hybrid search of a chunk of queries, one batched call per stage.
+
+    Intents (gazetteer, then one NER pass) and BM25 run on the search pool
+    while the chunk is encoded; the vector store is then queried once for
+    the whole chunk. Stage timings are recorded per chunk, under operation
+    "hybrid_batch".
+    """
+    timings = {}
+    started = time.perf_counter()
+    queries = [request["query"] for request in requests]
+    candidates = [max(request["top_k"], HYBRID_CANDIDATES) for request in requests]
+    intent_future = search_executor.submit(_timed, timings, "intent", _extract_intents, queries)
+    bm25_future = search_executor.submit(_timed, timings, "bm25", _bm25_batch_with_lazy_init, queries, candidates)
+
+    embeddings = _timed(timings, "embedding", _embed_queries, queries)
+    intents = intent_future.result()
+    filters = [intent.get("filters") or None for intent in intents]
+    vector_results = _timed(timings, "vector_search", search_similar_products_batch, embeddings, candidates, filters)
+
+    # Queries whose filters match nothing fall back to an unfiltered search,
+    # marked "filters_relaxed"
+    unmatched = [index for index, query_filters in enumerate(filters) if query_filters and not vector_results[index]]
+    if unmatched:
+        retried = _timed(
+            timings, "vector_search_unfiltered",
+            search_similar_products_batch, embeddings[unmatched], [candidates[index] for index in unmatched],
+        )
+        for index, results in zip(unmatched, retried):
+            vector_results[index] = results
+            filters[index] = None
+
+    bm25_results = bm25_future.result()
+    fusion_started = time.perf_counter()
+    combined = [
+        _combine_results(
+            vector_results[index],
+            _filter_lexical(bm25_results[index], filters[index]),
+            request["top_k"],
+            request["semantic_weight"],
+            request.get("fusion"),
+            filters_relaxed=index in unmatched,
+        )
+        for index, request in enumerate(requests)
+    ]
+    _record_fusion(timings, fusion_started, started)
+    observe_timings("hybrid_batch", timings)
+    return combined
+
+def batch_hybrid_search(requests: List[Dict[str, Any]], chunk_size: int = BATCH_SEARCH_CHUNK) -> Iterator[Dict[str, Any]]:
+    """
+    Hybrid search of many queries, yielding one result per query in order.
+
+    Each request is a dict with "query", "top_k", "semantic_weight" and an
+    optional "fusion". Queries are processed in chunks of `chunk_size`, so
+    the first results are available before the whole batch is done. A
+    failing chunk yields an "error" for each of its queries instead of
+    aborting the batch.
+    """
+    for start in range(0, len(requests), chunk_size):
+        chunk = requests[start:start + chunk_size]
+        try:
+            chunk_results = _hybrid_search_chunk(chunk)
+        except Exception as e:
+            SEARCH_ERRORS.inc("hybrid_batch")
+            logger.error("Error during batch search of queries %s-%s: %s", start, start + len(chunk) - 1, e)
+            for offset, request in enumerate(chunk):
+                yield {"index": start + offset, "query": request["query"], "error": str(e)}
+            continue
+        for offset, (request, results) in enumerate(zip(chunk, chunk_results)):
+            yield {"index": start + offset, "query": request["query"], "results": results}
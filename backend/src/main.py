@@ -1,14 +1,16 @@
 # src/main.py
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from pydantic import BaseModel
-from src.utility.vector_database import search_similar_products, initialize_database, insert_product
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from src.utility.vector_database import save_vector_store
 # from src.utility.embedding_model import EmbeddingModel
-from src.utility.logger import get_logger
-from src.utility.data_loader import process_and_generate_embeddings
-from src.routes import embed_routes, base_router, search_router
-from src.controllers.search_controller import initialize_search
-import os
-import pandas as pd
+from src.utility.logger import get_logger, start_request, ACCESS_LOGGER
+from src.routes import embed_routes, base_router, search_router, model_router
+from src.controllers.search_controller import embedding_service, search_executor, rebuild_executor
+from src.utility.readiness import readiness, ComponentUnavailable
+from src.utility.job_manager import job_manager
+from src.utility.metrics import metrics
+import time
+import uuid
 
 app = FastAPI()
 
@@ -20,16 +22,74 @@ app = FastAPI()
 # Initialize logger
 logger = get_logger(__name__)
 
-# Initialize search (BM25) at app startup
+# Load models, the vector store and the lexical index in the background at
+# app startup; /ready reports when they are all usable
 def on_startup():
-    initialize_database()
-    initialize_search()
+    readiness.start()
 
 app.add_event_handler("startup", on_startup)
+app.add_event_handler("shutdown", job_manager.shutdown)
+app.add_event_handler("shutdown", save_vector_store)
+app.add_event_handler("shutdown", embedding_service.stop)
+app.add_event_handler("shutdown", lambda: search_executor.shutdown(wait=False))
+app.add_event_handler("shutdown", lambda: rebuild_executor.shutdown(wait=False))
+
+# A model or index that failed to load is reloaded in the background; until
+# then requests that need it are refused at once instead of retrying the load
+@app.exception_handler(ComponentUnavailable)
+async def component_unavailable(request: Request, exc: ComponentUnavailable):
+    headers = {"Retry-After": str(max(1, int(exc.retry_after) + 1))} if exc.retry_after is not None else None
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers=headers)
+
+# Latency of every HTTP request by route template (not raw path, which would
+# give every job id its own series) and status code
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_seconds", "HTTP request latency", ("method", "route", "status")
+)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            request.method,
+            getattr(route, "path", "unmatched"),
+            status,
+        )
+
+access_logger = get_logger(ACCESS_LOGGER)
+
+# Tag every log line of a request with its id (the caller's X-Request-ID, if
+# sent) and decide once per request whether its verbose lines are kept;
+# a single access line per request is always logged
+@app.middleware("http")
+async def assign_request_id(request: Request, call_next):
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    start_request(request_id)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        access_logger.info(
+            "%s %s %s", request.method, request.url.path, status,
+            extra={"status": status, "duration_ms": round((time.perf_counter() - started) * 1000.0, 2)},
+        )
 
 app.include_router(base_router)
 app.include_router(search_router)
 app.include_router(embed_routes.router)
+app.include_router(model_router)
 
 # class SearchRequest(BaseModel):
 #     query: str
@@ -1,5 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
+from fastapi.responses import JSONResponse
 from src.utility.logger import get_logger
+from src.utility.metrics import metrics, CONTENT_TYPE
+from src.utility.readiness import readiness
 import os
 
 # Initialize logger
@@ -16,4 +19,24 @@ def root():
 
 @router.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@router.get("/ready")
+def readiness_check():
+    """
+    Readiness probe: 200 once every model and index is loaded, 503 before.
+
+    Reports the state and load/warm-up times of each component.
+    """
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """
+    Prometheus scrape endpoint.
+
+    Per-stage search and ingestion latency histograms, cache hit counts,
+    index sizes and model load times, in the text exposition format.
+    """
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
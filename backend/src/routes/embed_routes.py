@@ -1,44 +1,103 @@
-from fastapi import APIRouter, UploadFile, File
-from src.controllers.embed_controller import save_temp_file, process_and_insert_products, cleanup_temp_file
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from src.controllers.embed_controller import save_temp_file, process_and_insert_products, cleanup_temp_file, count_csv_rows
+from src.controllers.search_controller import schedule_search_refresh
+from src.utility.job_manager import job_manager
 from src.utility.logger import get_logger
 from datasets import load_dataset
-import tempfile
-import os
 
 logger = get_logger(__name__)
 
 router = APIRouter(prefix="/embed", tags=["Embed"])
 
 
-@router.post("")
-async def embed_to_vector():
+def _accepted(job):
+    return {
+        "status": "accepted",
+        "message": f"Ingestion job {job.job_id} queued",
+        "job_id": job.job_id,
+    }
+
+
+@router.post("", status_code=202)
+def embed_to_vector():
     """
-    Embed the product data from a CSV file.
+    Queue a background job embedding the WDC cameras dataset.
     """
-    try:
+    def run(job):
         dataset = load_dataset("wdc/products-2017", "cameras_small")
         df = dataset["test"].to_pandas()
+        job.total_rows = len(df)
+        process_and_insert_products(
+            df,
+            progress_callback=job.update_progress,
+            cancel_event=job.cancel_event,
+        )
+        # New products are already searchable through incremental BM25 adds;
+        # refresh the intent gazetteer and save the index in the background
+        schedule_search_refresh()
 
-        # Save DataFrame to a temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".csv", mode="w") as tmp:
-            df.to_csv(tmp.name, index=False)
-            temp_file_path = tmp.name
+    job = job_manager.submit(run, description="wdc/products-2017 cameras_small")
+    return _accepted(job)
 
-        # Process and insert products
-        results = process_and_insert_products(df)
 
-        # Optionally, clean up the temp file
-        os.remove(temp_file_path)
+@router.post("/upload", status_code=202)
+async def embed_uploaded_file(file: UploadFile = File(...)):
+    """
+    Queue a background job embedding the product data from an uploaded CSV file.
 
-        return {
-            "status": "success",
-            "message": f"Successfully processed and inserted {results['successful_inserts']} products",
-            "total_products": results['total_products'],
-            "successful_inserts": results['successful_inserts']
-        }
+    The upload is streamed to a unique temporary file and processed in
+    fixed-size row windows, so large catalogs are imported in bounded memory.
+    """
+    try:
+        temp_file_path = await save_temp_file(file)
     except Exception as e:
-        logger.error(f"Error during embedding: {e}")
-        return {
-            "status": "error",
-            "message": str(e)
-        }
\ No newline at end of file
+        logger.error(f"Error while saving uploaded file: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    def run(job):
+        job.total_rows = count_csv_rows(temp_file_path)
+        process_and_insert_products(
+            temp_file_path,
+            progress_callback=job.update_progress,
+            cancel_event=job.cancel_event,
+        )
+        # New products are already searchable through incremental BM25 adds;
+        # refresh the intent gazetteer and save the index in the background
+        schedule_search_refresh()
+
+    job = job_manager.submit(
+        run,
+        description=f"upload {file.filename}",
+        on_finish=lambda: cleanup_temp_file(temp_file_path),
+    )
+    return _accepted(job)
+
+
+@router.get("/jobs")
+def list_jobs():
+    """
+    List ingestion jobs, most recent first.
+    """
+    return [job.to_dict() for job in job_manager.list()]
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Report progress of an ingestion job: rows processed, throughput, errors and ETA.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """
+    Cancel an ingestion job. Running jobs stop after their current batch.
+    """
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+import os
+from src.controllers.model_controller import get_models_status, swap_model
+from src.utility.auth import require_admin
+from src.utility.logger import get_logger
+
+logger = get_logger(__name__)
+
+router = APIRouter(prefix="/models", tags=["Models"])
+
+# Comma-separated model names or paths a swap may load; empty allows any
+MODEL_SWAP_SOURCES = [source.strip() for source in os.getenv("MODEL_SWAP_SOURCES", "").split(",") if source.strip()]
+
+
+# Request model for swapping in a new model version
+class SwapRequest(BaseModel):
+    source: Optional[str] = None  # Model name or local path of the new version
+    backend: Optional[str] = None  # "torch" or "onnx" (embedding model only)
+
+
+@router.get("")
+def list_models():
+    """Report the version, load state and memory use of every shared model."""
+    return get_models_status()
+
+
+@router.post("/{name}/swap", dependencies=[Depends(require_admin)])
+def swap(name: str, request: SwapRequest):
+    """
+    Load a new model version next to the serving one and switch over atomically.
+
+    Requires the X-Admin-Token header. If MODEL_SWAP_SOURCES is set, `source`
+    must be one of the listed models or paths.
+    """
+    if MODEL_SWAP_SOURCES and request.source is not None and request.source not in MODEL_SWAP_SOURCES:
+        raise HTTPException(status_code=403, detail=f"Source '{request.source}' is not in MODEL_SWAP_SOURCES")
+    try:
+        return swap_model(name, source=request.source, backend=request.backend)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Model '{name}' not found")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Model swap refused, previous version still serving: {e}")
+    except Exception as e:
+        logger.error(f"Error while swapping model '{name}': {e}")
+        raise HTTPException(status_code=500, detail=f"Model swap failed, previous version still serving: {e}")
@@ -1,50 +1,158 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
+import json
+import math
+import os
+import time
 from src.utility.logger import get_logger
-from src.controllers.search_controller import hybrid_search, initialize_search
+from src.controllers.search_controller import hybrid_search_async, batch_hybrid_search
+from src.utility.vector_database import quantization_report
+from src.utility.query_cache import query_cache
+from src.utility.result_cache import result_cache
+from src.utility.fusion import FUSION_METHOD, FUSION_METHODS
+from src.utility.readiness import ComponentUnavailable
+from src.utility.auth import require_admin
+from src.schemas.search_schemas import SearchRequest, BatchSearchRequest, SearchResult
 
 logger = get_logger(__name__)
 
 # Create a FastAPI router for search endpoints
 router = APIRouter(prefix="/search", tags=["Search"])
 
-# Initialize search components when the app starts
-@router.on_event("startup")
-def initialize_search_on_startup():
-    """Initialize search components when the application starts."""
-    initialize_search()
-
-# Request model for search
-class SearchRequest(BaseModel):
-    query: str  # Search query
-    top_k: int = 5  # Number of results to return
-    semantic_weight: Optional[float] = 0.7  # Weight for semantic score in hybrid search
-
-# Response model for search results
-class SearchResult(BaseModel):
-    id: int
-    score: float
-    payload: dict
-    source: Optional[str] = None
-
-# Hybrid search endpoint (only one endpoint for simplicity)
+# Send the Server-Timing breakdown with every response; otherwise only to
+# requests carrying the X-Debug-Timing header
+SEARCH_SERVER_TIMING = os.getenv("SEARCH_SERVER_TIMING", "false").lower() == "true"
+
+# Largest number of queries accepted by one batch request
+BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", "10000"))
+
+def unavailable(error: ComponentUnavailable) -> HTTPException:
+    """503 for a request that needs a component which is failed and waiting for its retry."""
+    headers = None
+    if error.retry_after is not None:
+        headers = {"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    return HTTPException(status_code=503, detail=str(error), headers=headers)
+
+# Hybrid search endpoint (only one endpoint for simplicity).
+# Async end to end: model inference and BM25 run on worker threads, query
+# encoding is micro-batched by the embedding service and Qdrant is awaited on
+# the async client, so the event loop never blocks on a round trip.
 @router.post("", response_model=List[SearchResult])
-async def search_products(request: SearchRequest):
+async def search_products(
+    request: SearchRequest,
+    response: Response,
+    debug_timing: Optional[str] = Header(None, alias="X-Debug-Timing"),
+):
     """
     Perform a hybrid search using both vector (Qdrant) and BM25 (text) search.
+
+    Repeated requests are answered from the result cache until the catalog
+    changes; X-Cache reports hit-local, hit-shared or miss. Results served
+    without the vector search (X-Degraded) are not cached. Send
+    `X-Debug-Timing: 1` to get the per-stage timings of the request in the
+    standard Server-Timing header. Aggregated timings are on /metrics.
     """
     try:
         logger.info(
-            f"Received hybrid search request with query: {request.query}, top_k: {request.top_k}"
+            "Received hybrid search request with query: %s, top_k: %s", request.query, request.top_k
+        )
+        if request.fusion is not None and request.fusion not in FUSION_METHODS:
+            raise HTTPException(status_code=400, detail=f"fusion must be one of {list(FUSION_METHODS)}")
+        # Call the hybrid search function, unless the result is cached
+        timings = {}
+        degraded = []
+        started = time.perf_counter()
+        results, cache_status = await result_cache.get_or_compute_async(
+            request.query,
+            request.top_k,
+            request.semantic_weight,
+            request.fusion or FUSION_METHOD,
+            lambda: hybrid_search_async(
+                request.query, request.top_k, request.semantic_weight, timings=timings, fusion=request.fusion,
+                degraded=degraded,
+            ),
+            cacheable=lambda: not degraded,
         )
-        # Call the hybrid search function
-        results = hybrid_search(request.query, request.top_k, request.semantic_weight)
-        logger.info(f"Hybrid search completed successfully. Found {len(results)} results")
+        if not timings:
+            timings["cache"] = (time.perf_counter() - started) * 1000.0
+        response.headers["X-Cache"] = cache_status
+        if degraded:
+            response.headers["X-Degraded"] = ",".join(degraded)
+        if SEARCH_SERVER_TIMING or debug_timing not in (None, "", "0", "false"):
+            response.headers["Server-Timing"] = ", ".join(
+                f"{stage};dur={duration:.2f}" for stage, duration in timings.items()
+            )
+        logger.info("Hybrid search completed successfully. Found %d results", len(results))
         return results
     except HTTPException as e:
         logger.error(f"HTTP error during search: {e.detail}")
         raise
+    except ComponentUnavailable as e:
+        logger.warning("Search unavailable: %s", e)
+        raise unavailable(e)
     except Exception as e:
         logger.error(f"Error during search: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Batch search endpoint for bulk jobs (catalog enrichment, recommendations)
+@router.post("/batch")
+def search_products_batch(request: BatchSearchRequest):
+    """
+    Hybrid search of many queries in one request.
+
+    Intent extraction, embedding, vector search and BM25 run batched per
+    chunk of queries. Results are streamed as newline-delimited JSON, one
+    line per query in request order: {"index", "query", "results"} or
+    {"index", "query", "error"} if that query's chunk failed.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(request.queries) > BATCH_SEARCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_SEARCH_MAX_QUERIES} queries per batch")
+    for query in request.queries:
+        if query.fusion is not None and query.fusion not in FUSION_METHODS:
+            raise HTTPException(status_code=400, detail=f"fusion must be one of {list(FUSION_METHODS)}")
+    logger.info("Received batch search request with %d queries", len(request.queries))
+
+    requests = [
+        {
+            "query": query.query,
+            "top_k": query.top_k,
+            "semantic_weight": query.semantic_weight,
+            "fusion": query.fusion,
+        }
+        for query in request.queries
+    ]
+
+    def stream():
+        # A sync generator: Starlette iterates it in its threadpool
+        for line in batch_hybrid_search(requests):
+            yield json.dumps(line, default=str) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# Hit rates of the result cache and the query embedding/intent cache
+@router.get("/cache-stats")
+def get_cache_stats():
+    return {"results": result_cache.stats(), "queries": query_cache.stats()}
+
+# Memory saved and recall kept by the configured vector quantization
+@router.get("/quantization-report", dependencies=[Depends(require_admin)])
+def get_quantization_report(
+    sample_size: int = Query(100, ge=1, le=1000),
+    top_k: int = Query(10, ge=1, le=1000),
+    oversampling: Optional[float] = Query(None, ge=1, le=100),
+):
+    """
+    Measure recall@k of quantized vector search against exact search.
+
+    Requires the X-Admin-Token header; every sampled query runs an exact scan.
+    Pass `oversampling` to evaluate a different factor before changing
+    VECTOR_OVERSAMPLING.
+    """
+    try:
+        return quantization_report(sample_size=sample_size, top_k=top_k, oversampling=oversampling)
+    except Exception as e:
+        logger.error(f"Error while building quantization report: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
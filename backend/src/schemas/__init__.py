@@ -0,0 +1,3 @@
+from .search_schemas import SearchRequest, BatchSearchRequest, SearchResult
+
+__all__ = ['SearchRequest', 'BatchSearchRequest', 'SearchResult']
@@ -0,0 +1,24 @@
+# src/schemas/search_schemas.py
+# Request and response models of the search endpoints; kept free of model and
+# database imports so they can be used without loading the search stack
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+# Request model for search
+class SearchRequest(BaseModel):
+    query: str  # Search query
+    top_k: int = 5  # Number of results to return
+    semantic_weight: float = Field(0.7, ge=0.0, le=1.0)  # Weight for semantic score in hybrid search
+    fusion: Optional[str] = None  # "minmax" or "rrf"; defaults to FUSION_METHOD
+
+# Request model for batch search
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchRequest]  # Searched in order; each with its own top_k and weights
+
+# Response model for search results
+class SearchResult(BaseModel):
+    id: int
+    score: float
+    payload: dict
+    source: Optional[str] = None
+    filters_relaxed: bool = False  # The query's intent filters matched nothing and were dropped
@@ -0,0 +1,17 @@
+# src/utility/auth.py
+import hmac
+import os
+from typing import Optional
+from fastapi import Header, HTTPException
+
+# Token required in the X-Admin-Token header by admin endpoints (model swaps,
+# quantization report); they are disabled while it is unset
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+
+
+def require_admin(admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    """Refuse the request unless it carries the configured admin token."""
+    if not MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set MODEL_ADMIN_TOKEN to enable them")
+    if admin_token is None or not hmac.compare_digest(admin_token, MODEL_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token")
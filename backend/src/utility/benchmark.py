@@ -0,0 +1,430 @@
+# src/utility/benchmark.py
+import os
+
+# Models are only read from the local Hugging Face cache; the suite never downloads
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import argparse
+import functools
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from qdrant_client import QdrantClient
+from src.utility.logger import get_logger
+from src.utility import vector_database
+from src.utility.vector_database import initialize_database, search_similar_products, scroll_products
+from src.utility.vector_store import QdrantVectorStore, VECTOR_SIZE
+from src.utility.bm25_search import initialize_bm25, mark_ingest, search_products_bm25, payload_text, tokenize
+from src.utility.dedup import NearDuplicateIndex
+from src.utility.fusion import fuse_results
+from src.utility.model_registry import model_registry, EMBEDDING_MODEL, INTENT_MODEL
+from src.controllers import embed_controller
+from src.controllers.embed_controller import process_and_insert_products
+
+logger = get_logger(__name__)
+
+DEFAULT_SIZES = [1000, 10000]
+DEFAULT_BASELINE = os.path.join("data", "benchmarks", "baseline.json")
+# Allowed slowdown (fraction) of p50/p95 latency and throughput before a stage is flagged
+REGRESSION_TOLERANCE = 0.25
+# Latency increases below this are timer noise, never regressions
+MIN_REGRESSION_MS = 0.05
+WARMUP_CALLS = 3
+# Candidates per leg, as fetched by hybrid search
+CANDIDATES = 100
+EMBED_BENCH_BATCH = 64
+
+BRANDS = [
+    "Canon", "Nikon", "Sony", "Samsung", "Apple", "Dell", "Lenovo", "HP", "Asus", "Logitech",
+    "Bose", "JBL", "Philips", "Panasonic", "LG", "Xiaomi", "Garmin", "Fitbit", "Anker", "Seagate",
+]
+CATEGORIES = {
+    "camera": ["camera", "dslr camera", "mirrorless camera", "action camera"],
+    "laptop": ["laptop", "notebook", "ultrabook", "gaming laptop"],
+    "headphones": ["headphones", "earbuds", "headset", "earphones"],
+    "phone": ["smartphone", "phone", "mobile phone"],
+    "storage": ["hard drive", "ssd", "memory card", "usb flash drive"],
+    "watch": ["smartwatch", "fitness tracker", "sports watch"],
+}
+ATTRIBUTES = ["wireless", "bluetooth", "waterproof", "portable", "refurbished", "4k", "hd", "digital"]
+COLORS = ["black", "white", "silver", "red", "blue", "grey", "gold"]
+FREE_TEXT_QUERIES = [
+    "gift for my father who likes hiking",
+    "something to record videos while travelling",
+    "Amazon Prime day deals from Berlin",
+    "what does Sarah need for school in London",
+]
+
+
+class HashingEncoder:
+    """
+    Deterministic token-hashing encoder.
+
+    Stands in for the embedding model (`--embeddings synthetic`) so the
+    store, lexical and ingestion stages can be timed without model weights.
+    Texts sharing tokens get similar vectors, like real embeddings.
+    """
+
+    version = "hashing-encoder"
+
+    def __init__(self, dimension: int = VECTOR_SIZE):
+        self.dimension = dimension
+
+    def get_embeddings(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                code = zlib.crc32(token.encode("utf-8"))
+                embeddings[row, code % self.dimension] += 1.0 if code & 0x10000 else -1.0
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.clip(norms, 1e-12, None)
+
+    def get_embedding(self, text: str) -> np.ndarray:
+        return self.get_embeddings([text])[0]
+
+    def memory_bytes(self) -> int:
+        return 0
+
+
+def _offer(rng: np.random.Generator, brand: str, category: str) -> Dict[str, str]:
+    noun = rng.choice(CATEGORIES[category])
+    color = rng.choice(COLORS)
+    attribute = rng.choice(ATTRIBUTES)
+    model = f"{brand[:2].upper()}-{rng.integers(100, 9999)}"
+    return {
+        "title": f"{brand} {attribute} {noun} {model} {color}",
+        "description": f"{attribute.capitalize()} {noun} by {brand} in {color}, model {model} with {rng.integers(1, 5)} year warranty",
+        "brand": brand,
+        "category": category,
+        "price": float(rng.choice([19.99, 49.0, 99.99, 149.0, 299.0, 499.99, 899.0, 1299.0, 2499.0]) + rng.integers(0, 50)),
+    }
+
+
+def _wdc_value(rng: np.random.Generator, value: str) -> str:
+    # WDC offers often carry quoted, language-tagged values
+    return f'"{value}"@en' if rng.random() < 0.3 else value
+
+
+def _wdc_price(rng: np.random.Generator, price: float) -> Optional[str]:
+    roll = rng.random()
+    if roll < 0.1:
+        return None
+    if roll < 0.4:
+        return f'"USD {price:,.2f}"'
+    return f"{price:.2f}"
+
+
+def generate_catalog(pairs: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Synthetic product pairs shaped like the WDC product matching data.
+
+    Each row holds a left and a right offer (id, title, description, brand,
+    category, price) plus pair_id and label; half of the pairs are two
+    offers of the same product.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for index in range(pairs):
+        brand = str(rng.choice(BRANDS))
+        category = str(rng.choice(list(CATEGORIES)))
+        left = _offer(rng, brand, category)
+        match = rng.random() < 0.5
+        if match:
+            right = dict(left, title=f"{left['title']} {rng.choice(['new', 'original', 'bundle', 'edition'])}")
+        else:
+            right = _offer(rng, str(rng.choice(BRANDS)), str(rng.choice(list(CATEGORIES))))
+        id_left, id_right = 2 * index, 2 * index + 1
+        rows.append({
+            "id_left": id_left,
+            "id_right": id_right,
+            "pair_id": f"{id_left}#{id_right}",
+            "label": int(match),
+            **{f"{field}_left": _wdc_value(rng, left[field]) for field in ("title", "description", "brand", "category")},
+            **{f"{field}_right": _wdc_value(rng, right[field]) for field in ("title", "description", "brand", "category")},
+            "price_left": _wdc_price(rng, left["price"]),
+            "price_right": _wdc_price(rng, right["price"]),
+        })
+    return pd.DataFrame(rows)
+
+
+def generate_queries(count: int, seed: int = 0) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Synthetic query mix with the store filters each query implies.
+
+    Covers brand/category lookups, price constraints, attribute searches and
+    free text that only the NER model can handle.
+    """
+    rng = np.random.default_rng(seed + 1)
+    queries = []
+    for index in range(count):
+        brand = str(rng.choice(BRANDS))
+        category = str(rng.choice(list(CATEGORIES)))
+        noun = str(rng.choice(CATEGORIES[category]))
+        price = int(rng.choice([100, 250, 500, 1000]))
+        kind = index % 5
+        if kind == 0:
+            queries.append((f"{brand} {noun}", {"brand": [brand.lower()]}))
+        elif kind == 1:
+            queries.append((f"{rng.choice(COLORS)} {noun} under ${price}", {"price": {"lt": float(price)}}))
+        elif kind == 2:
+            queries.append((
+                f"buy {brand} {category} between ${price} and ${price * 2}",
+                {"brand": [brand.lower()], "price": {"gte": float(price), "lte": float(price * 2)}},
+            ))
+        elif kind == 3:
+            queries.append((f"find similar {rng.choice(ATTRIBUTES)} {noun}", {}))
+        else:
+            queries.append((str(rng.choice(FREE_TEXT_QUERIES)), {}))
+    return queries
+
+
+def latency_stats(latencies: Sequence[float], items: Optional[int] = None) -> Dict[str, Any]:
+    """p50/p95/p99/mean in ms and throughput (items per second) of per-call wall times in seconds."""
+    ms = np.asarray(latencies, dtype=np.float64) * 1000.0
+    total_seconds = float(np.sum(latencies))
+    count = len(latencies) if items is None else items
+    return {
+        "samples": len(latencies),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "throughput_per_s": round(count / total_seconds, 2) if total_seconds > 0 else None,
+    }
+
+
+def time_calls(fn: Callable[[Any], Any], inputs: Sequence[Any], warmup: int = WARMUP_CALLS, items_per_call: int = 1) -> Dict[str, Any]:
+    """Call `fn` on every input (after `warmup` untimed calls) and summarize the latencies."""
+    for item in inputs[:warmup]:
+        fn(item)
+    latencies = []
+    for item in inputs:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latency_stats(latencies, items=len(inputs) * items_per_call)
+
+
+def _load_model(name: str, stages: Dict[str, Any]):
+    try:
+        return model_registry.get(name)
+    except Exception as e:
+        logger.warning("Skipping stages that need %s: %s", name, e)
+        stages[f"{name}_load"] = {"error": str(e)}
+        return None
+
+
+def _scroll_all() -> Tuple[List[str], List[dict], List[Any]]:
+    corpus, payloads, product_ids = [], [], []
+    offset = None
+    while True:
+        points, offset = scroll_products(limit=1000, offset=offset)
+        for point in points:
+            text = payload_text(point.payload)
+            if text:
+                corpus.append(text)
+                payloads.append(point.payload)
+                product_ids.append(point.id)
+        if offset is None:
+            return corpus, payloads, product_ids
+
+
+def _benchmark_catalog(pairs: int, queries: List[Tuple[str, Dict[str, Any]]], encoder, extractor, seed: int, stages: Dict[str, Any]):
+    """Ingest a synthetic catalog of `pairs` rows into a fresh in-memory Qdrant and time every stage."""
+    catalog = generate_catalog(pairs, seed)
+    vector_database.store = QdrantVectorStore(QdrantClient(":memory:"), f"benchmark_{pairs}")
+    initialize_database()
+    # Empty lexical index, so ingestion also pays for incremental BM25 updates
+    initialize_bm25([], [], [])
+
+    window_times = []
+    last = [time.perf_counter()]
+
+    def on_progress(progress):
+        now = time.perf_counter()
+        window_times.append(now - last[0])
+        last[0] = now
+
+    # Ingestion also writes the near-duplicate index and the import stamp;
+    # keep both away from the served ones in data/index
+    saved_hooks = embed_controller.near_duplicates, embed_controller.mark_ingest
+    with tempfile.TemporaryDirectory(prefix="benchmark-") as scratch:
+        embed_controller.near_duplicates = NearDuplicateIndex(path=None)
+        embed_controller.mark_ingest = functools.partial(mark_ingest, directory=scratch)
+        try:
+            started = time.perf_counter()
+            summary = process_and_insert_products(catalog, progress_callback=on_progress)
+            ingest_seconds = time.perf_counter() - started
+        finally:
+            embed_controller.near_duplicates, embed_controller.mark_ingest = saved_hooks
+    stages[f"ingest@{pairs}"] = {
+        **latency_stats(window_times),
+        "products": summary["successful_inserts"],
+        "throughput_per_s": round(summary["successful_inserts"] / ingest_seconds, 2) if ingest_seconds > 0 else None,
+    }
+
+    corpus, payloads, product_ids = _scroll_all()
+    start = time.perf_counter()
+    initialize_bm25(corpus, payloads, product_ids)
+    stages[f"bm25_build@{pairs}"] = latency_stats([time.perf_counter() - start], items=len(corpus))
+
+    texts = [query for query, _ in queries]
+    embeddings = encoder.get_embeddings(texts)
+    stages[f"vector_search@{pairs}"] = time_calls(
+        lambda embedding: search_similar_products(embedding, top_k=CANDIDATES), list(embeddings)
+    )
+    filtered = [(embedding, filters) for embedding, (_, filters) in zip(embeddings, queries) if filters]
+    if filtered:
+        stages[f"vector_search_filtered@{pairs}"] = time_calls(
+            lambda item: search_similar_products(item[0], top_k=CANDIDATES, filters=item[1]), filtered
+        )
+    stages[f"bm25_search@{pairs}"] = time_calls(lambda query: search_products_bm25(query, top_k=CANDIDATES), texts)
+
+    legs = [
+        (search_similar_products(embedding, top_k=CANDIDATES), search_products_bm25(query, top_k=CANDIDATES))
+        for embedding, query in zip(embeddings, texts)
+    ]
+    for method in ("minmax", "rrf"):
+        stages[f"fusion_{method}@{pairs}"] = time_calls(
+            lambda leg: fuse_results(leg[0], leg[1], 10, method=method), legs
+        )
+
+    if extractor is not None:
+        # The gazetteer grows with the catalog vocabulary
+        extractor.update_catalog(payloads)
+        stages[f"intent@{pairs}"] = time_calls(extractor.extract_intent_components, texts)
+
+
+def run_benchmarks(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    query_count: int = 200,
+    embeddings: str = "model",
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Time every search and ingestion stage across catalog sizes.
+
+    Runs entirely in process: an in-memory Qdrant per catalog size and a
+    synthetic WDC-shaped catalog. With `embeddings="synthetic"` the
+    embedding model is replaced by HashingEncoder and its stages are skipped.
+
+    Returns:
+        Report with run metadata and, per stage, p50/p95/p99/mean latency in
+        ms and throughput
+    """
+    stages: Dict[str, Any] = {}
+    queries = generate_queries(query_count, seed)
+    texts = [query for query, _ in queries]
+
+    if embeddings == "synthetic":
+        model_registry.swap(EMBEDDING_MODEL, HashingEncoder)
+    encoder = _load_model(EMBEDDING_MODEL, stages)
+    if encoder is None:
+        # No cached weights: still time the other stages, with the hashing encoder
+        model_registry.swap(EMBEDDING_MODEL, HashingEncoder)
+        encoder = model_registry.get(EMBEDDING_MODEL)
+        embeddings = "synthetic"
+    if embeddings == "model":
+        stages["embedding_single"] = time_calls(encoder.get_embedding, texts)
+        titles = generate_catalog(EMBED_BENCH_BATCH * 8, seed)["title_left"].tolist()
+        batches = [titles[start:start + EMBED_BENCH_BATCH] for start in range(0, len(titles), EMBED_BENCH_BATCH)]
+        stages["embedding_batch"] = time_calls(
+            encoder.get_embeddings, batches, warmup=1, items_per_call=EMBED_BENCH_BATCH
+        )
+    extractor = _load_model(INTENT_MODEL, stages)
+
+    for pairs in sizes:
+        print(f"Benchmarking catalog of {pairs} pairs", file=sys.stderr)
+        _benchmark_catalog(pairs, queries, encoder, extractor, seed, stages)
+
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sizes": list(sizes),
+            "queries": query_count,
+            "embeddings": embeddings,
+            "seed": seed,
+        },
+        "stages": stages,
+    }
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = REGRESSION_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Stages whose p50/p95 latency grew, or whose throughput fell, by more
+    than `tolerance` relative to the baseline.
+    """
+    regressions = []
+    for stage, current in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or "error" in current or "error" in previous:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            before, after = previous.get(metric), current.get(metric)
+            if before and after and after > before * (1 + tolerance) and after - before > MIN_REGRESSION_MS:
+                regressions.append({"stage": stage, "metric": metric, "baseline": before, "current": after, "change": round(after / before - 1, 3)})
+        before, after = previous.get("throughput_per_s"), current.get("throughput_per_s")
+        if before and after and after < before * (1 - tolerance):
+            regressions.append({"stage": stage, "metric": "throughput_per_s", "baseline": before, "current": after, "change": round(after / before - 1, 3)})
+    return regressions
+
+
+def _write_json(path: str, data: Dict[str, Any]):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks of the search and ingestion stages")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="Comma-separated catalog sizes (product pairs)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--embeddings", choices=["model", "synthetic"], default="model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report here instead of stdout")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline report to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--log-level", default="WARNING", help="Per-call INFO logging would dominate the timings")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(args.log_level.upper())
+    report = run_benchmarks(
+        sizes=[int(size) for size in args.sizes.split(",") if size],
+        query_count=args.queries,
+        embeddings=args.embeddings,
+        seed=args.seed,
+    )
+
+    regressions = None
+    if args.save_baseline:
+        _write_json(args.baseline, report)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    if args.output:
+        _write_json(args.output, report)
+    else:
+        print(json.dumps(report, indent=2))
+    if regressions:
+        for regression in regressions:
+            logger.warning(
+                "Regression in %s: %s %s -> %s (%+.1f%%)",
+                regression["stage"], regression["metric"], regression["baseline"], regression["current"],
+                regression["change"] * 100,
+            )
+        raise SystemExit(1)
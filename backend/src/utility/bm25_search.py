@@ -1,48 +1,869 @@
-from typing import List, Dict, Any
-from rank_bm25 import BM25Okapi
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from src.utility.logger import get_logger
+from src.utility.catalog_version import catalog_version
+from src.utility.metrics import metrics
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
 import numpy as np
 
 logger = get_logger(__name__)
 
-# Global variables to store corpus, payloads, and BM25 instance
-CORPUS = []
-BM25_PAYLOADS = []
-BM25_INSTANCE = None
+# Payload fields concatenated into the BM25 document text
+TEXT_FIELDS = [
+    "title_left", "title_right",
+    "description_left", "description_right",
+    "brand_left", "brand_right",
+    "category_left", "category_right"
+]
 
-def initialize_bm25(corpus: List[str], payloads: List[dict]):
+# Bumped whenever the on-disk snapshot layout changes
+SNAPSHOT_FORMAT_VERSION = 2
+# Main segment arrays persisted as individual .npy files (memory-mapped on load)
+SNAPSHOT_ARRAYS = ["offsets", "doc_ids", "tf", "lengths", "max_tf", "min_len", "doc_freq"]
+# Document lists persisted as packed UTF-8 buffers (also memory-mapped), with
+# payloads and product ids JSON-encoded per item
+SNAPSHOT_DOCUMENTS = ["vocab", "corpus", "payloads", "product_ids"]
+# Where the lexical index snapshot is persisted between restarts
+BM25_SNAPSHOT_DIR = os.getenv("BM25_SNAPSHOT_DIR", os.path.join("data", "index", "bm25"))
+# File in BM25_SNAPSHOT_DIR recording the last catalog import
+INGEST_STAMP_FILE = "INGEST"
+
+# The delta segment of recently added documents is merged into the main
+# segment once it holds more than the larger of BM25_MERGE_MIN_DOCS and
+# BM25_MERGE_RATIO times the size of the main segment, so the cost of merges
+# stays amortized over the documents added in between
+BM25_MERGE_MIN_DOCS = int(os.getenv("BM25_MERGE_MIN_DOCS", "20000"))
+BM25_MERGE_RATIO = float(os.getenv("BM25_MERGE_RATIO", "0.25"))
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokenize text the same way for documents and queries."""
+    return text.lower().split()
+
+
+def payload_text(payload: dict) -> str:
+    """Build the BM25 document text of a product payload."""
+    fields = []
+    for key in TEXT_FIELDS:
+        value = payload.get(key, "")
+        if value and value != "None":
+            fields.append(str(value))
+    return " ".join(fields).strip()
+
+
+class _Segment:
+    """
+    Immutable postings of a contiguous range of document ids.
+
+    Postings are stored term-major in CSR layout (`offsets`, `doc_ids`) with
+    the raw term frequency and document length of each posting, so impacts
+    can be computed against the average length of the whole index at query
+    time. `max_tf` and `min_len` bound the impact of every posting of a term.
+    """
+
+    def __init__(self, offsets, doc_ids, tf, lengths, max_tf=None, min_len=None):
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tf = tf
+        self.lengths = lengths
+        if max_tf is None:
+            max_tf = np.zeros(self.num_terms, dtype=np.float32)
+            min_len = np.zeros(self.num_terms, dtype=np.float32)
+            nonempty = np.diff(offsets) > 0
+            if nonempty.any():
+                # Empty posting lists in between have zero width, so each
+                # reduction runs exactly over one term's postings
+                starts = offsets[:-1][nonempty]
+                max_tf[nonempty] = np.maximum.reduceat(tf, starts)
+                min_len[nonempty] = np.minimum.reduceat(lengths, starts)
+        self.max_tf = max_tf
+        self.min_len = min_len
+
+    @classmethod
+    def from_postings(cls, num_terms: int, terms, doc_ids, tf, lengths) -> "_Segment":
+        """Segment of postings already sorted by term, then doc id."""
+        offsets = np.zeros(num_terms + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=num_terms), out=offsets[1:])
+        return cls(offsets, doc_ids, tf, lengths)
+
+    @classmethod
+    def empty(cls, num_terms: int) -> "_Segment":
+        return cls.from_postings(
+            num_terms,
+            np.zeros(0, dtype=np.int64),
+            np.zeros(0, dtype=np.int32),
+            np.zeros(0, dtype=np.float32),
+            np.zeros(0, dtype=np.float32),
+        )
+
+    @property
+    def num_terms(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def num_postings(self) -> int:
+        return len(self.doc_ids)
+
+    def terms(self) -> np.ndarray:
+        return np.repeat(np.arange(self.num_terms, dtype=np.int64), np.diff(self.offsets))
+
+    def postings(self, term_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(doc ids, term frequencies, document lengths) of a term."""
+        if term_id >= self.num_terms:
+            return self.doc_ids[:0], self.tf[:0], self.lengths[:0]
+        start, end = self.offsets[term_id], self.offsets[term_id + 1]
+        return self.doc_ids[start:end], self.tf[start:end], self.lengths[start:end]
+
+    def bounds(self, term_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Per-term maximum tf and minimum document length; zeros for unknown terms."""
+        known = term_ids < self.num_terms
+        max_tf = np.zeros(len(term_ids), dtype=np.float32)
+        min_len = np.zeros(len(term_ids), dtype=np.float32)
+        max_tf[known] = self.max_tf[term_ids[known]]
+        min_len[known] = self.min_len[term_ids[known]]
+        return max_tf, min_len
+
+    @classmethod
+    def merge(cls, segments: List["_Segment"], num_terms: int, drop: Optional[np.ndarray] = None) -> "_Segment":
+        """
+        One segment with the postings of `segments`, which must cover
+        ascending, non-overlapping doc id ranges, minus the postings of the
+        doc ids in `drop`.
+        """
+        terms = np.concatenate([segment.terms() for segment in segments])
+        doc_ids = np.concatenate([segment.doc_ids for segment in segments])
+        tf = np.concatenate([segment.tf for segment in segments])
+        lengths = np.concatenate([segment.lengths for segment in segments])
+        if drop is not None and len(drop):
+            keep = ~np.isin(doc_ids, drop)
+            terms, doc_ids, tf, lengths = terms[keep], doc_ids[keep], tf[keep], lengths[keep]
+        # Stable sort by term keeps doc ids ascending inside each posting list
+        order = np.argsort(terms, kind="stable")
+        return cls.from_postings(num_terms, terms[order], doc_ids[order], tf[order], lengths[order])
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index with array-backed postings.
+
+    Documents live in two segments: a large main segment and a small delta
+    segment holding the documents added since the last merge. Both are
+    searched together against shared statistics (document frequencies,
+    document count and total length of the live documents), so scores match
+    rank_bm25.BM25Okapi over the live documents with the same k1, b and
+    epsilon.
+
+    Adding documents only rebuilds the delta segment; it is merged into the
+    main segment once it outgrows BM25_MERGE_MIN_DOCS / BM25_MERGE_RATIO.
+    Removed documents are tombstoned: they leave the statistics immediately
+    and their postings are dropped at the next merge.
+
+    Instances are never modified after construction; `extend` and `without`
+    return new indexes, so readers can keep using an index while a newer one
+    is being prepared. The term vocabulary is shared between them and only
+    ever appended to.
+    """
+
+    def __init__(self, tokenized_corpus: List[List[str]], k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self.vocab: Dict[str, int] = {}
+        terms, docs, tf, lengths, doc_lengths = self._postings_of(tokenized_corpus, self.vocab, first_doc_id=0)
+        self.main = _Segment.from_postings(len(self.vocab), terms, docs, tf, lengths)
+        self.delta = _Segment.empty(len(self.vocab))
+        self.delta_start = len(tokenized_corpus)
+        self.corpus_size = len(tokenized_corpus)
+        self.tombstones = np.zeros(0, dtype=np.int64)
+        self.doc_freq = np.bincount(terms, minlength=len(self.vocab)).astype(np.int64)
+        self.live_count = len(tokenized_corpus)
+        self.total_length = float(doc_lengths.sum())
+        self._update_statistics()
+
+    @staticmethod
+    def _postings_of(tokenized_docs: List[List[str]], vocab: Dict[str, int], first_doc_id: int):
+        """Unique (term, doc) postings of new documents, sorted term-major."""
+        term_ids = []
+        doc_lengths = np.zeros(len(tokenized_docs), dtype=np.float32)
+        for position, tokens in enumerate(tokenized_docs):
+            doc_lengths[position] = len(tokens)
+            term_ids.extend(vocab.setdefault(token, len(vocab)) for token in tokens)
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        doc_of_token = np.repeat(
+            np.arange(first_doc_id, first_doc_id + len(tokenized_docs), dtype=np.int64),
+            doc_lengths.astype(np.int64),
+        )
+        stride = first_doc_id + len(tokenized_docs) + 1
+        keys, tf = np.unique(term_ids * stride + doc_of_token, return_counts=True)
+        docs = keys % stride
+        return keys // stride, docs.astype(np.int32), tf.astype(np.float32), doc_lengths[docs - first_doc_id], doc_lengths
+
+    def _update_statistics(self):
+        """Derive the average length and idf from the live document statistics."""
+        self.avgdl = self.total_length / self.live_count if self.live_count else 0.0
+        # Same idf as BM25Okapi over the terms of live documents, including
+        # the epsilon floor for negative idf
+        doc_freq = self.doc_freq
+        present = doc_freq > 0
+        idf = np.log(self.live_count - doc_freq + 0.5) - np.log(doc_freq + 0.5)
+        average_idf = idf[present].mean() if present.any() else 0.0
+        idf[present & (idf < 0)] = self.epsilon * average_idf
+        idf[~present] = 0.0
+        self.idf = idf.astype(np.float32)
+
+    def _impacts(self, tf: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """Length-normalized term-frequency part of the BM25 score."""
+        if self.avgdl:
+            norm = self.k1 * (1 - self.b + self.b * lengths / self.avgdl)
+        else:
+            norm = self.k1
+        return (tf * (self.k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def _copy(self) -> "BM25Index":
+        copy = object.__new__(BM25Index)
+        copy.__dict__.update(self.__dict__)
+        return copy
+
+    @classmethod
+    def from_arrays(cls, params: Dict[str, float], vocab: Dict[str, int], arrays: Dict[str, np.ndarray], stats: Dict[str, Any]) -> "BM25Index":
+        """Restore an index from persisted parameters, vocabulary, main segment arrays and statistics."""
+        index = object.__new__(cls)
+        index.k1, index.b, index.epsilon = params["k1"], params["b"], params["epsilon"]
+        index.vocab = vocab
+        index.main = _Segment(
+            arrays["offsets"], arrays["doc_ids"], arrays["tf"], arrays["lengths"], arrays["max_tf"], arrays["min_len"]
+        )
+        index.delta = _Segment.empty(len(vocab))
+        index.corpus_size = int(stats["corpus_size"])
+        index.delta_start = index.corpus_size
+        index.tombstones = np.zeros(0, dtype=np.int64)
+        index.doc_freq = arrays["doc_freq"]
+        index.live_count = int(stats["live_count"])
+        index.total_length = float(stats["total_length"])
+        index._update_statistics()
+        return index
+
+    def extend(self, tokenized_docs: List[List[str]]) -> "BM25Index":
+        """
+        Return a new index with `tokenized_docs` appended as doc ids
+        corpus_size, corpus_size + 1, ...
+
+        Only the delta segment is rebuilt, so the cost depends on the size of
+        the delta and the vocabulary, not of the whole corpus.
+        """
+        extended = self._copy()
+        terms, docs, tf, lengths, doc_lengths = self._postings_of(tokenized_docs, self.vocab, self.corpus_size)
+        num_terms = len(self.vocab)
+        added = _Segment.from_postings(num_terms, terms, docs, tf, lengths)
+        extended.delta = _Segment.merge([self.delta, added], num_terms)
+        extended.corpus_size = self.corpus_size + len(tokenized_docs)
+
+        doc_freq = np.zeros(num_terms, dtype=np.int64)
+        doc_freq[:len(self.doc_freq)] = self.doc_freq
+        doc_freq += np.bincount(terms, minlength=num_terms)
+        extended.doc_freq = doc_freq
+        extended.live_count = self.live_count + len(tokenized_docs)
+        extended.total_length = self.total_length + float(doc_lengths.sum())
+
+        delta_docs = extended.corpus_size - extended.delta_start
+        if delta_docs > max(BM25_MERGE_MIN_DOCS, BM25_MERGE_RATIO * extended.delta_start):
+            extended._merge()
+        extended._update_statistics()
+        return extended
+
+    def _merge(self):
+        """Fold the delta into the main segment and drop tombstoned postings (only on fresh copies)."""
+        num_terms = len(self.doc_freq)
+        self.main = _Segment.merge([self.main, self.delta], num_terms, drop=self.tombstones)
+        self.delta = _Segment.empty(num_terms)
+        self.delta_start = self.corpus_size
+        self.tombstones = np.zeros(0, dtype=np.int64)
+
+    def compact(self) -> "BM25Index":
+        """Return an equivalent index with a single segment and no tombstones."""
+        if self.delta.num_postings == 0 and len(self.tombstones) == 0 and self.main.num_terms == len(self.doc_freq):
+            return self
+        compacted = self._copy()
+        compacted._merge()
+        return compacted
+
+    def without(self, doc_ids: List[int], tokenized_docs: List[List[str]]) -> "BM25Index":
+        """
+        Return an index with the live documents `doc_ids` removed.
+
+        Args:
+            doc_ids: Ids of live documents
+            tokenized_docs: Tokens of those documents, to take them out of
+                the statistics without scanning the postings
+        """
+        pruned = self._copy()
+        removed = {}
+        tombstoned = set(self.tombstones.tolist())
+        for doc_id, tokens in zip(doc_ids, tokenized_docs):
+            if doc_id not in tombstoned:
+                removed[int(doc_id)] = tokens
+        if not removed:
+            return self
+
+        term_ids = [self.vocab[token] for tokens in removed.values() for token in set(tokens)]
+        pruned.doc_freq = self.doc_freq - np.bincount(
+            np.asarray(term_ids, dtype=np.int64), minlength=len(self.doc_freq)
+        )
+        pruned.live_count = self.live_count - len(removed)
+        pruned.total_length = self.total_length - sum(len(tokens) for tokens in removed.values())
+        pruned.tombstones = np.union1d(self.tombstones, np.fromiter(removed, dtype=np.int64, count=len(removed)))
+        pruned._update_statistics()
+        return pruned
+
+    def _query_terms(self, tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Return known query term ids and their multiplicity in the query."""
+        counts: Dict[int, int] = {}
+        # Terms added to the shared vocabulary after this index was built are unknown here
+        num_terms = len(self.doc_freq)
+        for token in tokens:
+            term_id = self.vocab.get(token)
+            if term_id is not None and term_id < num_terms:
+                counts[term_id] = counts.get(term_id, 0) + 1
+        term_ids = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        return term_ids, weights
+
+    def _live(self, doc_ids: np.ndarray) -> np.ndarray:
+        if len(self.tombstones) == 0:
+            return np.ones(len(doc_ids), dtype=bool)
+        return ~np.isin(doc_ids, self.tombstones)
+
+    def _upper_bounds(self, term_ids: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Per-term upper bound of the score any document can get from the term."""
+        bounds = np.zeros(len(term_ids), dtype=np.float32)
+        for segment in (self.main, self.delta):
+            max_tf, min_len = segment.bounds(term_ids)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                impacts = np.where(max_tf > 0, self._impacts(max_tf, min_len), 0)
+            bounds = np.maximum(bounds, impacts)
+        return np.maximum(weights * self.idf[term_ids] * bounds, 0)
+
+    def _term_docs(self, term_id: int) -> np.ndarray:
+        """Ascending doc ids containing a term, over both segments."""
+        main_docs = self.main.postings(term_id)[0]
+        delta_docs = self.delta.postings(term_id)[0]
+        return np.concatenate([main_docs, delta_docs]) if len(delta_docs) else main_docs
+
+    def _score_candidates(self, candidates: np.ndarray, term_ids: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Exact scores of `candidates` over all query terms; removed docs score 0."""
+        scores = np.zeros(len(candidates), dtype=np.float32)
+        for term_id, weight in zip(term_ids, weights):
+            for segment in (self.main, self.delta):
+                docs, tf, lengths = segment.postings(term_id)
+                if len(docs) == 0:
+                    continue
+                positions = np.searchsorted(docs, candidates)
+                positions[positions == len(docs)] = 0
+                present = docs[positions] == candidates
+                matched = positions[present]
+                scores[present] += weight * self.idf[term_id] * self._impacts(tf[matched], lengths[matched])
+        scores[~self._live(candidates)] = 0
+        return scores
+
+    def get_scores(self, tokens: List[str]) -> np.ndarray:
+        """Dense scores of every document (BM25Okapi.get_scores compatible)."""
+        scores = np.zeros(self.corpus_size, dtype=np.float32)
+        term_ids, weights = self._query_terms(tokens)
+        for term_id, weight in zip(term_ids, weights):
+            for segment in (self.main, self.delta):
+                docs, tf, lengths = segment.postings(term_id)
+                scores[docs] += weight * self.idf[term_id] * self._impacts(tf, lengths)
+        scores[self.tombstones] = 0
+        return scores
+
+    def search(self, tokens: List[str], top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k documents with a positive score, using MaxScore pruning.
+
+        Terms are visited in decreasing order of their score upper bound.
+        Documents of a term are only considered while the summed upper bounds
+        of the remaining terms can still beat the current k-th best score;
+        documents found only in the pruned (low-impact) terms can never reach
+        the top-k and are not scored at all.
+
+        Returns:
+            (doc ids, scores) sorted by descending score
+        """
+        term_ids, weights = self._query_terms(tokens)
+        if top_k <= 0 or len(term_ids) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        upper_bounds = self._upper_bounds(term_ids, weights)
+        order = np.argsort(-upper_bounds, kind="stable")
+        term_ids, weights, upper_bounds = term_ids[order], weights[order], upper_bounds[order]
+        remaining_bound = np.cumsum(upper_bounds[::-1])[::-1]
+
+        candidate_docs = np.zeros(0, dtype=np.int32)
+        candidate_scores = np.zeros(0, dtype=np.float32)
+        threshold = 0.0
+        for index, term_id in enumerate(term_ids):
+            # Documents first seen in this term score at most remaining_bound[index]
+            if remaining_bound[index] <= threshold:
+                break
+            docs = self._term_docs(term_id)
+            new_docs = np.setdiff1d(docs, candidate_docs, assume_unique=True)
+            if len(new_docs) == 0:
+                continue
+            new_scores = self._score_candidates(new_docs, term_ids, weights)
+            candidate_docs = np.concatenate([candidate_docs, new_docs])
+            candidate_scores = np.concatenate([candidate_scores, new_scores])
+            if len(candidate_scores) >= top_k:
+                threshold = max(threshold, float(np.partition(candidate_scores, -top_k)[-top_k]))
+
+        positive = candidate_scores > 0
+        candidate_docs, candidate_scores = candidate_docs[positive], candidate_scores[positive]
+        if len(candidate_scores) > top_k:
+            top = np.argpartition(-candidate_scores, top_k - 1)[:top_k]
+        else:
+            top = np.arange(len(candidate_scores))
+        top = top[np.argsort(-candidate_scores[top], kind="stable")]
+        return candidate_docs[top].astype(np.int64), candidate_scores[top]
+
+
+def _pack(items: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """One UTF-8 byte buffer and the start offset of every item (plus the end)."""
+    encoded = [item.encode("utf-8") for item in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class PackedList:
+    """
+    List-like view of strings packed by `_pack`, typically memory-mapped from
+    a snapshot, with `decode` applied on access.
+
+    Items appended with `extend` are kept as Python objects, so the list can
+    keep growing as documents are added after the snapshot was loaded.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, decode: Optional[Callable[[str], Any]] = None):
+        self.data = data
+        self.offsets = offsets
+        self.decode = decode
+        self.packed = len(offsets) - 1
+        self.tail: List[Any] = []
+
+    def __len__(self) -> int:
+        return self.packed + len(self.tail)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= self.packed:
+            return self.tail[index - self.packed]
+        text = self.data[self.offsets[index]:self.offsets[index + 1]].tobytes().decode("utf-8")
+        return self.decode(text) if self.decode is not None else text
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def extend(self, items):
+        self.tail.extend(items)
+
+
+class LexicalSnapshot:
+    """
+    Immutable BM25 state: index, corpus, payloads and product id mapping.
+
+    The module swaps whole snapshots in one assignment, so a query always
+    sees a complete and consistent index. Successive snapshots share their
+    document lists, which are only appended to; a snapshot never reads past
+    its own index's corpus_size.
+    """
+
+    def __init__(self, index: BM25Index, corpus: List[str], payloads: List[dict], product_ids: List[Any], rows: Optional[Dict[Any, int]] = None):
+        self.index = index
+        self.corpus = corpus
+        self.payloads = payloads
+        self.product_ids = product_ids
+        if rows is None:
+            rows = {}
+            for row, product_id in enumerate(product_ids):
+                if product_id is not None:
+                    rows[product_id] = row
+        # Latest row of each product; shared along with the lists
+        self.rows = rows
+
+    @classmethod
+    def build(cls, corpus: List[str], payloads: List[dict], product_ids: Optional[List[Any]] = None) -> "LexicalSnapshot":
+        if product_ids is None:
+            product_ids = [None] * len(corpus)
+        index = BM25Index([tokenize(doc) for doc in corpus])
+        return cls(index, list(corpus), list(payloads), list(product_ids))
+
+    def extend(self, corpus: List[str], payloads: List[dict], product_ids: List[Any]) -> "LexicalSnapshot":
+        """
+        Append documents; documents of products already indexed are replaced.
+
+        The cost depends on the batch and the index's delta segment, not on
+        the catalog size: the document lists are appended to in place. Only
+        the newest snapshot shares its lists that way; extending an older one
+        copies them first.
+        """
+        size = self.index.corpus_size
+        base = self
+        if len(self.corpus) != size:
+            base = LexicalSnapshot(self.index, self.corpus[:size], self.payloads[:size], self.product_ids[:size])
+
+        tokenized = [tokenize(doc) for doc in corpus]
+        added_rows: Dict[Any, int] = {}
+        replaced = []
+        for offset, product_id in enumerate(product_ids):
+            if product_id is None:
+                continue
+            previous = added_rows.get(product_id, base.rows.get(product_id))
+            if previous is not None:
+                replaced.append(previous)
+            added_rows[product_id] = size + offset
+
+        index = base.index.extend(tokenized)
+        if replaced:
+            index = index.without(
+                replaced,
+                [tokenize(base.corpus[row]) if row < size else tokenized[row - size] for row in replaced],
+            )
+
+        base.corpus.extend(corpus)
+        base.payloads.extend(payloads)
+        base.product_ids.extend(product_ids)
+        base.rows.update(added_rows)
+        return LexicalSnapshot(index, base.corpus, base.payloads, base.product_ids, base.rows)
+
+    @property
+    def document_count(self) -> int:
+        return self.index.live_count
+
+
+# Current snapshot; replaced atomically, never modified in place
+_SNAPSHOT: Optional[LexicalSnapshot] = None
+# Serializes writers (incremental adds and the final step of rebuilds)
+_WRITE_LOCK = threading.Lock()
+# Serializes full rebuilds
+_REBUILD_LOCK = threading.Lock()
+# Documents added while a full rebuild is running, replayed onto its result
+_ADDED_DURING_REBUILD: Optional[List[Tuple[List[str], List[dict], List[Any]]]] = None
+
+
+def initialize_bm25(corpus: List[str], payloads: List[dict], product_ids: Optional[List[Any]] = None):
     """
     Initialize BM25 with the given corpus and store payloads for result lookup.
     """
-    global CORPUS, BM25_INSTANCE, BM25_PAYLOADS
-    CORPUS = corpus
-    BM25_PAYLOADS = payloads
-    # Tokenize the corpus for BM25
-    tokenized_corpus = [doc.lower().split() for doc in corpus]
-    BM25_INSTANCE = BM25Okapi(tokenized_corpus)
-    logger.info("BM25 initialized with corpus of size: %d", len(CORPUS))
+    global _SNAPSHOT
+    snapshot = LexicalSnapshot.build(corpus, payloads, product_ids)
+    with _WRITE_LOCK:
+        _SNAPSHOT = snapshot
+    catalog_version.bump("bm25_initialize")
+    logger.info("BM25 initialized with corpus of size: %d", len(corpus))
+
+
+def rebuild_bm25(load_documents: Callable[[], Tuple[List[str], List[dict], List[Any]]]):
+    """
+    Build a complete new index and swap it in atomically.
+
+    Queries keep using the current snapshot while `load_documents` runs and
+    the new index is built. Documents added incrementally in the meantime are
+    replayed onto the new index before the swap, so none are lost.
+
+    Args:
+        load_documents: Callable returning (corpus, payloads, product_ids)
+    """
+    global _SNAPSHOT, _ADDED_DURING_REBUILD
+    with _REBUILD_LOCK:
+        with _WRITE_LOCK:
+            _ADDED_DURING_REBUILD = []
+        try:
+            corpus, payloads, product_ids = load_documents()
+            snapshot = LexicalSnapshot.build(corpus, payloads, product_ids)
+            with _WRITE_LOCK:
+                for added in _ADDED_DURING_REBUILD:
+                    snapshot = snapshot.extend(*added)
+                _SNAPSHOT = snapshot
+            catalog_version.bump("bm25_rebuild")
+            logger.info("BM25 rebuilt with corpus of size: %d", snapshot.document_count)
+            return snapshot
+        finally:
+            with _WRITE_LOCK:
+                _ADDED_DURING_REBUILD = None
+
+
+def install_snapshot(snapshot: LexicalSnapshot):
+    """Swap in a prebuilt snapshot, e.g. one loaded from disk."""
+    global _SNAPSHOT
+    with _WRITE_LOCK:
+        _SNAPSHOT = snapshot
+    catalog_version.bump("bm25_snapshot")
+    logger.info("BM25 snapshot installed with corpus of size: %d", snapshot.document_count)
+
+
+def save_snapshot(directory: str, fingerprint: Dict[str, Any], snapshot: Optional[LexicalSnapshot] = None) -> Optional[str]:
+    """
+    Persist a snapshot under `directory` for fast startup.
+
+    Every save goes to a new subdirectory; the CURRENT pointer file is then
+    replaced atomically and older subdirectories are removed, so a crash
+    mid-save never leaves a half-written snapshot behind CURRENT.
+
+    Args:
+        directory: Snapshot root directory
+        fingerprint: Description of the catalog the snapshot was built from
+        snapshot: Snapshot to save, defaults to the current one
+
+    Returns:
+        Path of the written snapshot, or None if there was nothing to save
+    """
+    if snapshot is None:
+        snapshot = _SNAPSHOT
+    if snapshot is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    name = f"snapshot-{time.time_ns()}"
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+
+    # Persist a single segment without tombstones; the document lists may
+    # already hold rows of newer snapshots
+    index = snapshot.index.compact()
+    size = index.corpus_size
+    arrays = {
+        "offsets": index.main.offsets,
+        "doc_ids": index.main.doc_ids,
+        "tf": index.main.tf,
+        "lengths": index.main.lengths,
+        "max_tf": index.main.max_tf,
+        "min_len": index.main.min_len,
+        "doc_freq": index.doc_freq,
+    }
+    for array_name in SNAPSHOT_ARRAYS:
+        np.save(os.path.join(path, f"{array_name}.npy"), np.ascontiguousarray(arrays[array_name]))
+    # Terms by id; the shared vocabulary may hold newer terms beyond this index
+    terms = [""] * len(index.doc_freq)
+    for term, term_id in list(index.vocab.items()):
+        if term_id < len(terms):
+            terms[term_id] = term
+    documents = {
+        "vocab": terms,
+        "corpus": snapshot.corpus[:size],
+        "payloads": [json.dumps(payload, default=str) for payload in snapshot.payloads[:size]],
+        "product_ids": [json.dumps(product_id) for product_id in snapshot.product_ids[:size]],
+    }
+    for document_name in SNAPSHOT_DOCUMENTS:
+        data, offsets = _pack(documents[document_name])
+        np.save(os.path.join(path, f"{document_name}.npy"), data)
+        np.save(os.path.join(path, f"{document_name}_offsets.npy"), offsets)
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(
+            {
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "fingerprint": fingerprint,
+                "params": {"k1": index.k1, "b": index.b, "epsilon": index.epsilon},
+                "stats": {"corpus_size": size, "live_count": index.live_count, "total_length": index.total_length},
+                "documents": index.live_count,
+                "created_at": time.time(),
+            },
+            f,
+        )
+
+    pointer = os.path.join(directory, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(name)
+    os.replace(pointer + ".tmp", pointer)
+    for entry in os.listdir(directory):
+        if entry.startswith("snapshot-") and entry != name:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    logger.info("BM25 snapshot saved to %s", path)
+    return path
+
+
+def load_snapshot(directory: str, fingerprint: Dict[str, Any]) -> Optional[LexicalSnapshot]:
+    """
+    Load the current snapshot if it matches `fingerprint`.
+
+    Index arrays and packed documents are memory-mapped read-only, so
+    startup does not copy the postings or payloads into memory up front;
+    payloads are decoded when a result needs them.
+
+    Returns:
+        The snapshot, or None if there is none or it is stale or unreadable
+    """
+    try:
+        with open(os.path.join(directory, "CURRENT")) as f:
+            path = os.path.join(directory, f.read().strip())
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        logger.info("BM25 snapshot has an old format version; rebuilding")
+        return None
+    if meta.get("fingerprint") != fingerprint:
+        logger.info("BM25 snapshot is stale (%s != %s); rebuilding", meta.get("fingerprint"), fingerprint)
+        return None
+
+    try:
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in SNAPSHOT_ARRAYS
+        }
+        documents = {
+            name: (
+                np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode="r"),
+            )
+            for name in SNAPSHOT_DOCUMENTS
+        }
+    except Exception as e:
+        logger.warning("Failed to read BM25 snapshot %s: %s", path, e)
+        return None
+
+    # The vocabulary is shared with later indexes and grows, so it is a real dict
+    terms = PackedList(*documents["vocab"])
+    vocab = {term: term_id for term_id, term in enumerate(terms)}
+    index = BM25Index.from_arrays(meta["params"], vocab, arrays, meta["stats"])
+    return LexicalSnapshot(
+        index,
+        PackedList(*documents["corpus"]),
+        PackedList(*documents["payloads"], decode=json.loads),
+        PackedList(*documents["product_ids"], decode=json.loads),
+    )
+
+
+def add_documents(corpus: List[str], payloads: List[dict], product_ids: List[Any]) -> bool:
+    """
+    Add newly upserted products to the live index without a full rebuild.
+
+    Ignored (returns False) while no index exists yet; the first full build
+    reads every product from the collection anyway.
+    """
+    global _SNAPSHOT
+    if not corpus:
+        return False
+    with _WRITE_LOCK:
+        if _ADDED_DURING_REBUILD is not None:
+            _ADDED_DURING_REBUILD.append((list(corpus), list(payloads), list(product_ids)))
+        if _SNAPSHOT is None:
+            return False
+        _SNAPSHOT = _SNAPSHOT.extend(corpus, payloads, product_ids)
+    catalog_version.bump("bm25_add_documents")
+    logger.info("Added %d documents to BM25 index", len(corpus))
+    return True
+
+
+def is_initialized() -> bool:
+    """Return True once an index has been built."""
+    return _SNAPSHOT is not None
+
+
+def indexed_payloads() -> List[dict]:
+    """Payloads of the latest version of every indexed product (empty before initialization)."""
+    snapshot = _SNAPSHOT
+    if snapshot is None:
+        return []
+    size = snapshot.index.corpus_size
+    # The row mapping is shared with newer snapshots; copy it in one step
+    rows = sorted(row for row in list(snapshot.rows.values()) if row < size)
+    return [snapshot.payloads[row] for row in rows]
+
+
+def mark_ingest(complete: bool, directory: str = BM25_SNAPSHOT_DIR) -> Dict[str, Any]:
+    """
+    Record that a catalog import started (complete=False) or finished.
+
+    The stamp is part of the snapshot fingerprint, so a snapshot saved before
+    an import is not loaded afterwards even when the import only replaced
+    products and the point count stayed the same.
+    """
+    stamp = {"stamp": uuid.uuid4().hex, "complete": complete}
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, INGEST_STAMP_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(stamp, f)
+    os.replace(path + ".tmp", path)
+    return stamp
+
+
+def read_ingest_stamp(directory: str = BM25_SNAPSHOT_DIR) -> Optional[Dict[str, Any]]:
+    """The stamp of the last import, or None if there was none."""
+    try:
+        with open(os.path.join(directory, INGEST_STAMP_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+metrics.gauge(
+    "bm25_documents",
+    "Documents searchable in the BM25 index",
+    lambda: _SNAPSHOT.document_count if _SNAPSHOT is not None else None,
+)
+metrics.gauge(
+    "bm25_terms",
+    "Distinct terms in the BM25 index",
+    lambda: int((_SNAPSHOT.index.doc_freq > 0).sum()) if _SNAPSHOT is not None else None,
+)
+
+
+def _format_results(snapshot: LexicalSnapshot, top_indices: np.ndarray, top_scores: np.ndarray) -> List[Dict[str, Any]]:
+    # Only documents with a positive score are returned by the index
+    results = []
+    for idx, score in zip(top_indices.tolist(), top_scores.tolist()):
+        results.append({
+            "id": idx,
+            "product_id": snapshot.product_ids[idx],
+            "score": float(score),
+            "payload": snapshot.payloads[idx]
+        })
+    return results
+
 
 def search_products_bm25(query: str, top_k: int = 5) -> List[Dict[str, Any]]:
     """
     Perform BM25 search on the products.
     """
-    if BM25_INSTANCE is None:
+    snapshot = _SNAPSHOT
+    if snapshot is None:
         raise RuntimeError("BM25 not initialized. Please call initialize_bm25 first.")
-    
+
     # Tokenize the query in the same way as the corpus
-    tokenized_query = query.lower().split()
-    scores = BM25_INSTANCE.get_scores(tokenized_query)
-    top_indices = np.argsort(scores)[::-1][:top_k]
-    
-    # Format results
-    results = []
-    for idx in top_indices:
-        if scores[idx] > 0:  # Only include results with positive score
-            results.append({
-                "id": idx,
-                "score": float(scores[idx]),
-                "payload": BM25_PAYLOADS[idx]
-            })
-    
+    top_indices, top_scores = snapshot.index.search(tokenize(query), top_k=top_k)
+    results = _format_results(snapshot, top_indices, top_scores)
+
     logger.info("BM25 search completed. Found %d results", len(results))
-    return results
\ No newline at end of file
+    return results
+
+
+def search_products_bm25_batch(queries: List[str], top_k: List[int]) -> List[List[Dict[str, Any]]]:
+    """
+    BM25 search of many queries against one index snapshot.
+
+    Queries with the same tokens are scored once at their largest top_k.
+    """
+    snapshot = _SNAPSHOT
+    if snapshot is None:
+        raise RuntimeError("BM25 not initialized. Please call initialize_bm25 first.")
+
+    token_keys = [tuple(tokenize(query)) for query in queries]
+    depth: Dict[Tuple[str, ...], int] = {}
+    for tokens, k in zip(token_keys, top_k):
+        depth[tokens] = max(depth.get(tokens, 0), k)
+    ranked = {tokens: snapshot.index.search(list(tokens), top_k=k) for tokens, k in depth.items()}
+
+    results = []
+    for tokens, k in zip(token_keys, top_k):
+        top_indices, top_scores = ranked[tokens]
+        results.append(_format_results(snapshot, top_indices[:k], top_scores[:k]))
+    logger.info("BM25 batch search of %d queries completed.", len(queries))
+    return results
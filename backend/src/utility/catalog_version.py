@@ -0,0 +1,37 @@
+# src/utility/catalog_version.py
+import threading
+import time
+from typing import Callable, List, Optional
+from src.utility.metrics import metrics
+
+
+class CatalogVersion:
+    """
+    Version of everything a search result depends on.
+
+    Bumped whenever products are inserted, the lexical index is rebuilt or
+    a model is swapped. Cache keys embed the version, so entries computed
+    against an older catalog are never looked up again and simply age out.
+    """
+
+    def __init__(self):
+        self.value = 0
+        self.bumped_at: Optional[float] = None
+        self.last_reason: Optional[str] = None
+        self._lock = threading.Lock()
+        self.listeners: List[Callable[[], None]] = []
+
+    def bump(self, reason: str) -> int:
+        with self._lock:
+            self.value += 1
+            self.bumped_at = time.time()
+            self.last_reason = reason
+            version = self.value
+        for listener in self.listeners:
+            listener()
+        return version
+
+
+catalog_version = CatalogVersion()
+
+metrics.gauge("catalog_version", "Catalog version; increases on every import, index rebuild and model swap", lambda: catalog_version.value)
@@ -1,7 +1,7 @@
 # src/utility/data_loader.py
 import pandas as pd
 import os
-from src.utility.embedding_model import EmbeddingModel
+from src.utility.model_registry import model_registry, EMBEDDING_MODEL
 from src.utility.logger import get_logger
 
 logger = get_logger(__name__)
@@ -23,7 +23,7 @@ def process_and_generate_embeddings(file_path):
     """Load CSV, merge title and description, generate embeddings, and return processed data."""
     try:
         data = load_csv(file_path)
-        model = EmbeddingModel()
+        model = model_registry.get(EMBEDDING_MODEL)
         # Merge title and description columns
         data["merged_text"] = data["title_left"] + " " + data["description_left"]
         logger.info("Merged 'title' and 'description' columns.")
@@ -0,0 +1,399 @@
+# src/utility/dedup.py
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.utility.logger import get_logger
+from src.utility.metrics import metrics
+
+logger = get_logger(__name__)
+
+# Cluster near-duplicate offers at ingestion and collapse them in results
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+# Character shingle length and MinHash signature size; the signature is
+# split into DEDUP_BANDS LSH bands of DEDUP_NUM_PERM / DEDUP_BANDS values
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "5"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "64"))
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))
+# Estimated Jaccard similarity of shingle sets at which two offers are duplicates
+DEDUP_JACCARD_THRESHOLD = float(os.getenv("DEDUP_JACCARD_THRESHOLD", "0.7"))
+# Cosine similarity of embeddings at which two offers of one batch are duplicates
+DEDUP_COSINE_THRESHOLD = float(os.getenv("DEDUP_COSINE_THRESHOLD", "0.97"))
+# Offers remembered per LSH bucket; bounds the work per new offer
+DEDUP_BUCKET_LIMIT = int(os.getenv("DEDUP_BUCKET_LIMIT", "8"))
+# File the index is saved to after every import and loaded from on first use
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", os.path.join("data", "index", "dedup.npz"))
+
+# Mersenne prime for the universal hash family (a * x + b) mod p; with
+# a, x < 2^31 the product fits in 64 bits and every value fits in 32
+_PRIME = np.uint64((1 << 31) - 1)
+# Signature value of texts too short to shingle; never produced by the hashes
+_EMPTY = np.uint32(0xFFFFFFFF)
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# str() of missing payload fields and WDC language tags ("..."@en), left out
+# of the shingled text
+_MISSING_TOKENS = re.compile(r"\b(?:nan|none|null)\b|@[a-z]{2}\b")
+# Model numbers, sizes and capacities: tokens of 3+ characters with a digit
+_MODEL_TOKEN = re.compile(r"\b(?=[0-9a-z]*[0-9])[0-9a-z]{3,}\b")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, drop missing-value markers and collapse punctuation to single spaces."""
+    text = _MISSING_TOKENS.sub(" ", str(text).lower())
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def _model_key(text: str) -> int:
+    """
+    CRC-32 of the model-number-like tokens of a normalized text, 0 if it has none.
+
+    Variants of one product line (GA-1555 vs GA-1556) share almost all of
+    their text; offers are only merged when these tokens agree. The key is
+    saved with the index, so it must not depend on the process's hash seed.
+    """
+    tokens = sorted(set(_MODEL_TOKEN.findall(text)))
+    return (zlib.crc32(" ".join(tokens).encode("utf-8")) or 1) if tokens else 0
+
+
+def _shingle_hashes(texts: Sequence[str], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    32-bit hashes of every character k-gram of every text, in one pass.
+
+    The texts are concatenated into one byte array and each k-gram is hashed
+    as a polynomial of its bytes, so no Python code runs per shingle.
+
+    Returns:
+        (hashes of all texts back to back, number of hashes per text)
+    """
+    encoded = [text.encode("utf-8") for text in texts]
+    lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+    counts = np.maximum(lengths - k + 1, 0)
+    if not counts.any():
+        return np.zeros(0, dtype=np.uint64), counts
+
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+    windows = np.lib.stride_tricks.sliding_window_view(data, k)
+    powers = np.uint64(257) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    hashes = (windows * powers).sum(axis=1, dtype=np.uint64) & np.uint64(0xFFFFFFFF)
+
+    # Keep only windows that start and end inside the same text
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    keep = np.concatenate([np.arange(start, start + count) for start, count in zip(starts, counts) if count])
+    return hashes[keep], counts
+
+
+class MinHasher:
+    """MinHash signatures of shingle sets from a fixed family of universal hashes."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, shingle_size: int = DEDUP_SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.a = rng.integers(1, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        One uint32 signature row per normalized text; texts too short to
+        shingle get an all-empty row, which never matches anything.
+        """
+        hashes, counts = _shingle_hashes(texts, self.shingle_size)
+        signatures = np.full((len(texts), self.num_perm), _EMPTY, dtype=np.uint32)
+        if not hashes.size:
+            return signatures
+        present = counts > 0
+        offsets = np.concatenate(([0], np.cumsum(counts[present])[:-1]))
+        permuted = (self.a * (hashes % _PRIME)[None, :] + self.b) % _PRIME
+        signatures[present] = np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+        return signatures
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first: int, second: int):
+        first, second = self.find(first), self.find(second)
+        # The earlier offer stays the root, so it becomes the canonical one
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def _compatible(first: int, second: int) -> bool:
+    # Offers without model tokens are judged on their text alone
+    return first == second or not first or not second
+
+
+class NearDuplicateIndex:
+    """
+    Catalog-wide near-duplicate clusters, built incrementally during ingestion.
+
+    Each batch of offers is clustered in three steps, all vectorized or
+    bounded per offer:
+
+    1. MinHash signatures of the character shingles of every offer's text.
+    2. LSH: offers sharing a band with an earlier offer (of this or any
+       previous batch) are candidates, confirmed by the estimated Jaccard
+       similarity of their signatures.
+    3. One cosine-similarity matrix product over the batch's embeddings,
+       which also catches paraphrased offers with little text overlap.
+
+    Every cluster's canonical id is the id of its first offer ever seen.
+    Work per offer is a fixed number of bucket lookups, so clustering a
+    whole catalog grows linearly with its size.
+
+    The index is saved to `path` after every import and loaded from it on
+    first use, so later imports are clustered against the whole catalog
+    rather than only the offers imported since startup.
+
+    Clustering does not drop offers: duplicates are still stored, each with
+    its own payload, and only record their cluster's canonical id. Search
+    collapses each cluster to one result at query time (collapse_duplicates).
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEDUP_NUM_PERM,
+        bands: int = DEDUP_BANDS,
+        jaccard_threshold: float = DEDUP_JACCARD_THRESHOLD,
+        cosine_threshold: float = DEDUP_COSINE_THRESHOLD,
+        bucket_limit: int = DEDUP_BUCKET_LIMIT,
+        shingle_size: int = DEDUP_SHINGLE_SIZE,
+        path: Optional[str] = DEDUP_INDEX_PATH,
+    ):
+        if num_perm % bands:
+            raise ValueError(f"DEDUP_NUM_PERM ({num_perm}) must be a multiple of DEDUP_BANDS ({bands})")
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.jaccard_threshold = jaccard_threshold
+        self.cosine_threshold = cosine_threshold
+        self.bucket_limit = bucket_limit
+        # Signatures and canonical ids of indexed offers, by row
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        self._size = 0
+        self._canonical: List[Any] = []
+        self._model_keys: List[int] = []
+        self._buckets: Dict[Tuple[int, bytes], List[int]] = {}
+        self._row_of: Dict[Any, int] = {}
+        self.duplicates = 0
+        self.path = path
+        self._loaded = path is None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, count: int):
+        needed = self._size + count
+        if needed > len(self._signatures):
+            grown = np.zeros((max(needed, 2 * len(self._signatures), 1024), self._signatures.shape[1]), dtype=np.uint32)
+            grown[:self._size] = self._signatures[:self._size]
+            self._signatures = grown
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        if signature[0] == _EMPTY:
+            return []
+        bands = signature.reshape(self.bands, self.rows)
+        return [(band, bands[band].tobytes()) for band in range(self.bands)]
+
+    def _lsh_match(self, signature: np.ndarray, keys: List[Tuple[int, bytes]], model_key: int) -> Optional[int]:
+        """Row of the most similar indexed offer above the Jaccard threshold, if any."""
+        candidates = {
+            row for key in keys for row in self._buckets.get(key, ())
+            if _compatible(model_key, self._model_keys[row])
+        }
+        if not candidates:
+            return None
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._signatures[rows] == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        return int(rows[best]) if similarity[best] >= self.jaccard_threshold else None
+
+    def _index(self, product_id: Any, signature: np.ndarray, keys: List[Tuple[int, bytes]], model_key: int, canonical: Any):
+        row = self._size
+        self._signatures[row] = signature
+        self._size += 1
+        self._row_of[product_id] = row
+        self._canonical.append(canonical)
+        self._model_keys.append(model_key)
+        for key in keys:
+            bucket = self._buckets.setdefault(key, [])
+            if len(bucket) < self.bucket_limit:
+                bucket.append(row)
+
+    def _ensure_loaded(self):
+        """Load the saved index once; called with the lock held."""
+        if self._loaded:
+            return
+        self._loaded = True
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as saved:
+                signatures = saved["signatures"]
+                model_keys = saved["model_keys"].tolist()
+                ids = json.loads(saved["ids"].tobytes().decode("utf-8"))
+                num_perm, shingle_size = saved["params"].tolist()
+        except Exception as e:
+            logger.warning("Failed to load the near-duplicate index from %s: %s", self.path, e)
+            return
+        if (num_perm, shingle_size) != (self.hasher.num_perm, self.hasher.shingle_size):
+            logger.warning("Ignoring the near-duplicate index at %s: built with different MinHash parameters", self.path)
+            return
+        # Re-inserting in the original order rebuilds the same buckets
+        self._reserve(len(model_keys))
+        for signature, model_key, (product_id, canonical) in zip(signatures, model_keys, ids):
+            self._index(product_id, signature, self._band_keys(signature), model_key, canonical)
+            self.duplicates += canonical != product_id
+        logger.info("Loaded near-duplicate index of %d offers from %s", self._size, self.path)
+
+    def save(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Write the index to `path` (default: the path it was created with).
+
+        The file is written next to the target and moved into place, so a
+        crash mid-save keeps the previous version.
+        """
+        path = path or self.path
+        if path is None:
+            return None
+        with self._lock:
+            self._ensure_loaded()
+            size = self._size
+            signatures = self._signatures[:size].copy()
+            model_keys = np.asarray(self._model_keys[:size], dtype=np.int64)
+            # _row_of is filled in row order
+            ids = [[product_id, canonical] for product_id, canonical in zip(self._row_of, self._canonical[:size])]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                signatures=signatures,
+                model_keys=model_keys,
+                ids=np.frombuffer(json.dumps(ids).encode("utf-8"), dtype=np.uint8),
+                params=np.array([self.hasher.num_perm, self.hasher.shingle_size], dtype=np.int64),
+            )
+        os.replace(path + ".tmp", path)
+        logger.info("Saved near-duplicate index of %d offers to %s", size, path)
+        return path
+
+    def assign(self, product_ids: Sequence[Any], texts: Sequence[str], embeddings: Optional[np.ndarray] = None) -> List[Any]:
+        """
+        Cluster a batch of offers against each other and the catalog so far.
+
+        Args:
+            product_ids: Ids of the offers, in import order
+            texts: Text of each offer the shingles are taken from
+            embeddings: Optional embedding per offer for the in-batch cosine check
+
+        Returns:
+            The canonical id of each offer (its own id unless it duplicates
+            an earlier offer)
+        """
+        count = len(product_ids)
+        if count == 0:
+            return []
+        texts = [normalize_text(text) for text in texts]
+        signatures = self.hasher.signatures(texts)
+        model_keys = [_model_key(text) for text in texts]
+
+        # In-batch cosine pairs, from one matrix product
+        batch_links = _UnionFind(count)
+        if embeddings is not None and count > 1:
+            vectors = np.asarray(embeddings, dtype=np.float32)
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+            keys = np.array(model_keys, dtype=np.int64)
+            compatible = (keys[:, None] == keys[None, :]) | (keys == 0)[:, None] | (keys == 0)[None, :]
+            similar = np.triu((vectors @ vectors.T >= self.cosine_threshold) & compatible, k=1)
+            for first, second in zip(*np.nonzero(similar)):
+                batch_links.union(int(first), int(second))
+
+        canonical_ids = []
+        with self._lock:
+            self._ensure_loaded()
+            self._reserve(count)
+            for index, (product_id, signature, model_key) in enumerate(zip(product_ids, signatures, model_keys)):
+                known_row = self._row_of.get(product_id)
+                if known_row is not None:
+                    # Re-imported offer keeps its cluster
+                    canonical_ids.append(self._canonical[known_row])
+                    continue
+                keys = self._band_keys(signature)
+                row = self._lsh_match(signature, keys, model_key) if keys else None
+                if row is not None:
+                    canonical = self._canonical[row]
+                else:
+                    root = batch_links.find(index)
+                    canonical = canonical_ids[root] if root != index else product_id
+                if canonical != product_id:
+                    self.duplicates += 1
+                canonical_ids.append(canonical)
+
+                # Index the offer, so later offers of this batch see it too
+                self._index(product_id, signature, keys, model_key, canonical)
+        return canonical_ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "offers": self._size,
+            "clusters": self._size - self.duplicates,
+            "duplicates": self.duplicates,
+            "buckets": len(self._buckets),
+        }
+
+
+near_duplicates = NearDuplicateIndex()
+
+metrics.gauge("dedup_offers", "Offers in the near-duplicate index", lambda: len(near_duplicates))
+metrics.gauge("dedup_duplicates", "Offers clustered under an earlier canonical offer", lambda: near_duplicates.duplicates)
+
+
+def _canonical_id(result: Dict[str, Any]) -> Any:
+    return result.get("payload", {}).get("canonical_id", result.get("product_id"))
+
+
+def collapse_duplicates(
+    semantic_results: List[Dict[str, Any]],
+    lexical_results: List[Dict[str, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Keep one result per near-duplicate cluster in each leg.
+
+    Each leg keeps its best-ranked member of a cluster. A lexical hit whose
+    cluster is represented by a different product on the semantic side is
+    re-keyed to that product, so fusion combines the evidence of both legs
+    for the cluster rather than listing it twice.
+    """
+    representative: Dict[Any, Any] = {}
+    semantic = []
+    for result in semantic_results:
+        canonical = _canonical_id(result)
+        if canonical in representative:
+            continue
+        representative[canonical] = result.get("product_id")
+        semantic.append(result)
+
+    lexical = []
+    seen = set()
+    for result in lexical_results:
+        canonical = _canonical_id(result)
+        if canonical in seen:
+            continue
+        seen.add(canonical)
+        product_id = representative.get(canonical, result.get("product_id"))
+        if product_id != result.get("product_id"):
+            result = {**result, "product_id": product_id}
+        lexical.append(result)
+    return semantic, lexical
@@ -1,14 +1,55 @@
 # src/embedding_model.py
-from sentence_transformers import SentenceTransformer
+import os
+from typing import List, Optional
 import numpy as np
 
+# Inference backend: "torch" (sentence-transformers) or "onnx" (int8 ONNX Runtime)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# Directory written by `python -m src.utility.onnx_embedding export`
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx")
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
 
 class EmbeddingModel:
     """A class to generate embeddings using a pre-trained model."""
 
-    def __init__(self):
-        self.model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    def __init__(self, backend: str = EMBEDDING_BACKEND, model_name_or_path: Optional[str] = None):
+        self.backend = backend
+        if backend == "onnx":
+            # Imported lazily so the ONNX backend never loads PyTorch
+            from src.utility.onnx_embedding import OnnxSentenceEncoder
+
+            self.source = model_name_or_path or EMBEDDING_ONNX_DIR
+            self.model = OnnxSentenceEncoder(self.source)
+        else:
+            from sentence_transformers import SentenceTransformer
+
+            self.source = model_name_or_path or EMBEDDING_MODEL_NAME
+            self.model = SentenceTransformer(self.source)
+
+    @property
+    def version(self) -> str:
+        return f"{self.backend}:{self.source}"
+
+    def memory_bytes(self) -> int:
+        """Size of the model weights held in memory."""
+        if self.backend == "onnx":
+            return self.model.memory_bytes()
+        return sum(tensor.numel() * tensor.element_size() for tensor in list(self.model.parameters()) + list(self.model.buffers()))
 
     def get_embedding(self, text: str) -> np.ndarray:
         """Generate an embedding for the given text."""
         return np.array(self.model.encode(text))
+
+    def get_embeddings(self, texts: List[str], batch_size: int = 64) -> np.ndarray:
+        """Generate embeddings for a list of texts in batches of `batch_size`."""
+        if not texts:
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        return np.asarray(
+            self.model.encode(
+                list(texts),
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        )
@@ -0,0 +1,123 @@
+# src/utility/embedding_service.py
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+from src.utility.logger import get_logger
+
+logger = get_logger(__name__)
+
+# How long the first query of a batch waits for others to join it
+EMBED_BATCH_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "3"))
+# Upper bound on the number of queries encoded in one forward pass
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "32"))
+
+_STOP = object()
+
+
+class EmbeddingService:
+    """
+    Dynamic micro-batching front end for an EmbeddingModel.
+
+    Queries submitted from concurrent requests are collected for at most
+    `max_wait_ms` (or until `max_batch_size` queries are waiting) and encoded
+    in one batched call on a dedicated worker thread. Every caller gets its
+    own vector back through a future.
+
+    `get_model` is called for every batch, so the model can be loaded lazily
+    and replaced while the service is running.
+    """
+
+    def __init__(self, get_model: Callable[[], Any], max_batch_size: int = EMBED_MAX_BATCH, max_wait_ms: float = EMBED_BATCH_WAIT_MS):
+        self.get_model = get_model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.queries = 0
+
+    def start(self):
+        """Start the worker thread if it is not running yet."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="embedding-service", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the worker thread after the queries already queued are served."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(_STOP)
+                self._thread.join(timeout=5)
+            self._thread = None
+
+    def submit(self, text: str) -> Future:
+        """Queue a query for embedding and return a future for its vector."""
+        self.start()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a query, blocking until its batch has been encoded."""
+        return self.submit(text).result()
+
+    async def embed_async(self, text: str) -> np.ndarray:
+        """Embed a query without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": round(self.queries / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def _collect_batch(self, first) -> Tuple[List[Tuple[str, Future]], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _worker(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stopping = self._collect_batch(first)
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Identical queries in the same window share one encode
+            unique_texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                embeddings = self.get_model().get_embeddings(unique_texts, batch_size=len(unique_texts))
+            except Exception as e:
+                logger.error(f"Error while encoding batch of {len(batch)} queries: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            vectors = dict(zip(unique_texts, embeddings))
+            for text, future in batch:
+                future.set_result(vectors[text])
+            self.batches += 1
+            self.queries += len(batch)
@@ -0,0 +1,132 @@
+# src/utility/fusion.py
+import os
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+
+FUSION_METHODS = ("minmax", "rrf")
+# Default fusion: weighted min-max score blending or reciprocal rank fusion
+FUSION_METHOD = os.getenv("FUSION_METHOD", "minmax").lower()
+# RRF rank offset; larger values flatten the advantage of the top ranks
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def _factorize(ids: Sequence[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Map product ids to dense codes 0..n-1 in order of first appearance."""
+    positions: Dict[Any, int] = {}
+    codes = np.fromiter((positions.setdefault(pid, len(positions)) for pid in ids), dtype=np.int64, count=len(ids))
+    return codes, list(positions)
+
+
+def min_max_normalize(scores: np.ndarray) -> np.ndarray:
+    """
+    Scale scores to [0, 1].
+
+    Constant scores (e.g. a single lexical hit) map to 1: every candidate
+    ties for best rather than losing the leg's weight entirely.
+    """
+    if scores.size == 0:
+        return scores
+    low, high = scores.min(), scores.max()
+    if high == low:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def reciprocal_ranks(scores: np.ndarray, rrf_k: int = RRF_K) -> np.ndarray:
+    """1 / (rrf_k + rank) for every candidate, rank 1 being the best score."""
+    ranks = np.empty(scores.size, dtype=np.float64)
+    ranks[np.argsort(-scores, kind="stable")] = np.arange(1, scores.size + 1)
+    return 1.0 / (rrf_k + ranks)
+
+
+def fuse_scores(
+    semantic_ids: Sequence[Any],
+    semantic_scores: np.ndarray,
+    lexical_ids: Sequence[Any],
+    lexical_scores: np.ndarray,
+    method: str = FUSION_METHOD,
+    semantic_weight: float = 0.7,
+    rrf_k: int = RRF_K,
+) -> Tuple[List[Any], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Fuse two candidate lists on their product ids.
+
+    With "minmax", each leg's scores are min-max normalized and blended as
+    `semantic_weight * semantic + (1 - semantic_weight) * lexical`; with
+    "rrf", the same weights apply to the legs' reciprocal ranks. A product
+    missing from a leg gets 0 from that leg.
+
+    Returns:
+        (product_ids, fused scores, position of each product in the semantic
+        leg or -1, position in the lexical leg or -1)
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"Unknown fusion method '{method}', expected one of {FUSION_METHODS}")
+    semantic_count = len(semantic_ids)
+    codes, product_ids = _factorize(list(semantic_ids) + list(lexical_ids))
+    semantic_codes, lexical_codes = codes[:semantic_count], codes[semantic_count:]
+
+    if method == "rrf":
+        semantic_part = reciprocal_ranks(semantic_scores, rrf_k)
+        lexical_part = reciprocal_ranks(lexical_scores, rrf_k)
+    else:
+        semantic_part = min_max_normalize(semantic_scores)
+        lexical_part = min_max_normalize(lexical_scores)
+
+    fused = np.zeros(len(product_ids), dtype=np.float64)
+    semantic_position = np.full(len(product_ids), -1, dtype=np.int64)
+    lexical_position = np.full(len(product_ids), -1, dtype=np.int64)
+    # Assign in reverse so the best-ranked duplicate of an id wins
+    semantic_position[semantic_codes[::-1]] = np.arange(semantic_count)[::-1]
+    lexical_position[lexical_codes[::-1]] = np.arange(len(lexical_codes))[::-1]
+
+    has_semantic = semantic_position >= 0
+    has_lexical = lexical_position >= 0
+    fused[has_semantic] += semantic_weight * semantic_part[semantic_position[has_semantic]]
+    fused[has_lexical] += (1 - semantic_weight) * lexical_part[lexical_position[has_lexical]]
+    return product_ids, fused, semantic_position, lexical_position
+
+
+def fuse_results(
+    semantic_results: List[Dict[str, Any]],
+    lexical_results: List[Dict[str, Any]],
+    top_k: int,
+    method: str = FUSION_METHOD,
+    semantic_weight: float = 0.7,
+    rrf_k: int = RRF_K,
+) -> List[Dict[str, Any]]:
+    """
+    Fuse semantic and lexical result lists into the top_k hybrid results.
+
+    Both lists must carry "product_id"; payloads are taken from the semantic
+    result when a product appears in both.
+    """
+    semantic_results = [r for r in semantic_results if r.get("product_id") is not None]
+    lexical_results = [r for r in lexical_results if r.get("product_id") is not None]
+    product_ids, fused, semantic_position, lexical_position = fuse_scores(
+        [r["product_id"] for r in semantic_results],
+        np.fromiter((r.get("score", 0.0) for r in semantic_results), dtype=np.float64, count=len(semantic_results)),
+        [r["product_id"] for r in lexical_results],
+        np.fromiter((r.get("score", 0.0) for r in lexical_results), dtype=np.float64, count=len(lexical_results)),
+        method=method,
+        semantic_weight=semantic_weight,
+        rrf_k=rrf_k,
+    )
+
+    k = min(top_k, len(product_ids))
+    if k <= 0:
+        return []
+    top = np.argpartition(-fused, k - 1)[:k]
+    top = top[np.argsort(-fused[top], kind="stable")]
+
+    combined_results = []
+    for code in top.tolist():
+        position = semantic_position[code]
+        source = semantic_results[position] if position >= 0 else lexical_results[lexical_position[code]]
+        combined_results.append({
+            "id": product_ids[code],
+            "score": float(fused[code]),
+            "payload": source.get("payload", {}),
+            "source": "hybrid",
+        })
+    return combined_results
@@ -0,0 +1,162 @@
+# src/utility/gazetteer.py
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# Payload fields feeding each gazetteer entity kind
+BRAND_FIELDS = ["brand_left", "brand_right"]
+CATEGORY_FIELDS = ["category_left", "category_right"]
+
+# Attribute vocabulary that is not stored as a payload field
+ATTRIBUTE_TERMS = [
+    "red", "blue", "green", "black", "white", "silver", "gold", "grey", "gray",
+    "pink", "purple", "yellow", "orange", "brown",
+    "wireless", "bluetooth", "waterproof", "digital", "portable", "refurbished",
+    "leather", "stainless steel", "4k", "hd", "full hd",
+]
+
+# Values that never make useful gazetteer terms
+_EMPTY_VALUES = {"", "nan", "none", "null"}
+_LANG_TAG = re.compile(r'^"?(.*?)"?(@[a-z\-]+)?$', re.IGNORECASE)
+MAX_TERM_WORDS = 5
+
+
+def normalize_term(value) -> str:
+    """
+    Normalize a catalog value into a gazetteer term.
+
+    Strips WDC-style quoting and language tags ('"Canon"@en'), replaces
+    underscores and collapses whitespace. Returns "" for unusable values.
+    """
+    text = str(value).strip()
+    text = _LANG_TAG.match(text).group(1)
+    text = " ".join(text.replace("_", " ").lower().split())
+    if text in _EMPTY_VALUES or len(text) < 2 or len(text.split()) > MAX_TERM_WORDS:
+        return ""
+    return text
+
+
+class AhoCorasick:
+    """
+    Compiled multi-pattern matcher over characters.
+
+    All patterns are found in a single pass over the text, independent of the
+    number of patterns.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: object):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first."""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, object]]:
+        """Yield (start, end, value) for every pattern occurrence in `text`."""
+        if not self._built:
+            self.build()
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for length, value in self._output[node]:
+                yield index - length + 1, index + 1, value
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+class Gazetteer:
+    """
+    Brand, category and attribute dictionary built from the indexed catalog.
+    """
+
+    def __init__(self):
+        self.matcher = AhoCorasick()
+        self.term_count = 0
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[dict]) -> "Gazetteer":
+        """Build a gazetteer from product payloads plus the attribute vocabulary."""
+        terms: Dict[str, set] = {}
+
+        def add(value, kind):
+            term = normalize_term(value)
+            if term:
+                terms.setdefault(term, set()).add(kind)
+
+        for payload in payloads:
+            for field in BRAND_FIELDS:
+                add(payload.get(field, ""), "brand")
+            for field in CATEGORY_FIELDS:
+                add(payload.get(field, ""), "category")
+        for term in ATTRIBUTE_TERMS:
+            add(term, "attribute")
+
+        gazetteer = cls()
+        for term, kinds in terms.items():
+            for kind in sorted(kinds):
+                gazetteer.matcher.add(term, (kind, term))
+        gazetteer.matcher.build()
+        gazetteer.term_count = len(terms)
+        return gazetteer
+
+    def match(self, query: str) -> Dict[str, List[str]]:
+        """
+        Find catalog terms in a query.
+
+        Only whole-word matches are kept; overlapping matches resolve to the
+        leftmost, then longest, term.
+
+        Returns:
+            Dict with "brand", "category" and "attribute" lists of matched terms
+        """
+        text = query.lower()
+        spans: Dict[Tuple[int, int], list] = {}
+        for start, end, value in self.matcher.iter_matches(text):
+            if start > 0 and text[start - 1].isalnum():
+                continue
+            if end < len(text) and text[end].isalnum():
+                continue
+            spans.setdefault((start, end), []).append(value)
+
+        found = {"brand": [], "category": [], "attribute": []}
+        covered_until = 0
+        for start, end in sorted(spans, key=lambda span: (span[0], -span[1])):
+            if start < covered_until:
+                continue
+            for kind, term in spans[(start, end)]:
+                if term not in found[kind]:
+                    found[kind].append(term)
+            covered_until = end
+        return found
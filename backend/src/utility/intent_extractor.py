@@ -1,6 +1,21 @@
 from transformers import pipeline
+import os
 import re
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, List, Optional
+from src.utility.gazetteer import Gazetteer
+
+# Queries per NER forward pass in batch intent extraction
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "32"))
+
+_AMOUNT = r"\$?\s*(\d[\d,]*(?:\.\d+)?)"
+# Price phrases mapped to range operators of the search filter
+PRICE_PATTERNS = [
+    (re.compile(r"\bbetween " + _AMOUNT + r" and " + _AMOUNT, re.IGNORECASE), ("gte", "lte")),
+    (re.compile(r"\b(?:under|below|less than|cheaper than) " + _AMOUNT, re.IGNORECASE), ("lt",)),
+    (re.compile(r"\b(?:up to|at most|max(?:imum)?) " + _AMOUNT, re.IGNORECASE), ("lte",)),
+    (re.compile(r"\b(?:over|above|more than) " + _AMOUNT, re.IGNORECASE), ("gt",)),
+    (re.compile(r"\bat least " + _AMOUNT, re.IGNORECASE), ("gte",)),
+]
 
 
 class IntentExtractor:
@@ -8,13 +23,58 @@ class IntentExtractor:
     A class to extract intent components from user queries using a pre-trained NER model.
     """
 
-    def __init__(self):
+    def __init__(self, model_name: str = "dslim/distilbert-NER"):
         # Load the pre-trained NER model
+        self.model_name = model_name
         self.ner_model = pipeline(
             "ner",
-            model="dslim/distilbert-NER",
+            model=model_name,
             aggregation_strategy="simple",
         )
+        # Catalog gazetteer for the fast path; only the attribute vocabulary
+        # until update_catalog is called with the indexed payloads
+        self.gazetteer = Gazetteer.from_payloads([])
+
+    @property
+    def version(self) -> str:
+        return self.model_name
+
+    def memory_bytes(self) -> int:
+        """Size of the NER model weights held in memory."""
+        model = self.ner_model.model
+        return sum(tensor.numel() * tensor.element_size() for tensor in list(model.parameters()) + list(model.buffers()))
+
+    def update_catalog(self, payloads: Iterable[dict]):
+        """
+        Rebuild the gazetteer from the indexed product payloads.
+
+        The new matcher is compiled before it replaces the old one, so queries
+        running concurrently always see a complete gazetteer.
+        """
+        self.gazetteer = Gazetteer.from_payloads(payloads)
+
+    def _fast_path(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Extract intent with the gazetteer and regexes only.
+
+        Returns:
+            Intent components, or None if nothing was recognized
+        """
+        matches = self.gazetteer.match(query)
+        intent_components = {
+            "primary_intent": None,
+            "product_type": matches["category"][0] if matches["category"] else None,
+            "desired_attributes": list(matches["attribute"]),
+            "constraints": list(matches["brand"]),
+        }
+        self._apply_regex_fallbacks(query, intent_components)
+        if not (intent_components["product_type"]
+                or intent_components["desired_attributes"]
+                or intent_components["constraints"]):
+            return None
+        intent_components["primary_intent"] = self._infer_primary_intent(query)
+        intent_components["filters"] = self._build_filters(query, matches["brand"], matches["category"])
+        return intent_components
 
     def extract_intent_components(self, query: str) -> Dict[str, Any]:
         """
@@ -26,6 +86,30 @@ class IntentExtractor:
         Returns:
             Dict[str, Any]: Extracted intent components including primary intent, product type, desired attributes, and constraints.
         """
+        # Catalog gazetteer first; the NER model only runs when it finds nothing
+        fast_intent = self._fast_path(query)
+        if fast_intent is not None:
+            return fast_intent
+
+        # Perform NER on the query
+        return self._intent_from_entities(query, self.ner_model(query))
+
+    def extract_intent_components_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Extract intent components of many queries.
+
+        Queries the gazetteer recognizes skip the model; the rest go through
+        the NER pipeline in batches of NER_BATCH_SIZE.
+        """
+        intents: List[Optional[Dict[str, Any]]] = [self._fast_path(query) for query in queries]
+        pending = [index for index, intent in enumerate(intents) if intent is None]
+        if pending:
+            ner_results = self.ner_model([queries[index] for index in pending], batch_size=NER_BATCH_SIZE)
+            for index, entities in zip(pending, ner_results):
+                intents[index] = self._intent_from_entities(queries[index], entities)
+        return intents
+
+    def _intent_from_entities(self, query: str, ner_results: List[dict]) -> Dict[str, Any]:
         # Define default intent components
         intent_components = {
             "primary_intent": None,
@@ -34,9 +118,6 @@ class IntentExtractor:
             "constraints": [],
         }
 
-        # Perform NER on the query
-        ner_results = self.ner_model(query)
-
         # Process NER results to extract components
         for entity in ner_results:
             entity_text = entity["word"].strip()
@@ -52,6 +133,15 @@ class IntentExtractor:
                 # Assume LOC entities represent desired attributes (e.g., "red")
                 intent_components["desired_attributes"].append(entity_text)
 
+        self._apply_regex_fallbacks(query, intent_components)
+        intent_components["primary_intent"] = self._infer_primary_intent(query)
+        # NER entities are free text; only the price becomes a filter
+        intent_components["filters"] = self._build_filters(query, [], [])
+
+        return intent_components
+
+    @staticmethod
+    def _apply_regex_fallbacks(query: str, intent_components: Dict[str, Any]):
         # Fallback: Use regex to extract price and color if NER fails
         if not intent_components["desired_attributes"]:
             color_match = re.search(
@@ -67,15 +157,45 @@ class IntentExtractor:
             if price_match:
                 intent_components["constraints"].append(price_match.group(0).lower())
 
+    @staticmethod
+    def _price_range(query: str) -> Dict[str, float]:
+        """Price bounds stated in the query, e.g. {"lt": 500.0} for "under $500"."""
+        price_range = {}
+        for pattern, operators in PRICE_PATTERNS:
+            match = pattern.search(query)
+            if match:
+                for operator, amount in zip(operators, match.groups()):
+                    price_range.setdefault(operator, float(amount.replace(",", "")))
+        return price_range
+
+    @classmethod
+    def _build_filters(cls, query: str, brands: List[str], categories: List[str]) -> Dict[str, Any]:
+        """
+        Search filter for the typed payload fields.
+
+        Brands and categories come from the catalog gazetteer, so they use the
+        same normalized values as the indexed "brand" and "category" fields.
+        """
+        filters = {}
+        if brands:
+            filters["brand"] = list(brands)
+        if categories:
+            filters["category"] = list(categories)
+        price_range = cls._price_range(query)
+        if price_range:
+            filters["price"] = price_range
+        return filters
+
+    @staticmethod
+    def _infer_primary_intent(query: str) -> Optional[str]:
         # Infer primary intent based on keywords in the query
         if "buy" in query.lower():
-            intent_components["primary_intent"] = "buy"
+            return "buy"
         elif "compare" in query.lower():
-            intent_components["primary_intent"] = "compare"
+            return "compare"
         elif "find" in query.lower() or "similar" in query.lower():
-            intent_components["primary_intent"] = "find similar"
-
-        return intent_components
+            return "find similar"
+        return None
 
 
 # Example usage
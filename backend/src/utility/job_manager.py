@@ -0,0 +1,188 @@
+# src/utility/job_manager.py
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from src.utility.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Number of ingestion jobs that may run at the same time
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+# Number of finished jobs kept around for status queries
+MAX_FINISHED_JOBS = 100
+# Number of error messages kept per job
+MAX_JOB_ERRORS = 20
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class IngestionJob:
+    """State and progress of a single background ingestion job."""
+
+    def __init__(self, description: str, total_rows: Optional[int] = None):
+        self.job_id = uuid.uuid4().hex
+        self.description = description
+        self.status = "queued"
+        self.total_rows = total_rows
+        self.rows_processed = 0
+        self.total_products = 0
+        self.successful_inserts = 0
+        self.errors: List[str] = []
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def update_progress(self, stats: Dict[str, Any]):
+        """Record counters reported by the ingestion pipeline."""
+        with self._lock:
+            self.rows_processed = stats.get("rows_processed", self.rows_processed)
+            self.total_products = stats.get("total_products", self.total_products)
+            self.successful_inserts = stats.get("successful_inserts", self.successful_inserts)
+            if "errors" in stats:
+                self.errors = list(stats["errors"])[:MAX_JOB_ERRORS]
+
+    def add_error(self, message: str):
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON-serializable progress report."""
+        with self._lock:
+            now = self.finished_at or time.time()
+            elapsed = now - self.started_at if self.started_at else 0.0
+            throughput = self.rows_processed / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self.status == "running" and self.total_rows and throughput > 0:
+                eta = max(self.total_rows - self.rows_processed, 0) / throughput
+            return {
+                "job_id": self.job_id,
+                "description": self.description,
+                "status": self.status,
+                "rows_processed": self.rows_processed,
+                "total_rows": self.total_rows,
+                "total_products": self.total_products,
+                "successful_inserts": self.successful_inserts,
+                "errors": list(self.errors),
+                "elapsed_seconds": round(elapsed, 3),
+                "rows_per_second": round(throughput, 2),
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Run ingestion jobs on a dedicated worker pool, off the request event loop.
+    """
+
+    def __init__(self, max_workers: int = INGEST_WORKERS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self.jobs: Dict[str, IngestionJob] = {}
+        self._futures = {}
+        self._cleanups = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        task: Callable[[IngestionJob], Any],
+        description: str,
+        total_rows: Optional[int] = None,
+        on_finish: Optional[Callable[[], None]] = None,
+    ) -> IngestionJob:
+        """
+        Queue `task` for background execution and return its job immediately.
+
+        Args:
+            task: Callable receiving the job; it should report progress through
+                `job.update_progress` and stop early once `job.cancelled` is set.
+            description: Human readable description of the job
+            total_rows: Number of input rows, if known, used for the ETA
+            on_finish: Optional cleanup callable run once the job has ended,
+                including when it is cancelled before it started
+
+        Returns:
+            The queued IngestionJob
+        """
+        job = IngestionJob(description, total_rows=total_rows)
+        with self._lock:
+            self._prune_finished()
+            self.jobs[job.job_id] = job
+            self._futures[job.job_id] = self.executor.submit(self._run, job, task)
+            if on_finish is not None:
+                self._cleanups[job.job_id] = on_finish
+        logger.info(f"Queued ingestion job {job.job_id}: {description}")
+        return job
+
+    def _finish(self, job: IngestionJob):
+        job.finished_at = time.time()
+        self._futures.pop(job.job_id, None)
+        cleanup = self._cleanups.pop(job.job_id, None)
+        if cleanup is not None:
+            try:
+                cleanup()
+            except Exception as e:
+                logger.warning(f"Cleanup of ingestion job {job.job_id} failed: {e}")
+        logger.info(f"Ingestion job {job.job_id} finished with status '{job.status}'")
+
+    def _run(self, job: IngestionJob, task: Callable[[IngestionJob], Any]):
+        if job.cancelled:
+            job.status = "cancelled"
+            self._finish(job)
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            task(job)
+            job.status = "cancelled" if job.cancelled else "completed"
+        except Exception as e:
+            logger.error(f"Ingestion job {job.job_id} failed: {e}")
+            job.add_error(str(e))
+            job.status = "failed"
+        finally:
+            self._finish(job)
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Request cancellation of a job; running jobs stop after their current batch."""
+        job = self.jobs.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        job.cancel_event.set()
+        future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            job.status = "cancelled"
+            self._finish(job)
+        logger.info(f"Cancellation requested for ingestion job {job_id}")
+        return job
+
+    def _prune_finished(self):
+        finished = [job for job in self.jobs.values() if job.status in FINISHED_STATES]
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS + 1, 0)]:
+            self.jobs.pop(job.job_id, None)
+
+    def shutdown(self):
+        """Cancel outstanding jobs and stop the worker pool."""
+        for job in list(self.jobs.values()):
+            if job.status not in FINISHED_STATES:
+                self.cancel(job.job_id)
+        self.executor.shutdown(wait=False)
+
+
+job_manager = JobManager()
@@ -1,6 +1,14 @@
+import atexit
+import contextvars
+import json
 import logging
 import os
-from datetime import datetime
+import queue
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
 
 # Create a logs directory if it doesn't exist
 LOG_DIR = os.path.join(os.getcwd(), "logs")
@@ -10,15 +18,127 @@ os.makedirs(LOG_DIR, exist_ok=True)
 LOG_FILE = f"{datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.log"
 LOG_FILE_PATH = os.path.join(LOG_DIR, LOG_FILE)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" for one structured record per line, "text" for the classic format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Records buffered for the writer thread; when full, new records are dropped
+# rather than blocking the caller
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of requests whose INFO/DEBUG lines are kept; warnings and errors
+# are always kept, and so is everything logged outside a request. Sampling is
+# opt-in: lower it (e.g. 0.1) only under high request rates
+LOG_REQUEST_SAMPLE_RATE = float(os.getenv("LOG_REQUEST_SAMPLE_RATE", "1.0"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+# Logger for the one summary line per request, which is never sampled out
+ACCESS_LOGGER = "src.access"
+
+# Id and sampling decision of the request being handled, if any
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+request_sampled_var: contextvars.ContextVar[bool] = contextvars.ContextVar("request_sampled", default=True)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+
+def start_request(request_id: str) -> bool:
+    """Bind `request_id` to the current context and decide whether its verbose lines are kept."""
+    sampled = random.random() < LOG_REQUEST_SAMPLE_RATE
+    request_id_var.set(request_id)
+    request_sampled_var.set(sampled)
+    return sampled
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    Tag records with the current request id and sample out verbose lines.
+
+    Runs in the calling thread before the record is queued, so a dropped
+    record costs no formatting and no I/O.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        if record.levelno >= logging.WARNING or record.name == ACCESS_LOGGER:
+            return True
+        return record.request_id is None or request_sampled_var.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to the writer thread without formatting them.
+
+    The stock QueueHandler merges the message and arguments in the caller;
+    the queue never leaves the process, so records are passed as they are and
+    formatted by the writer. A full queue drops the record instead of waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _configure() -> NonBlockingQueueHandler:
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [
         logging.FileHandler(LOG_FILE_PATH),  # Log to a file with a dynamic name
         logging.StreamHandler(),  # Log to the console
-    ],
-)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+    # File and console writes happen on the listener's thread only
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    return queue_handler
+
+
+queue_handler = _configure()
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor running each task in a copy of the submitter's context, so worker log lines keep the request id."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
 
 
 # Get a logger instance
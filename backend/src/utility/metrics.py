@@ -0,0 +1,285 @@
+# src/utility/metrics.py
+import bisect
+import math
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from src.utility.logger import get_logger, queue_handler
+
+logger = get_logger(__name__)
+
+# Record metrics at all; /metrics is empty when disabled
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Prefix of every exported metric name
+METRICS_NAMESPACE = os.getenv("METRICS_NAMESPACE", "intent_search")
+
+# Upper bounds in seconds: 0.5 ms to 10 s, so both cached lookups and cold
+# model calls land in distinct buckets
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075,
+    0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+# Ingestion batches embed hundreds of products and take much longer
+BATCH_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+class Metric:
+    """Base class of a named metric family; `collect()` yields its samples."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Tuple) -> Tuple[Tuple[str, str], ...]:
+        return tuple(zip(self.labelnames, (str(value) for value in values)))
+
+    def collect(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonically increasing count per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def collect(self) -> List[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        return [(f"{self.name}_total", self._labels(labels), value) for labels, value in values]
+
+
+class Histogram(Metric):
+    """
+    Fixed-bucket histogram per label combination.
+
+    An observation is one bisect and two additions under a lock, so it is
+    cheap enough for every stage of every request; quantiles are computed
+    by Prometheus from the cumulative buckets at query time.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label combination: [count per bucket (+Inf last), sum]
+        self._series: Dict[Tuple, List] = {}
+
+    def observe(self, value: float, *labels):
+        if not METRICS_ENABLED:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series is not None else 0
+
+    def collect(self) -> List[Sample]:
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1]) for labels, series in self._series.items()]
+        samples = []
+        for labels, counts, total in snapshot:
+            base = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", base + (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", base, total))
+            samples.append((f"{self.name}_count", base, cumulative))
+        return samples
+
+
+class CallbackGauge(Metric):
+    """
+    Gauge read at scrape time from `callback`.
+
+    The callback returns a number, None (no sample), or a dict mapping label
+    value tuples to numbers. Used for sizes and states owned by other
+    modules, so nothing has to be kept in sync on the hot path.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[None, float, Dict[Tuple, Optional[float]]]],
+        labelnames: Tuple[str, ...] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def collect(self) -> List[Sample]:
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning(f"Failed to collect metric {self.name}: {e}")
+            return []
+        if values is None:
+            return []
+        if not isinstance(values, dict):
+            return [(self.name, (), float(values))]
+        return [
+            (self.name, self._labels(labels), float(value))
+            for labels, value in values.items()
+            if value is not None
+        ]
+
+
+class CallbackCounter(CallbackGauge):
+    """Counter read at scrape time, for totals other modules already keep."""
+
+    kind = "counter"
+
+    def collect(self) -> List[Sample]:
+        return [(f"{name}_total", labels, value) for name, labels, value in super().collect()]
+
+
+class MetricsRegistry:
+    """Process-wide set of metric families rendered in the Prometheus text format."""
+
+    def __init__(self, namespace: str = METRICS_NAMESPACE):
+        self.namespace = namespace
+        self.metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                # Modules may be re-imported (e.g. by reloaders); keep the first
+                return existing
+            self.metrics[metric.name] = metric
+        return metric
+
+    def _name(self, name: str) -> str:
+        return f"{self.namespace}_{name}" if self.namespace else name
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(self._name(name), documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(self._name(name), documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Callable, labelnames: Tuple[str, ...] = ()) -> CallbackGauge:
+        return self._register(CallbackGauge(self._name(name), documentation, callback, labelnames))
+
+    def counter_callback(self, name: str, documentation: str, callback: Callable, labelnames: Tuple[str, ...] = ()) -> CallbackCounter:
+        return self._register(CallbackCounter(self._name(name), documentation, callback, labelnames))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        if not METRICS_ENABLED:
+            return ""
+        lines = []
+        for metric in list(self.metrics.values()):
+            samples = metric.collect()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+
+metrics = MetricsRegistry()
+
+# Shared families; instrumented modules import these rather than declaring their own
+SEARCH_STAGE_SECONDS = metrics.histogram(
+    "search_stage_seconds",
+    "Wall time of each stage of a search (intent, embedding, vector_search, bm25, fusion, ...)",
+    ("operation", "stage"),
+)
+SEARCH_SECONDS = metrics.histogram(
+    "search_seconds",
+    "End-to-end wall time of a search operation",
+    ("operation",),
+)
+SEARCH_ERRORS = metrics.counter(
+    "search_errors",
+    "Search operations that raised",
+    ("operation",),
+)
+INGEST_STAGE_SECONDS = metrics.histogram(
+    "ingest_stage_seconds",
+    "Wall time of each stage of an ingestion batch (prepare, embedding, dedup, upsert, bm25_add)",
+    ("stage",),
+    buckets=LATENCY_BUCKETS + BATCH_BUCKETS[-3:],
+)
+INGEST_BATCH_SECONDS = metrics.histogram(
+    "ingest_batch_seconds",
+    "Wall time of one ingestion batch, read to searchable",
+    buckets=BATCH_BUCKETS,
+)
+INGEST_PRODUCTS = metrics.counter(
+    "ingest_products",
+    "Products processed by ingestion, by outcome",
+    ("outcome",),
+)
+
+
+LOG_RECORDS_DROPPED = metrics.counter_callback(
+    "log_records_dropped",
+    "Log records dropped because the log writer queue was full",
+    lambda: queue_handler.dropped,
+)
+
+
+def observe_timings(operation: str, timings: Dict[str, float]):
+    """
+    Record a search's per-stage timings (in ms, as filled in by the search
+    controller) into the stage histograms. "total" goes to SEARCH_SECONDS.
+    """
+    for stage, milliseconds in list(timings.items()):
+        if stage == "total":
+            SEARCH_SECONDS.observe(milliseconds / 1000.0, operation)
+        else:
+            SEARCH_STAGE_SECONDS.observe(milliseconds / 1000.0, operation, stage)
@@ -0,0 +1,241 @@
+# src/utility/model_registry.py
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from src.utility.logger import get_logger
+from src.utility.readiness import LazyComponent, Readiness, readiness
+from src.utility.catalog_version import catalog_version
+
+logger = get_logger(__name__)
+
+EMBEDDING_MODEL = "embedding_model"
+INTENT_MODEL = "intent_extractor"
+
+
+def _resident_bytes() -> Optional[int]:
+    """Current resident set size of the process (Linux only)."""
+    try:
+        import resource
+
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, ImportError, ValueError, IndexError):
+        return None
+
+
+class ModelHandle:
+    """
+    Shared reference to a registered model.
+
+    `get()` always returns the registry's current version, so holders of a
+    handle pick up a swapped model on their next call.
+    """
+
+    def __init__(self, registry: "ModelRegistry", name: str):
+        self.registry = registry
+        self.name = name
+
+    def get(self) -> Any:
+        return self.registry.get(self.name)
+
+
+class ModelRegistry:
+    """
+    Owns every model once per process.
+
+    Models are loaded lazily (or in parallel at startup through the readiness
+    tracker) and handed out as shared handles. `swap` loads and warms up a
+    replacement next to the serving model, then switches over atomically.
+    """
+
+    def __init__(self, tracker: Readiness = readiness):
+        self.tracker = tracker
+        self._components: Dict[str, LazyComponent] = {}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._swap_lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]] = None,
+        validate: Optional[Callable[[Any], None]] = None,
+        carry_over: Optional[Callable[[Any, Any], None]] = None,
+        on_swap: Optional[Callable[[Any, Any], None]] = None,
+    ) -> ModelHandle:
+        """
+        Register a model.
+
+        Args:
+            name: Registry (and readiness) name of the model
+            factory: Builds the model; called once, on first use or at startup
+            warmup: Optional inference run after loading
+            validate: Optional check of a swapped-in model before it goes
+                live; raising refuses the swap
+            carry_over: Optional callback receiving (old, new) before a
+                swapped model goes live, to move state onto the new model
+            on_swap: Optional callback receiving (old, new) once a swapped
+                model is live, e.g. to clear caches filled by the old one
+        """
+        self._entries[name] = {
+            "warmup": warmup, "validate": validate, "carry_over": carry_over, "on_swap": on_swap,
+            "rss_delta_bytes": None, "swapped_at": None, "swaps": 0,
+        }
+        self._install(name, self._component(name, factory))
+        return ModelHandle(self, name)
+
+    def _component(self, name: str, factory: Callable[[], Any], retry: bool = True) -> LazyComponent:
+        entry = self._entries[name]
+
+        def load():
+            before = _resident_bytes()
+            model = factory()
+            after = _resident_bytes()
+            # Approximate when several models load at the same time
+            entry["rss_delta_bytes"] = after - before if before is not None and after is not None else None
+            return model
+
+        return LazyComponent(name, load, warmup=entry["warmup"], retry=retry)
+
+    def _install(self, name: str, component: LazyComponent):
+        self._components[name] = component
+        self.tracker.register(component)
+
+    def handle(self, name: str) -> ModelHandle:
+        if name not in self._components:
+            raise KeyError(f"Unknown model '{name}'")
+        return ModelHandle(self, name)
+
+    def get(self, name: str) -> Any:
+        """Return the current version of a model, loading it if needed."""
+        return self._components[name].get()
+
+    def swap(self, name: str, factory: Callable[[], Any]) -> Dict[str, Any]:
+        """
+        Replace a model without a restart.
+
+        The new model is loaded, validated and warmed up while the current one
+        keeps serving; requests switch over in a single reference assignment.
+        If loading or validation fails the current model stays in place and
+        the error is raised.
+        """
+        if name not in self._components:
+            raise KeyError(f"Unknown model '{name}'")
+        with self._swap_lock:
+            current = self._components[name]
+            # A failed replacement is discarded, not retried
+            replacement = self._component(name, factory, retry=False)
+            new_model = replacement.get()
+
+            entry = self._entries[name]
+            if entry["validate"] is not None:
+                entry["validate"](new_model)
+            old_model = current.get() if current.is_ready() else None
+            if entry["carry_over"] is not None and old_model is not None:
+                entry["carry_over"](old_model, new_model)
+            self._install(name, replacement)
+            # Only once the new model serves, so nothing the old model computes
+            # in the meantime outlives the switch
+            if entry["on_swap"] is not None and old_model is not None:
+                entry["on_swap"](old_model, new_model)
+            catalog_version.bump(f"swap {name}")
+            entry["swapped_at"] = time.time()
+            entry["swaps"] += 1
+        logger.info(f"Swapped model '{name}' to {getattr(new_model, 'version', 'new version')}")
+        return self.describe(name)
+
+    def describe(self, name: str) -> Dict[str, Any]:
+        component = self._components[name]
+        entry = self._entries[name]
+        model = component.get() if component.is_ready() else None
+        memory_bytes = None
+        if model is not None and hasattr(model, "memory_bytes"):
+            try:
+                memory_bytes = model.memory_bytes()
+            except Exception as e:
+                logger.warning(f"Could not measure memory of model '{name}': {e}")
+        return {
+            **component.status(),
+            "version": getattr(model, "version", None),
+            "memory_bytes": memory_bytes,
+            "rss_delta_bytes": entry["rss_delta_bytes"],
+            "swaps": entry["swaps"],
+            "swapped_at": entry["swapped_at"],
+        }
+
+    def status(self) -> Dict[str, Any]:
+        models = {name: self.describe(name) for name in self._components}
+        return {
+            "models": models,
+            "total_memory_bytes": sum(model["memory_bytes"] or 0 for model in models.values()),
+            "process_rss_bytes": _resident_bytes(),
+        }
+
+
+model_registry = ModelRegistry()
+
+
+def _build_embedding_model():
+    from src.utility.embedding_model import EmbeddingModel
+
+    return EmbeddingModel()
+
+
+def _build_intent_extractor():
+    from src.utility.intent_extractor import IntentExtractor
+
+    return IntentExtractor()
+
+
+def _warm_up_embedding_model(model):
+    # First encodes pay for lazy kernel and allocator setup
+    model.get_embeddings(["warm up query", "a second warm up query"])
+
+
+def _warm_up_intent_extractor(extractor):
+    extractor.ner_model("Find a Canon camera")
+
+
+def _validate_embedding_model(model):
+    from src.utility.vector_store import VECTOR_SIZE
+
+    # The collection's vectors have a fixed size; a model of another size
+    # would fail every search and upsert
+    dimension = len(model.get_embedding("dimension probe"))
+    if dimension != VECTOR_SIZE:
+        raise ValueError(f"Embedding model produces {dimension}-dimensional vectors, the collection expects {VECTOR_SIZE}")
+
+
+def _on_embedding_swap(old, new):
+    from src.utility.query_cache import query_cache
+
+    # Cached query vectors came from the previous model
+    query_cache.clear()
+
+
+def _carry_over_gazetteer(old, new):
+    # The catalog gazetteer is built from the indexed products, not the model
+    new.gazetteer = old.gazetteer
+
+
+def _on_intent_swap(old, new):
+    from src.utility.query_cache import query_cache
+
+    # Cached intents came from the previous model
+    query_cache.clear_intents()
+
+
+embedding_model = model_registry.register(
+    EMBEDDING_MODEL,
+    _build_embedding_model,
+    warmup=_warm_up_embedding_model,
+    validate=_validate_embedding_model,
+    on_swap=_on_embedding_swap,
+)
+intent_model = model_registry.register(
+    INTENT_MODEL,
+    _build_intent_extractor,
+    warmup=_warm_up_intent_extractor,
+    carry_over=_carry_over_gazetteer,
+    on_swap=_on_intent_swap,
+)
@@ -0,0 +1,254 @@
+# src/utility/onnx_embedding.py
+import argparse
+import os
+import time
+from typing import Dict, List, Optional, Union
+import numpy as np
+from src.utility.logger import get_logger
+
+logger = get_logger(__name__)
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+# Matches the sentence-transformers config of all-MiniLM-L6-v2
+MAX_SEQ_LENGTH = 256
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+# Intra-op threads per ONNX Runtime session; 0 lets ONNX Runtime decide
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))
+# Minimum cosine similarity to the PyTorch vectors for the export to pass parity
+EMBEDDING_ONNX_MIN_COSINE = float(os.getenv("EMBEDDING_ONNX_MIN_COSINE", "0.99"))
+
+
+class OnnxSentenceEncoder:
+    """
+    Sentence encoder running an exported all-MiniLM-L6-v2 graph on ONNX Runtime.
+
+    Mirrors the SentenceTransformer pipeline of the model (same tokenizer,
+    truncation to 256 tokens, attention-masked mean pooling and L2
+    normalization) and the subset of its API EmbeddingModel uses, so vectors
+    stay compatible with the existing collection.
+    """
+
+    def __init__(self, model_dir: str, model_file: str = ONNX_QUANTIZED_MODEL_FILE, max_seq_length: int = MAX_SEQ_LENGTH, threads: int = EMBEDDING_ONNX_THREADS):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires the 'onnxruntime' package") from e
+        from transformers import AutoTokenizer
+
+        model_path = os.path.join(model_dir, model_file)
+        self.model_path = model_path
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX model not found: {model_path}. Export it with "
+                f"'python -m src.utility.onnx_embedding export --output {model_dir}'"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = max_seq_length
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+        logger.info(f"Loaded ONNX embedding model from {model_path}")
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def memory_bytes(self) -> int:
+        """Size of the serialized graph, which ONNX Runtime keeps resident."""
+        return os.path.getsize(self.model_path)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        tokens = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feed = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+        if "token_type_ids" in self.input_names and "token_type_ids" not in feed:
+            feed["token_type_ids"] = np.zeros_like(feed["input_ids"])
+        token_embeddings = self.session.run(None, feed)[0]
+
+        # Mean pooling over real tokens, then L2 normalization
+        mask = tokens["attention_mask"][:, :, None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        embeddings = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return (embeddings / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, convert_to_numpy: bool = True, show_progress_bar: bool = False) -> np.ndarray:
+        """Encode one text (returns a vector) or a list of texts (returns a matrix)."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+
+        # Batch texts of similar length together to minimize padding
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            embeddings[rows] = self._encode_batch([texts[row] for row in rows])
+        return embeddings[0] if single else embeddings
+
+
+def export_onnx_model(output_dir: str, model_name: str = MODEL_NAME, quantize: bool = True) -> str:
+    """
+    Export the transformer of `model_name` to ONNX and dynamically quantize it to int8.
+
+    Needs torch, transformers, onnx and onnxruntime; only the last one (plus
+    the tokenizer) is needed to serve the exported model.
+
+    Returns:
+        Path of the model file to serve
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["an example product title"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    tokenizer.save_pretrained(output_dir)
+    logger.info(f"Exported {model_name} to {model_path}")
+
+    if not quantize:
+        return model_path
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantized_path = os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    logger.info(
+        f"Quantized model written to {quantized_path} "
+        f"({os.path.getsize(model_path) / 1e6:.1f} MB -> {os.path.getsize(quantized_path) / 1e6:.1f} MB)"
+    )
+    return quantized_path
+
+
+def _time_encode(encode, texts: List[str], batch_size: int, runs: int) -> Dict[str, float]:
+    encode(texts[:1], batch_size=1)  # warm-up
+    single = []
+    for text in texts[:50]:
+        start = time.perf_counter()
+        encode([text], batch_size=1)
+        single.append(time.perf_counter() - start)
+    batched = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        encode(texts, batch_size=batch_size)
+        batched.append(time.perf_counter() - start)
+    return {
+        "single_p50_ms": round(float(np.percentile(single, 50)) * 1000, 3),
+        "single_p95_ms": round(float(np.percentile(single, 95)) * 1000, 3),
+        "batch_texts_per_second": round(len(texts) / min(batched), 1),
+    }
+
+
+def compare_backends(texts: List[str], model_dir: str, model_file: str = ONNX_QUANTIZED_MODEL_FILE, batch_size: int = 32, runs: int = 3, top_k: int = 10) -> Dict[str, object]:
+    """
+    Compare the ONNX encoder against the PyTorch SentenceTransformer.
+
+    Reports cosine similarity between the two vectors of every text,
+    agreement of the top-k neighbours among the texts, and single-query and
+    batch latency of both backends.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    reference = SentenceTransformer(MODEL_NAME)
+    candidate = OnnxSentenceEncoder(model_dir, model_file=model_file)
+
+    def encode_reference(batch, batch_size):
+        return reference.encode(batch, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+    expected = np.asarray(encode_reference(texts, batch_size), dtype=np.float32)
+    actual = candidate.encode(texts, batch_size=batch_size)
+    expected_unit = expected / np.linalg.norm(expected, axis=1, keepdims=True)
+    cosines = np.sum(expected_unit * actual, axis=1)
+
+    # Neighbour agreement: do both backends rank the other texts the same way?
+    k = min(top_k, len(texts) - 1)
+    overlap = []
+    if k > 0:
+        expected_scores = expected_unit @ expected_unit.T
+        actual_scores = actual @ actual.T
+        np.fill_diagonal(expected_scores, -np.inf)
+        np.fill_diagonal(actual_scores, -np.inf)
+        expected_top = np.argpartition(-expected_scores, k - 1, axis=1)[:, :k]
+        actual_top = np.argpartition(-actual_scores, k - 1, axis=1)[:, :k]
+        overlap = [len(set(a) & set(b)) / k for a, b in zip(expected_top, actual_top)]
+
+    report = {
+        "texts": len(texts),
+        "model_file": model_file,
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "max_abs_diff": round(float(np.abs(expected_unit - actual).max()), 5),
+        "neighbour_overlap_at_k": round(float(np.mean(overlap)), 4) if overlap else None,
+        "torch": _time_encode(encode_reference, texts, batch_size, runs),
+        "onnx": _time_encode(candidate.encode, texts, batch_size, runs),
+    }
+    report["passed"] = report["min_cosine"] >= EMBEDDING_ONNX_MIN_COSINE
+    return report
+
+
+def _load_texts(csv_path: Optional[str], limit: int) -> List[str]:
+    import pandas as pd
+
+    data = pd.read_csv(csv_path, nrows=limit)
+    text_columns = [column for column in ("title", "title_left", "description", "description_left") if column in data]
+    texts = data[text_columns].fillna("").astype(str).agg(" ".join, axis=1).str.strip()
+    return [text for text in texts.tolist() if text]
+
+
+if __name__ == "__main__":
+    import json
+
+    parser = argparse.ArgumentParser(description="Export and validate the ONNX embedding backend")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export and int8-quantize the embedding model")
+    export_parser.add_argument("--output", default=os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx"))
+    export_parser.add_argument("--no-quantize", action="store_true")
+
+    compare_parser = commands.add_parser("compare", help="Parity and latency against the PyTorch model")
+    compare_parser.add_argument("--model-dir", default=os.getenv("EMBEDDING_ONNX_DIR", "models/all-MiniLM-L6-v2-onnx"))
+    compare_parser.add_argument("--model-file", default=ONNX_QUANTIZED_MODEL_FILE)
+    compare_parser.add_argument("--csv", default="data/raw/product.csv")
+    compare_parser.add_argument("--limit", type=int, default=1000)
+    compare_parser.add_argument("--batch-size", type=int, default=32)
+
+    args = parser.parse_args()
+    if args.command == "export":
+        print(export_onnx_model(args.output, quantize=not args.no_quantize))
+    else:
+        result = compare_backends(
+            _load_texts(args.csv, args.limit),
+            args.model_dir,
+            model_file=args.model_file,
+            batch_size=args.batch_size,
+        )
+        print(json.dumps(result, indent=2))
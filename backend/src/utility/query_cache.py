@@ -0,0 +1,215 @@
+# src/utility/query_cache.py
+import copy
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from src.utility.metrics import metrics
+
+# Maximum number of cached entries (embeddings and intents together)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "10000"))
+# Seconds an entry stays valid; 0 disables expiry
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "3600"))
+# Approximate memory budget of the cache in megabytes
+QUERY_CACHE_MAX_MB = float(os.getenv("QUERY_CACHE_MAX_MB", "64"))
+
+
+def normalize_query(query: str, lowercase: bool = True) -> str:
+    """Collapse whitespace and optionally lowercase a query for use as a cache key."""
+    normalized = " ".join(query.split())
+    return normalized.lower() if lowercase else normalized
+
+
+def estimate_size(value: Any) -> int:
+    """Rough size of a cached value in bytes."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache with TTL expiry, an entry limit and a memory cap.
+    """
+
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE, ttl_seconds: float = QUERY_CACHE_TTL, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes if max_bytes is not None else int(QUERY_CACHE_MAX_MB * 1024 * 1024)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, size: Optional[int] = None):
+        size = estimate_size(value) if size is None else size
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds > 0 else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self.current_bytes += size
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]):
+        """Remove every entry whose key matches `predicate`."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class QueryCache:
+    """
+    Memoize query embeddings and extracted intents by normalized query text.
+
+    Embeddings are keyed by lowercased text (the sentence-transformer is
+    uncased); intents keep the original casing because the NER model is cased.
+    """
+
+    def __init__(self, cache: Optional[LRUCache] = None):
+        self.cache = cache if cache is not None else LRUCache()
+
+    def get_embedding(self, query: str, compute: Callable[[str], np.ndarray]) -> np.ndarray:
+        key = ("embedding", normalize_query(query))
+        embedding = self.cache.get(key)
+        if embedding is None:
+            embedding = np.asarray(compute(query))
+            embedding.setflags(write=False)
+            self.cache.set(key, embedding)
+        return embedding
+
+    async def get_embedding_async(self, query: str, compute: Callable[[str], Awaitable[np.ndarray]]) -> np.ndarray:
+        """get_embedding with an awaitable `compute`, e.g. EmbeddingService.embed_async."""
+        key = ("embedding", normalize_query(query))
+        embedding = self.cache.get(key)
+        if embedding is None:
+            embedding = np.asarray(await compute(query))
+            embedding.setflags(write=False)
+            self.cache.set(key, embedding)
+        return embedding
+
+    def get_intent(self, query: str, compute: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+        key = ("intent", normalize_query(query, lowercase=False))
+        intent = self.cache.get(key)
+        if intent is None:
+            intent = compute(query)
+            self.cache.set(key, copy.deepcopy(intent))
+            return intent
+        return copy.deepcopy(intent)
+
+    def _get_many(self, keys: List[Hashable], queries: List[str], compute_many: Callable[[List[str]], List[Any]]) -> Tuple[List[Any], Dict[Hashable, List[int]]]:
+        """
+        Look up every key; misses are computed with a single `compute_many`
+        call, once per distinct key.
+
+        Returns:
+            (values in query order, positions of each key that was computed)
+        """
+        values = [self.cache.get(key) for key in keys]
+        missing: Dict[Hashable, List[int]] = {}
+        for index, value in enumerate(values):
+            if value is None:
+                missing.setdefault(keys[index], []).append(index)
+        if missing:
+            computed = compute_many([queries[indexes[0]] for indexes in missing.values()])
+            for (key, indexes), value in zip(missing.items(), computed):
+                for index in indexes:
+                    values[index] = value
+        return values, missing
+
+    def get_embeddings(self, queries: List[str], compute_many: Callable[[List[str]], np.ndarray]) -> List[np.ndarray]:
+        """Batch version of get_embedding."""
+        def compute_rows(texts):
+            # Copy rows so a cached vector does not pin its whole batch matrix
+            return [row.copy() for row in np.asarray(compute_many(texts))]
+
+        keys = [("embedding", normalize_query(query)) for query in queries]
+        values, missing = self._get_many(keys, queries, compute_rows)
+        for key, indexes in missing.items():
+            embedding = values[indexes[0]]
+            embedding.setflags(write=False)
+            self.cache.set(key, embedding)
+        return values
+
+    def get_intents(self, queries: List[str], compute_many: Callable[[List[str]], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Batch version of get_intent."""
+        keys = [("intent", normalize_query(query, lowercase=False)) for query in queries]
+        values, missing = self._get_many(keys, queries, compute_many)
+        for key, indexes in missing.items():
+            self.cache.set(key, copy.deepcopy(values[indexes[0]]))
+        return [copy.deepcopy(value) for value in values]
+
+    def clear(self):
+        self.cache.clear()
+
+    def clear_intents(self):
+        """Forget cached intents, e.g. after the intent gazetteer was rebuilt."""
+        self.cache.discard_where(lambda key: key[0] == "intent")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+query_cache = QueryCache()
+
+metrics.counter_callback(
+    "query_cache_lookups",
+    "Lookups of the query embedding and intent cache by result",
+    lambda: {("hit",): query_cache.cache.hits, ("miss",): query_cache.cache.misses},
+    ("result",),
+)
+metrics.gauge("query_cache_entries", "Entries in the query embedding and intent cache", lambda: len(query_cache.cache))
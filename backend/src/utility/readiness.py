@@ -0,0 +1,226 @@
+# src/utility/readiness.py
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from src.utility.logger import get_logger
+from src.utility.metrics import metrics
+
+logger = get_logger(__name__)
+
+# Run a warm-up inference right after a model is loaded
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "true").lower() == "true"
+# Delay before a failed component is reloaded in the background; doubled
+# after every further failure, up to the maximum
+COMPONENT_RETRY_SECONDS = float(os.getenv("COMPONENT_RETRY_SECONDS", "5"))
+COMPONENT_RETRY_MAX_SECONDS = float(os.getenv("COMPONENT_RETRY_MAX_SECONDS", "300"))
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ComponentUnavailable(RuntimeError):
+    """Raised by `LazyComponent.get()` while the component is failed; routes answer 503."""
+
+    def __init__(self, name: str, error: Optional[str], retry_after: Optional[float] = None):
+        super().__init__(f"Component '{name}' failed to load: {error}")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class LazyComponent:
+    """
+    A process-wide resource (model, index, connection) that is loaded on first use.
+
+    Loading happens at most once at a time: concurrent callers of `get()`
+    wait for the load already in progress. Components listed in `depends_on`
+    are loaded first. A failed load is retried in the background with
+    exponential backoff; until then `get()` raises ComponentUnavailable
+    at once instead of loading on the caller's thread.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]] = None,
+        depends_on: Optional[List["LazyComponent"]] = None,
+        retry: bool = True,
+    ):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.depends_on = depends_on or []
+        self.retry = retry
+        # Called after every successful load, e.g. by the readiness tracker
+        self.on_ready: Optional[Callable[[], None]] = None
+        self.state = PENDING
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.failures = 0
+        self.next_retry_at: Optional[float] = None
+        self._value = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def get(self) -> Any:
+        """
+        Return the loaded value, loading it in the calling thread if it was
+        never loaded. Raises ComponentUnavailable while the component is failed.
+        """
+        if self.state == READY:
+            return self._value
+        with self._lock:
+            if self.state == FAILED:
+                raise self._unavailable()
+            owner = self.state == PENDING
+            if owner:
+                self.state = LOADING
+                self._done.clear()
+        if owner:
+            self._load()
+        else:
+            self._done.wait()
+        if self.state != READY:
+            raise self._unavailable()
+        return self._value
+
+    def _unavailable(self) -> ComponentUnavailable:
+        retry_after = None
+        if self.next_retry_at is not None:
+            retry_after = max(0.0, self.next_retry_at - time.monotonic())
+        return ComponentUnavailable(self.name, self.error, retry_after)
+
+    def _retry(self):
+        with self._lock:
+            if self.state != FAILED:
+                return
+            self.state = LOADING
+            self.next_retry_at = None
+            self._done.clear()
+        logger.info("Retrying load of component '%s' (attempt %d)", self.name, self.failures + 1)
+        self._load()
+
+    def _schedule_retry(self):
+        delay = min(COMPONENT_RETRY_SECONDS * 2 ** (self.failures - 1), COMPONENT_RETRY_MAX_SECONDS)
+        self.next_retry_at = time.monotonic() + delay
+        timer = threading.Timer(delay, self._retry)
+        timer.name = f"retry-{self.name}"
+        timer.daemon = True
+        timer.start()
+        logger.info("Component '%s' will be reloaded in %.1fs", self.name, delay)
+
+    def _load(self):
+        try:
+            for dependency in self.depends_on:
+                dependency.get()
+            start = time.perf_counter()
+            value = self.loader()
+            self.load_seconds = round(time.perf_counter() - start, 3)
+            if self.warmup is not None and MODEL_WARMUP:
+                start = time.perf_counter()
+                self.warmup(value)
+                self.warmup_seconds = round(time.perf_counter() - start, 3)
+            self._value = value
+            self.error = None
+            self.failures = 0
+            self.state = READY
+            logger.info(f"Component '{self.name}' ready in {self.load_seconds}s (warm-up {self.warmup_seconds}s)")
+        except Exception as e:
+            self.error = str(e)
+            self.failures += 1
+            self.state = FAILED
+            logger.error(f"Component '{self.name}' failed to load: {e}")
+            if self.retry:
+                self._schedule_retry()
+        finally:
+            self._done.set()
+        if self.state == READY and self.on_ready is not None:
+            self.on_ready()
+
+    def is_ready(self) -> bool:
+        return self.state == READY
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+            "failures": self.failures,
+            "retry_in_seconds": None if self.next_retry_at is None else round(max(0.0, self.next_retry_at - time.monotonic()), 1),
+        }
+
+
+class Readiness:
+    """
+    Tracks the components a process needs before it can serve traffic.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, LazyComponent] = {}
+        self.started_at: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+
+    def register(self, component: LazyComponent) -> LazyComponent:
+        self.components[component.name] = component
+        component.on_ready = self._check_ready
+        return component
+
+    def start(self):
+        """
+        Load every registered component in the background, in parallel.
+
+        Each component gets its own thread; dependencies are awaited inside
+        `get()`, so independent components load concurrently.
+        """
+        self.started_at = time.perf_counter()
+        for component in self.components.values():
+            threading.Thread(target=self._load, args=(component,), name=f"load-{component.name}", daemon=True).start()
+
+    def _load(self, component: LazyComponent):
+        try:
+            component.get()
+        except Exception:
+            # Already logged and retried in the background; reported through status()
+            return
+
+    def _check_ready(self):
+        if self.started_at is not None and self.ready_seconds is None and self.is_ready():
+            self.ready_seconds = round(time.perf_counter() - self.started_at, 3)
+            logger.info(f"All components ready in {self.ready_seconds}s")
+
+    def is_ready(self) -> bool:
+        return all(component.is_ready() for component in self.components.values())
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "ready_seconds": self.ready_seconds,
+            "components": {name: component.status() for name, component in self.components.items()},
+        }
+
+
+readiness = Readiness()
+
+metrics.gauge(
+    "component_ready",
+    "1 once a model or index is loaded and serving",
+    lambda: {(name,): int(component.is_ready()) for name, component in readiness.components.items()},
+    ("component",),
+)
+metrics.gauge(
+    "component_load_seconds",
+    "Time the current version of a model or index took to load",
+    lambda: {(name,): component.load_seconds for name, component in readiness.components.items()},
+    ("component",),
+)
+metrics.gauge(
+    "component_warmup_seconds",
+    "Time the warm-up inference of a model took after loading",
+    lambda: {(name,): component.warmup_seconds for name, component in readiness.components.items()},
+    ("component",),
+)
@@ -0,0 +1,279 @@
+# src/utility/result_cache.py
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from src.utility.catalog_version import CatalogVersion, catalog_version
+from src.utility.logger import get_logger
+from src.utility.metrics import metrics
+from src.utility.query_cache import LRUCache, normalize_query
+
+logger = get_logger(__name__)
+
+# Cache complete hybrid search responses
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+# Entry limit, seconds to live (0 disables expiry) and memory budget of the in-process tier
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "2000"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "32"))
+# Optional shared tier (e.g. redis://cache:6379/0) used by every API process
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL", "")
+RESULT_CACHE_PREFIX = os.getenv("RESULT_CACHE_PREFIX", "search-results")
+# After a Redis error the shared tier is skipped for this many seconds,
+# doubling while it stays unreachable, up to the maximum
+RESULT_CACHE_REDIS_RETRY_SECONDS = float(os.getenv("RESULT_CACHE_REDIS_RETRY_SECONDS", "5"))
+RESULT_CACHE_REDIS_RETRY_MAX_SECONDS = float(os.getenv("RESULT_CACHE_REDIS_RETRY_MAX_SECONDS", "60"))
+
+HIT_LOCAL = "hit-local"
+HIT_SHARED = "hit-shared"
+MISS = "miss"
+
+
+class RedisResultTier:
+    """
+    Shared result tier in Redis.
+
+    Holds the shared catalog version counter next to the cached results, so
+    an import in one process invalidates the results of all of them. Errors
+    are treated as misses: the shared tier never fails a search. After an
+    error the tier is skipped until a backoff delay has passed, so an outage
+    costs one socket timeout and one warning per delay rather than per search.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        ttl_seconds: float = RESULT_CACHE_TTL,
+        prefix: str = RESULT_CACHE_PREFIX,
+        client: Any = None,
+        retry_seconds: float = RESULT_CACHE_REDIS_RETRY_SECONDS,
+        retry_max_seconds: float = RESULT_CACHE_REDIS_RETRY_MAX_SECONDS,
+    ):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("RESULT_CACHE_REDIS_URL requires the 'redis' package") from e
+            client = redis.Redis.from_url(url, socket_timeout=0.1, socket_connect_timeout=0.5)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.retry_seconds = retry_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.errors = 0
+        self.skipped = 0
+        # Consecutive failures and when the tier is tried again (circuit open until then)
+        self.failures = 0
+        self.retry_at = 0.0
+        # Bumps that could not reach Redis; replayed once it is back
+        self.pending_bumps = 0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def _call(self, operation: Callable[[], Any], default: Any = None) -> Any:
+        if not self.available():
+            self.skipped += 1
+            return default
+        try:
+            result = operation()
+        except Exception as e:
+            self.errors += 1
+            self.failures += 1
+            delay = min(self.retry_seconds * 2 ** (self.failures - 1), self.retry_max_seconds)
+            self.retry_at = time.monotonic() + delay
+            logger.warning("Shared result cache unavailable, skipping it for %.1fs: %s", delay, e)
+            return default
+        if self.failures:
+            logger.info("Shared result cache reachable again")
+            self.failures = 0
+        return result
+
+    def version(self) -> Optional[int]:
+        """Shared catalog version, or None while Redis is unreachable."""
+        if self.pending_bumps and self.available():
+            self._replay_bumps()
+        return self._call(lambda: int(self.client.get(f"{self.prefix}:version") or 0))
+
+    def bump(self):
+        self.pending_bumps += 1
+        self._replay_bumps()
+
+    def _replay_bumps(self):
+        # Other processes only need to see the version change, so one
+        # increment covers every bump missed during an outage
+        pending = self.pending_bumps
+        if self._call(lambda: self.client.incr(f"{self.prefix}:version"), default=False) is not False:
+            self.pending_bumps -= pending
+
+    def get(self, key: str) -> Optional[List[dict]]:
+        value = self._call(lambda: self.client.get(f"{self.prefix}:{key}"))
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, results: List[dict]):
+        data = json.dumps(results, default=str)
+        ttl = int(self.ttl_seconds) if self.ttl_seconds > 0 else None
+        self._call(lambda: self.client.set(f"{self.prefix}:{key}", data, ex=ttl))
+
+
+class ResultCache:
+    """
+    Two-tier cache of hybrid search results.
+
+    Keys are (catalog version, normalized query, top_k, semantic weight,
+    fusion). The in-process LRU tier is checked first, then the optional
+    shared tier; results computed on a miss are written to both. A result
+    computed while the catalog changes is stored under the version it
+    started with, so it is never served for the new catalog.
+    """
+
+    def __init__(self, local: Optional[LRUCache] = None, shared: Optional[RedisResultTier] = None, version: CatalogVersion = catalog_version, enabled: bool = RESULT_CACHE_ENABLED):
+        self.local = local if local is not None else LRUCache(
+            max_entries=RESULT_CACHE_SIZE,
+            ttl_seconds=RESULT_CACHE_TTL,
+            max_bytes=int(RESULT_CACHE_MAX_MB * 1024 * 1024),
+        )
+        self.shared = shared
+        self.version = version
+        self.enabled = enabled
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        if shared is not None:
+            version.listeners.append(shared.bump)
+
+    @staticmethod
+    def _query_key(query: str, top_k: int, semantic_weight: Optional[float], fusion: Optional[str]) -> Tuple:
+        # Case is kept: the NER model is cased, so intents may differ
+        weight = None if semantic_weight is None else round(float(semantic_weight), 4)
+        return (normalize_query(query, lowercase=False), int(top_k), weight, fusion)
+
+    def _lookup(self, query_key: Tuple) -> Tuple[Optional[List[dict]], str, Tuple, Optional[str]]:
+        """Check both tiers; returns (results or None, status, local key, shared key)."""
+        shared_version = self.shared.version() if self.shared is not None else None
+        local_key = (self.version.value, shared_version) + query_key
+
+        results = self.local.get(local_key)
+        if results is not None:
+            self.local_hits += 1
+            return results, HIT_LOCAL, local_key, None
+
+        shared_key = None
+        if shared_version is not None:
+            shared_key = json.dumps([shared_version, *query_key])
+            results = self.shared.get(shared_key)
+            if results is not None:
+                self.shared_hits += 1
+                self.local.set(local_key, results)
+                return results, HIT_SHARED, local_key, shared_key
+
+        self.misses += 1
+        return None, MISS, local_key, shared_key
+
+    def _store(self, local_key: Tuple, shared_key: Optional[str], results: List[dict]):
+        self.local.set(local_key, results)
+        if shared_key is not None:
+            self.shared.set(shared_key, results)
+
+    def get_or_compute(
+        self,
+        query: str,
+        top_k: int,
+        semantic_weight: Optional[float],
+        fusion: Optional[str],
+        compute: Callable[[], List[dict]],
+        cacheable: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[List[dict], str]:
+        """
+        Return cached results or compute and cache them.
+
+        `cacheable` is asked after computing; results it rejects (e.g. a
+        search answered without one of its legs) are returned but not stored.
+
+        Returns:
+            (results, HIT_LOCAL, HIT_SHARED or MISS)
+        """
+        if not self.enabled:
+            return compute(), MISS
+        results, status, local_key, shared_key = self._lookup(self._query_key(query, top_k, semantic_weight, fusion))
+        if results is None:
+            results = compute()
+            if cacheable is None or cacheable():
+                self._store(local_key, shared_key, results)
+        return results, status
+
+    async def get_or_compute_async(
+        self,
+        query: str,
+        top_k: int,
+        semantic_weight: Optional[float],
+        fusion: Optional[str],
+        compute: Callable[[], Awaitable[List[dict]]],
+        cacheable: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[List[dict], str]:
+        """get_or_compute for async handlers; shared tier calls run in a worker thread."""
+        if not self.enabled:
+            return await compute(), MISS
+        query_key = self._query_key(query, top_k, semantic_weight, fusion)
+        if self.shared is None:
+            results, status, local_key, shared_key = self._lookup(query_key)
+        else:
+            results, status, local_key, shared_key = await asyncio.to_thread(self._lookup, query_key)
+        if results is None:
+            results = await compute()
+            if cacheable is None or cacheable():
+                if shared_key is None:
+                    self._store(local_key, shared_key, results)
+                else:
+                    await asyncio.to_thread(self._store, local_key, shared_key, results)
+        return results, status
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "catalog_version": self.version.value,
+            "catalog_changed_at": self.version.bumped_at,
+            "catalog_change_reason": self.version.last_reason,
+            "lookups": lookups,
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+            "local": self.local.stats(),
+            "shared": None if self.shared is None else {
+                "url_configured": True,
+                "available": self.shared.available(),
+                "errors": self.shared.errors,
+                "skipped": self.shared.skipped,
+            },
+        }
+
+
+def _create_result_cache() -> ResultCache:
+    shared = None
+    if RESULT_CACHE_ENABLED and RESULT_CACHE_REDIS_URL:
+        try:
+            shared = RedisResultTier(RESULT_CACHE_REDIS_URL)
+        except ImportError as e:
+            logger.warning("%s; using the in-process result cache only", e)
+    return ResultCache(shared=shared)
+
+
+result_cache = _create_result_cache()
+
+metrics.counter_callback(
+    "result_cache_lookups",
+    "Lookups of the search result cache by result",
+    lambda: {
+        (HIT_LOCAL,): result_cache.local_hits,
+        (HIT_SHARED,): result_cache.shared_hits,
+        (MISS,): result_cache.misses,
+    },
+    ("result",),
+)
+metrics.gauge("result_cache_entries", "Entries in the in-process search result cache", lambda: len(result_cache.local))
@@ -1,8 +1,164 @@
-from datasets import load_dataset, Dataset, DatasetDict
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datasets import load_dataset, load_from_disk, concatenate_datasets, Dataset, DatasetDict
 from sentence_transformers import InputExample, SentenceTransformer, losses
-# from torch.utils.data import DataLoader
+from sentence_transformers.evaluation import EmbeddingSimilarityEvaluator
+from torch.utils.data import DataLoader
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+WDC_DATASET = "wdc/products-2017"
+# Local copies of the WDC subsets: <WDC_DATA_DIR>/<subset>/<split>.parquet
+# (.jsonl, .json and .csv work too); fetch them once with --download
+WDC_DATA_DIR = os.getenv("WDC_DATA_DIR", os.path.join("data", "raw", "wdc"))
+# Prepared training examples, keyed by a hash of the inputs
+TRAINING_CACHE_DIR = os.getenv("TRAINING_CACHE_DIR", os.path.join("data", "cache", "training"))
+# Worker processes for dataset preprocessing
+TRAINER_NUM_PROC = int(os.getenv("TRAINER_NUM_PROC", str(min(8, os.cpu_count() or 1))))
+# Bump whenever _pair_texts changes, so stale cached examples are not reused
+PREPROCESS_VERSION = 1
+
+SPLITS = ("train", "validation")
+LOCAL_FORMATS = {".parquet": "parquet", ".jsonl": "json", ".json": "json", ".csv": "csv"}
+# Rows per worker below which preprocessing stays in one process
+MIN_ROWS_PER_PROC = 1000
+
+
+def download_wdc_subsets(subsets: list, data_dir: str = WDC_DATA_DIR):
+    """
+    Save the train and validation splits of WDC subsets as local parquet files.
+
+    Args:
+        subsets (list): Subsets of the dataset to download.
+        data_dir (str): Directory the subsets are written to.
+    """
+    for subset in subsets:
+        dataset = load_dataset(WDC_DATASET, subset)
+        os.makedirs(os.path.join(data_dir, subset), exist_ok=True)
+        for split in SPLITS:
+            dataset[split].to_parquet(os.path.join(data_dir, subset, f"{split}.parquet"))
+        print(f"Saved {subset} to {os.path.join(data_dir, subset)}")
+
+
+def _split_files(subset: str, data_dir: str) -> Tuple[str, Dict[str, str]]:
+    """Loader name and file of every split of a locally stored subset."""
+    subset_dir = os.path.join(data_dir, subset)
+    for extension, loader in LOCAL_FORMATS.items():
+        files = {split: os.path.join(subset_dir, f"{split}{extension}") for split in SPLITS}
+        if all(os.path.isfile(path) for path in files.values()):
+            return loader, files
+    raise FileNotFoundError(
+        f"No local train/validation files for '{subset}' in {subset_dir}; "
+        f"run with --download once to fetch them"
+    )
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _pair_texts(batch: Dict[str, list]) -> Dict[str, list]:
+    """Batched map function: title + description of both offers, and the float label."""
+    def text(titles, descriptions):
+        return [f"{title or ''} {description or ''}".strip() for title, description in zip(titles, descriptions)]
+
+    return {
+        "text_left": text(batch["title_left"], batch["description_left"]),
+        "text_right": text(batch["title_right"], batch["description_right"]),
+        "label": [float(label) for label in batch["label"]],
+    }
+
+
+def _num_proc(rows: int, num_proc: int) -> Optional[int]:
+    # Spawning workers costs more than it saves on small splits
+    workers = min(num_proc, rows // MIN_ROWS_PER_PROC)
+    return workers if workers > 1 else None
+
+
+def prepare_wdc_dataset(
+    subsets: list,
+    train_size: int = 5000,
+    val_size: int = 1000,
+    data_dir: str = WDC_DATA_DIR,
+    cache_dir: str = TRAINING_CACHE_DIR,
+    num_proc: int = TRAINER_NUM_PROC,
+) -> DatasetDict:
+    """
+    Text pairs and labels of WDC subsets, prepared once and cached on disk.
+
+    The cache key is a hash of the content of every input file, the sizes
+    and PREPROCESS_VERSION, so a run with the same inputs loads the prepared
+    splits directly and any change to the data is picked up.
+
+    Args:
+        subsets (list): Subsets of the dataset to load.
+        train_size (int): Number of training samples to use from each subset.
+        val_size (int): Number of validation samples to use from each subset.
+        data_dir (str): Directory of the local subset files.
+        cache_dir (str): Directory of the prepared-example cache.
+        num_proc (int): Worker processes for preprocessing.
+
+    Returns:
+        DatasetDict: "train" and "validation" with text_left, text_right and label.
+    """
+    sources = {subset: _split_files(subset, data_dir) for subset in subsets}
+    key_parts = {
+        "version": PREPROCESS_VERSION,
+        "train_size": train_size,
+        "val_size": val_size,
+        "files": [
+            [subset, split, _file_digest(path)]
+            for subset, (_, files) in sources.items()
+            for split, path in files.items()
+        ],
+    }
+    key = hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()[:16]
+    cache_path = os.path.join(cache_dir, key)
+    if os.path.isdir(cache_path):
+        print(f"Using cached training examples from {cache_path}")
+        return load_from_disk(cache_path)
+
+    limits = {"train": train_size, "validation": val_size}
+    prepared = {split: [] for split in SPLITS}
+    for subset, (loader, files) in sources.items():
+        dataset = load_dataset(loader, data_files=files)
+        for split in SPLITS:
+            data = dataset[split].select(range(min(limits[split], len(dataset[split]))))
+            prepared[split].append(data.map(
+                _pair_texts,
+                batched=True,
+                num_proc=_num_proc(len(data), num_proc),
+                remove_columns=data.column_names,
+                desc=f"Preparing {subset}/{split}",
+            ))
+    dataset = DatasetDict({split: concatenate_datasets(parts) for split, parts in prepared.items()})
+
+    # Written next to the final path and renamed, so readers never see half a cache entry
+    temp_path = f"{cache_path}.tmp-{os.getpid()}"
+    dataset.save_to_disk(temp_path)
+    try:
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # Another run cached the same inputs first
+        shutil.rmtree(temp_path, ignore_errors=True)
+    print(f"Cached training examples in {cache_path}")
+    return dataset
+
+
+def _to_input_examples(data: Dataset) -> List[InputExample]:
+    columns = data.to_dict()
+    return [
+        InputExample(texts=[left, right], label=label)
+        for left, right, label in zip(columns["text_left"], columns["text_right"], columns["label"])
+    ]
 
 
 # Fine tuning a SentenceTransformer model on the WDC Products-2017 dataset
@@ -10,55 +166,102 @@ def load_wdc_dataset(
     subsets: list,
     train_size: int = 5000,
     val_size: int = 1000,
+    data_dir: str = WDC_DATA_DIR,
+    cache_dir: str = TRAINING_CACHE_DIR,
+    num_proc: int = TRAINER_NUM_PROC,
 ):
     """
     Load and preprocess data from multiple subsets of the WDC Products-2017 dataset.
 
+    Reads the local subset files and reuses cached preparation (see
+    prepare_wdc_dataset).
+
     Args:
         subsets (list): List of subsets of the dataset to load.
         train_size (int): Number of training samples to use from each subset.
         val_size (int): Number of validation samples to use from each subset.
+        data_dir (str): Directory of the local subset files.
+        cache_dir (str): Directory of the prepared-example cache.
+        num_proc (int): Worker processes for preprocessing.
 
     Returns:
         train_examples (list): List of InputExample for training.
         val_examples (list): List of InputExample for validation.
     """
-    train_examples = []
-    val_examples = []
-
-    for subset in subsets:
-        dataset = load_dataset("wdc/products-2017", subset)
-
-        # Extract relevant columns and limit the size
-        train_data = dataset["train"].select(
-            range(min(train_size, len(dataset["train"])))
-        )
-        val_data = dataset["validation"].select(
-            range(min(val_size, len(dataset["validation"])))
-        )
-
-        def convert_to_input_examples(data):
-            examples = []
-            for row in data:
-                text_left = (
-                    (row["title_left"] or "") + " " + (row["description_left"] or "")
-                )
-                text_right = (
-                    (row["title_right"] or "") + " " + (row["description_right"] or "")
-                )
+    dataset = prepare_wdc_dataset(subsets, train_size, val_size, data_dir, cache_dir, num_proc)
+    return _to_input_examples(dataset["train"]), _to_input_examples(dataset["validation"])
+
+
+def mine_hard_negatives(
+    model: SentenceTransformer,
+    examples: Sequence[InputExample],
+    num_negatives: int = 1,
+    batch_size: int = 256,
+    chunk_size: int = 256,
+    max_similarity: float = 0.95,
+) -> List[InputExample]:
+    """
+    Hard negatives for the positive pairs of `examples`.
 
-                examples.append(
-                    InputExample(
-                        texts=[text_left.strip(), text_right.strip()],
-                        label=float(row["label"]),
-                    )
-                )
-            return examples
+    Every distinct text of the examples is embedded once in batches; the
+    catalog is then scored against chunks of anchors with one matrix product
+    per chunk, and the top-scoring texts other than the anchor's positives
+    become its negatives. Texts scoring at or above `max_similarity` are
+    skipped as probable unlabeled matches.
 
-        train_examples.extend(convert_to_input_examples(train_data))
-        val_examples.extend(convert_to_input_examples(val_data))
+    Args:
+        model (SentenceTransformer): Model whose embeddings rank the candidates.
+        examples (list): Labeled pairs; those with label 1 are anchors.
+        num_negatives (int): Negatives per positive pair.
+        batch_size (int): Encoding batch size.
+        chunk_size (int): Anchors scored per matrix product.
+        max_similarity (float): Candidates at or above this cosine are skipped.
 
-    return train_examples, val_examples
+    Returns:
+        list: InputExample(texts=[anchor, negative], label=0.0) pairs.
+    """
+    texts = list(dict.fromkeys(text for example in examples for text in example.texts))
+    position = {text: index for index, text in enumerate(texts)}
+    positives: Dict[int, set] = {}
+    anchor_set: Dict[int, None] = {}
+    for example in examples:
+        left, right = (position[text] for text in example.texts)
+        if example.label >= 0.5:
+            anchor_set[left] = None
+            # Matching is symmetric: with pairs (a, b) and (b, c), a must not
+            # be mined as a negative of anchor b
+            positives.setdefault(left, set()).add(right)
+            positives.setdefault(right, set()).add(left)
+    anchors = np.fromiter(anchor_set, dtype=np.int64, count=len(anchor_set))
+    if not len(anchors) or len(texts) < 2:
+        return []
+
+    embeddings = model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True,
+    ).astype(np.float32)
+
+    k = min(num_negatives + max(len(positives[anchor]) for anchor in anchor_set) + 1, len(texts))
+    negatives = []
+    for start in range(0, len(anchors), chunk_size):
+        chunk = anchors[start:start + chunk_size]
+        scores = embeddings[chunk] @ embeddings.T
+        rows = np.arange(len(chunk))
+        scores[rows, chunk] = -np.inf
+        scores[scores >= max_similarity] = -np.inf
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        for row, anchor in enumerate(chunk.tolist()):
+            picked = [
+                int(candidate) for candidate in top[row]
+                if candidate not in positives[anchor] and np.isfinite(scores[row, candidate])
+            ][:num_negatives]
+            negatives.extend(InputExample(texts=[texts[anchor], texts[candidate]], label=0.0) for candidate in picked)
+    return negatives
 
 
 # Fine-tune a SentenceTransformer model (all-MiniLM-L6-v2) using the WDC dataset
@@ -69,6 +272,9 @@ def fine_tune_model(
     output_dir="fine_tuned_model",
     epochs=1,
     batch_size=16,
+    hard_negatives=0,
+    seed=42,
+    use_amp=False,
 ):
     """
     Fine-tune a SentenceTransformer model on the WDC dataset using titles and descriptions.
@@ -80,13 +286,29 @@ def fine_tune_model(
         output_dir (str): Directory to save the fine-tuned model.
         epochs (int): Number of training epochs.
         batch_size (int): Batch size for training.
+        hard_negatives (int): Mined hard negatives added per positive pair (0 disables mining).
+        seed (int): Seed of every random number generator, for reproducible runs.
+        use_amp (bool): Train with automatic mixed precision (GPU only).
     """
+    from transformers import set_seed
+
+    set_seed(seed)
+
     # Load the pre-trained model
     model = SentenceTransformer(model_name)
 
-    # Create DataLoaders for training and validation
+    if hard_negatives > 0:
+        mined = mine_hard_negatives(model, train_examples, num_negatives=hard_negatives)
+        print(f"Mined {len(mined)} hard negatives")
+        train_examples = list(train_examples) + mined
+
+    # DataLoader for training; validation pairs are scored by the evaluator
     train_dataloader = DataLoader(train_examples, shuffle=True, batch_size=batch_size)
-    val_dataloader = DataLoader(val_examples, shuffle=False, batch_size=batch_size)
+    evaluator = (
+        EmbeddingSimilarityEvaluator.from_input_examples(val_examples, batch_size=batch_size, name="wdc-validation")
+        if val_examples
+        else None
+    )
 
     # Define the loss function
     train_loss = losses.CosineSimilarityLoss(model)
@@ -94,9 +316,11 @@ def fine_tune_model(
     # Fine-tune the model
     model.fit(
         train_objectives=[(train_dataloader, train_loss)],
+        evaluator=evaluator,
         epochs=epochs,
         evaluation_steps=100,
         output_path=output_dir,
+        use_amp=use_amp,
     )
 
     print(f"Model fine-tuned and saved to {output_dir}")
@@ -134,7 +358,7 @@ def prepare_dataset(file_path: str, train_frac: float = 0.8) -> DatasetDict:
     return DatasetDict({"train": train_dataset, "validation": val_dataset})
 
 
-def fine_tune_model(
+def fine_tune_ner_model(
     dataset: DatasetDict,
     model_name: str,
     output_dir: str,
@@ -142,7 +366,7 @@ def fine_tune_model(
     batch_size: int = 16,
 ):
     """
-    Fine-tune a pre-trained model on the given dataset.
+    Fine-tune a pre-trained token classification (NER) model on the given dataset.
 
     Args:
         dataset (DatasetDict): The dataset for training and validation.
@@ -236,8 +460,46 @@ if __name__ == "__main__":
         "watches_xlarge",
     ]
 
+    parser = argparse.ArgumentParser(description="Fine-tune the retrieval model on WDC Products-2017")
+    parser.add_argument("--subsets", default=",".join(all_subsets), help="Comma-separated WDC subsets")
+    parser.add_argument("--data-dir", default=WDC_DATA_DIR)
+    parser.add_argument("--cache-dir", default=TRAINING_CACHE_DIR)
+    parser.add_argument("--download", action="store_true", help="Fetch the subsets into --data-dir first")
+    parser.add_argument("--train-size", type=int, default=5000, help="Training pairs per subset")
+    parser.add_argument("--val-size", type=int, default=1000, help="Validation pairs per subset")
+    parser.add_argument("--num-proc", type=int, default=TRAINER_NUM_PROC)
+    parser.add_argument("--hard-negatives", type=int, default=1, help="Mined negatives per positive pair")
+    parser.add_argument("--model-name", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--output-dir", default="fine_tuned_model")
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--amp", action="store_true", help="Use mixed precision")
+    args = parser.parse_args()
+
+    subsets = [subset.strip() for subset in args.subsets.split(",") if subset.strip()]
+    if args.download:
+        download_wdc_subsets(subsets, args.data_dir)
+
     # Load dataset from all subsets
-    train_examples, val_examples = load_wdc_dataset(subsets=all_subsets)
+    train_examples, val_examples = load_wdc_dataset(
+        subsets=subsets,
+        train_size=args.train_size,
+        val_size=args.val_size,
+        data_dir=args.data_dir,
+        cache_dir=args.cache_dir,
+        num_proc=args.num_proc,
+    )
 
     # Fine-tune the model
-    fine_tune_model(train_examples, val_examples)
+    fine_tune_model(
+        train_examples,
+        val_examples,
+        model_name=args.model_name,
+        output_dir=args.output_dir,
+        epochs=args.epochs,
+        batch_size=args.batch_size,
+        hard_negatives=args.hard_negatives,
+        seed=args.seed,
+        use_amp=args.amp,
+    )
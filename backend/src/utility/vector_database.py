@@ -1,100 +1,235 @@
 # src/utility/vector_database.py
 import os
-from typing import List
+import time
+from typing import Any, Dict, List, Optional, Tuple
 import numpy as np
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import VectorParams, Distance
-from qdrant_client.models import PointStruct
+from qdrant_client import AsyncQdrantClient, QdrantClient
 from dotenv import load_dotenv
 from src.utility.logger import get_logger
+from src.utility.vector_store import VectorStore, QdrantVectorStore, InMemoryVectorStore, Record
+from src.utility.catalog_version import catalog_version
+from src.utility.metrics import metrics
 
 load_dotenv()
 
 logger = get_logger(__name__)
 
+QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
+# Use gRPC (on QDRANT_GRPC_PORT) instead of REST for points traffic
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+# Per-request timeout in seconds, and retries of transient errors with exponential backoff
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+QDRANT_RETRIES = int(os.getenv("QDRANT_RETRIES", "2"))
+QDRANT_RETRY_BACKOFF = float(os.getenv("QDRANT_RETRY_BACKOFF", "0.1"))
+# Keep-alive REST connections per client, shared by all concurrent requests
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "32"))
+# Points per upsert request, and upsert requests in flight per ingestion batch
+QDRANT_UPSERT_BATCH = int(os.getenv("QDRANT_UPSERT_BATCH", "256"))
+QDRANT_MAX_IN_FLIGHT = int(os.getenv("QDRANT_MAX_IN_FLIGHT", "4"))
+
+
+def _client_options() -> Dict[str, Any]:
+    import httpx
+
+    return {
+        "url": QDRANT_URL,
+        "prefer_grpc": QDRANT_PREFER_GRPC,
+        "grpc_port": QDRANT_GRPC_PORT,
+        "timeout": QDRANT_TIMEOUT,
+        # Without explicit limits qdrant-client opens a new connection per request
+        "limits": httpx.Limits(max_connections=QDRANT_POOL_SIZE, max_keepalive_connections=QDRANT_POOL_SIZE),
+        "check_compatibility": False,  # Disable version check to avoid warnings
+    }
+
+
 # Initialize Qdrant client
-client = QdrantClient(
-    url=os.getenv("QDRANT_URL", "http://localhost:6333"),
-    check_compatibility=False,  # Disable version check to avoid warnings
-)
+client = QdrantClient(**_client_options())
 
 
-def initialize_database():
-    """Initialize the Qdrant collection"""
-    collection_name = os.getenv("QDRANT_COLLECTION", "ecommerce")
-    try:
-        # Check if the collection exists
-        client.get_collection(collection_name)
-        logger.info(f"Collection '{collection_name}' already exists in Qdrant.")
-    except Exception as e:
-        # Create the collection if it does not exist
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=384, distance=Distance.COSINE),
+def create_async_client() -> AsyncQdrantClient:
+    """Async Qdrant client with the same transport settings as `client`"""
+    return AsyncQdrantClient(**_client_options())
+
+
+# Vector store backend: "qdrant" or the in-process "memory" store
+VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant").lower()
+# Directory the in-process store is saved to and memory-mapped from
+VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH", "data/index/vectors")
+# Approximate (IVF) search for large in-process catalogs
+VECTOR_STORE_ANN = os.getenv("VECTOR_STORE_ANN", "false").lower() == "true"
+VECTOR_STORE_NLIST = int(os.getenv("VECTOR_STORE_NLIST", "256"))
+VECTOR_STORE_NPROBE = int(os.getenv("VECTOR_STORE_NPROBE", "16"))
+VECTOR_STORE_ANN_MIN_ROWS = int(os.getenv("VECTOR_STORE_ANN_MIN_ROWS", "50000"))
+# First-pass quantization ("none", "int8" or "binary") and how many
+# candidates per requested result are rescored in full precision
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none").lower()
+VECTOR_OVERSAMPLING = float(os.getenv("VECTOR_OVERSAMPLING", "2.0"))
+
+
+def create_vector_store(backend: str = VECTOR_STORE) -> VectorStore:
+    """Create the configured vector store backend"""
+    if backend == "memory":
+        return InMemoryVectorStore(
+            path=VECTOR_STORE_PATH or None,
+            approximate=VECTOR_STORE_ANN,
+            nlist=VECTOR_STORE_NLIST,
+            nprobe=VECTOR_STORE_NPROBE,
+            ann_min_rows=VECTOR_STORE_ANN_MIN_ROWS,
+            quantization=VECTOR_QUANTIZATION,
+            oversampling=VECTOR_OVERSAMPLING,
         )
-        logger.info(f"Collection '{collection_name}' created in Qdrant.")
-        logger.error(f"Error while checking or creating collection: {e}")
+    if backend != "qdrant":
+        logger.warning("Unknown VECTOR_STORE '%s', falling back to qdrant", backend)
+    return QdrantVectorStore(
+        client,
+        os.getenv("QDRANT_COLLECTION", "ecommerce"),
+        quantization=VECTOR_QUANTIZATION,
+        oversampling=VECTOR_OVERSAMPLING,
+        async_client_factory=create_async_client,
+        retries=QDRANT_RETRIES,
+        retry_backoff=QDRANT_RETRY_BACKOFF,
+        upsert_batch_size=QDRANT_UPSERT_BATCH,
+        max_in_flight=QDRANT_MAX_IN_FLIGHT,
+    )
+
+
+store = create_vector_store()
+
+# Read at scrape time; for Qdrant this is one count request per scrape
+metrics.gauge("vector_store_points", "Products stored in the vector store", lambda: store.count())
+
+
+def initialize_database():
+    """Initialize the vector store (the Qdrant collection by default)"""
+    store.initialize()
 
 
 def insert_product(product_id: int, description: str, embedding: np.ndarray, payload: dict):
-    """Insert a new product into the Qdrant collection, checking for duplicates"""
-    collection_name = os.getenv("QDRANT_COLLECTION", "ecommerce")
+    """Insert a new product into the vector store"""
     try:
-        # Check for similar products (cosine similarity threshold of 0.8)
-        # search_results = search_similar_products(embedding, top_k=1)
-        # if search_results and search_results[0]["score"] > 0.8:
-        #     existing_product = search_results[0]
-        #     logger.info(f"Skipping duplicate product. Similar product found: {existing_product}")
-        #     return False  # Return False to indicate duplicate
-
-        # client.upsert(
-        #     collection_name=collection_name,
-        #     points=[
-        #         {
-        #             "id": product_id,  # Ensure this is an integer
-        #             "vector": embedding.tolist(),
-        #             "payload": {"description": description},
-        #         }
-        #     ],
-        # )
-        # payload = {"description": description}
-        client.upsert(
-            collection_name=collection_name,
-            points=[
-                PointStruct(
-                    id=product_id,
-                    vector=embedding,
-                    payload=payload
-                )
-            ]
-        )
-        logger.info(f"Successfully inserted product {product_id}")
+        store.upsert([product_id], np.asarray(embedding)[None, :], [payload])
+        catalog_version.bump("insert_product")
+        logger.info("Successfully inserted product %s", product_id)
         return True  # Return True to indicate successful insertion
     except Exception as e:
-        logger.error(f"Error while inserting product {product_id}: {e}")
+        logger.error("Error while inserting product %s: %s", product_id, e)
         raise
 
 
-def search_similar_products(query_embedding: np.ndarray, top_k: int = 5) -> List[dict]:
-    """Search for similar products using Qdrant"""
-    collection_name = os.getenv("QDRANT_COLLECTION", "ecommerce")
+def insert_products(product_ids: List[int], embeddings: np.ndarray, payloads: List[dict]) -> int:
+    """Insert a batch of products into the vector store with a single upsert"""
+    if not product_ids:
+        return 0
     try:
-        results = client.search(
-            collection_name=collection_name,
-            query_vector=query_embedding.tolist(),
-            limit=top_k,
-        )
-        logger.info(
-            f"Search completed in collection '{collection_name}' for top {top_k} results."
-        )
-        return [
-            {
-                "product_id": result.id,
-                "payload": result.payload,
-                "score": result.score,
-            }
-            for result in results
-        ]
+        store.upsert(product_ids, embeddings, payloads)
+        catalog_version.bump("insert_products")
+        logger.info("Successfully inserted batch of %d products", len(product_ids))
+        return len(product_ids)
+    except Exception as e:
+        logger.error("Error while inserting batch of %d products: %s", len(product_ids), e)
+        raise
+
+
+def search_similar_products(
+    query_embedding: np.ndarray,
+    top_k: int = 5,
+    oversampling: Optional[float] = None,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[dict]:
+    """Search for similar products in the vector store, filtered server-side by `filters`"""
+    try:
+        results = store.search(query_embedding, top_k=top_k, oversampling=oversampling, filters=filters)
+        logger.info("Search completed in %s vector store for top %s results.", VECTOR_STORE, top_k)
+        return results
+    except Exception as e:
+        logger.error("Error during search in %s vector store: %s", VECTOR_STORE, e)
+        raise
+
+
+def search_similar_products_batch(
+    query_embeddings: np.ndarray,
+    top_k: List[int],
+    filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+) -> List[List[dict]]:
+    """Search many queries with one batched request; returns one result list per query"""
+    try:
+        results = store.search_batch(query_embeddings, top_k=top_k, filters=filters)
+        logger.info("Batch search of %d queries completed in %s vector store.", len(top_k), VECTOR_STORE)
+        return results
+    except Exception as e:
+        logger.error("Error during batch search in %s vector store: %s", VECTOR_STORE, e)
+        raise
+
+
+async def search_similar_products_async(
+    query_embedding: np.ndarray,
+    top_k: int = 5,
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[dict]:
+    """Non-blocking search_similar_products for async handlers"""
+    try:
+        results = await store.search_async(query_embedding, top_k=top_k, filters=filters)
+        logger.info("Search completed in %s vector store for top %s results.", VECTOR_STORE, top_k)
+        return results
+    except Exception as e:
+        logger.error("Error during search in %s vector store: %s", VECTOR_STORE, e)
+        raise
+
+
+def scroll_products(limit: int = 1000, offset: Any = None) -> Tuple[List[Record], Any]:
+    """Page through stored products; returns (records, next_offset)"""
+    return store.scroll(limit=limit, offset=offset)
+
+
+def count_products() -> int:
+    """Exact number of stored products"""
+    return store.count()
+
+
+def quantization_report(sample_size: int = 100, top_k: int = 10, oversampling: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Compare quantized search against exact search on sampled catalog vectors.
+
+    Args:
+        sample_size: Number of stored vectors used as queries
+        top_k: Result depth recall is measured at
+        oversampling: Oversampling factor to evaluate (defaults to the configured one)
+
+    Returns:
+        Memory usage of the store plus recall@k and mean latencies of both searches
+    """
+    queries = store.sample_vectors(sample_size)
+    recalls = []
+    quantized_seconds = 0.0
+    exact_seconds = 0.0
+    for query in queries:
+        start = time.perf_counter()
+        exact = store.search(query, top_k=top_k, exact=True)
+        exact_seconds += time.perf_counter() - start
+        start = time.perf_counter()
+        approximate = store.search(query, top_k=top_k, oversampling=oversampling)
+        quantized_seconds += time.perf_counter() - start
+        if exact:
+            expected = {result["product_id"] for result in exact}
+            found = {result["product_id"] for result in approximate}
+            recalls.append(len(expected & found) / len(expected))
+
+    queries_run = max(len(queries), 1)
+    return {
+        "memory": store.memory_usage(),
+        "oversampling": oversampling if oversampling is not None else getattr(store, "oversampling", None),
+        "queries": len(queries),
+        "top_k": top_k,
+        "recall": round(float(np.mean(recalls)), 4) if recalls else None,
+        "quantized_ms": round(quantized_seconds / queries_run * 1000, 3),
+        "exact_ms": round(exact_seconds / queries_run * 1000, 3),
+    }
+
+
+def save_vector_store():
+    """Persist the in-process store; a no-op for Qdrant"""
+    try:
+        store.save()
     except Exception as e:
-        logger.error(f"Error during search in collection '{collection_name}': {e}")
-        return []
+        logger.error("Error while saving the vector store: %s", e)
@@ -0,0 +1,1011 @@
+# src/utility/vector_store.py
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from src.utility.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Scrolled point: same `id` / `payload` attributes as Qdrant records
+Record = namedtuple("Record", ["id", "payload"])
+# Rows of an InMemoryVectorStore as one search sees them; upserts publish a new one
+_StoreState = namedtuple("_StoreState", ["vectors", "codes", "size", "ids", "payloads", "columns"])
+
+VECTOR_SIZE = 384
+
+# First-pass vector encodings: full precision, int8 scalar or 1-bit binary
+QUANTIZATION_MODES = ("none", "int8", "binary")
+# Quantile of absolute component values mapped to the int8 range
+INT8_QUANTILE = 0.99
+# Rows scored per block so quantized scans never materialize a float32 copy
+# of the matrix; small enough for the block buffer to stay in cache
+SCAN_BLOCK_ROWS = 2048
+# Lock-free attempts of an in-memory search overlapping upserts before it takes the lock
+READ_RETRIES = 3
+# HTTP statuses of an overloaded or restarting Qdrant that are worth retrying
+RETRYABLE_STATUS_CODES = (429, 502, 503, 504)
+# Oldest Qdrant server with the query API (query_points / query_batch_points)
+QDRANT_MIN_SERVER_VERSION = (1, 10, 0)
+
+
+def quantized_bytes_per_vector(vector_size: int, quantization: str) -> int:
+    """Memory of one first-pass vector encoding"""
+    if quantization == "int8":
+        return vector_size
+    if quantization == "binary":
+        return math.ceil(vector_size / 8)
+    return vector_size * 4
+
+
+def candidate_count(top_k: int, oversampling: float) -> int:
+    """Number of quantized candidates rescored for a top-k query"""
+    return max(top_k, int(math.ceil(top_k * max(oversampling, 1.0))))
+
+
+# Typed payload fields written at ingestion and indexed for filtered search
+PAYLOAD_INDEXES = {"price": "float", "brand": "keyword", "category": "keyword"}
+
+
+def matches_filters(payload: dict, filters: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a search filter against one payload.
+
+    Filters map a keyword field to the list of accepted values (products
+    without the field pass, so sparse catalog data is not excluded) and a
+    numeric field to a range dict with "lt", "lte", "gt" and/or "gte"
+    (products without the field fail).
+    """
+    for field, condition in (filters or {}).items():
+        value = payload.get(field)
+        if isinstance(condition, dict):
+            if value is None:
+                return False
+            if "lt" in condition and not value < condition["lt"]:
+                return False
+            if "lte" in condition and not value <= condition["lte"]:
+                return False
+            if "gt" in condition and not value > condition["gt"]:
+                return False
+            if "gte" in condition and not value >= condition["gte"]:
+                return False
+        elif value not in (None, "") and value not in condition:
+            return False
+    return True
+
+
+def to_qdrant_filter(filters: Optional[Dict[str, Any]]):
+    """Translate a search filter (see matches_filters) into a Qdrant Filter."""
+    if not filters:
+        return None
+    from qdrant_client.http import models
+
+    must = []
+    for field, condition in filters.items():
+        if isinstance(condition, dict):
+            must.append(models.FieldCondition(key=field, range=models.Range(**condition)))
+        else:
+            must.append(models.Filter(should=[
+                models.FieldCondition(key=field, match=models.MatchAny(any=list(condition))),
+                models.IsEmptyCondition(is_empty=models.PayloadField(key=field)),
+            ]))
+    return models.Filter(must=must)
+
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(bits: np.ndarray) -> np.ndarray:
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(bits: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[bits].sum(axis=1, dtype=np.int32)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Connection failures, timeouts and overload responses, over REST or gRPC."""
+    import httpx
+    from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+
+    if isinstance(error, (httpx.TransportError, ResponseHandlingException)):
+        return True
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    try:
+        import grpc
+    except ImportError:
+        return False
+    if isinstance(error, grpc.RpcError) and hasattr(error, "code"):
+        return error.code() in (
+            grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.RESOURCE_EXHAUSTED,
+        )
+    return False
+
+
+def _retry_delay(attempt: int, backoff: float) -> float:
+    # Exponential backoff with jitter so retrying workers do not synchronize
+    return backoff * (2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def call_with_retries(operation: Callable[[], Any], retries: int, backoff: float, description: str) -> Any:
+    """Run `operation`, retrying transient errors up to `retries` times."""
+    attempt = 0
+    while True:
+        try:
+            return operation()
+        except Exception as e:
+            if attempt >= retries or not is_transient_error(e):
+                raise
+            delay = _retry_delay(attempt, backoff)
+            attempt += 1
+            logger.warning(f"Qdrant {description} failed ({e}); retry {attempt}/{retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+
+async def call_with_retries_async(operation: Callable[[], Awaitable[Any]], retries: int, backoff: float, description: str) -> Any:
+    """Async version of call_with_retries; waits without blocking the event loop."""
+    attempt = 0
+    while True:
+        try:
+            return await operation()
+        except Exception as e:
+            if attempt >= retries or not is_transient_error(e):
+                raise
+            delay = _retry_delay(attempt, backoff)
+            attempt += 1
+            logger.warning(f"Qdrant {description} failed ({e}); retry {attempt}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+class VectorStore(ABC):
+    """
+    Interface of the product vector stores.
+
+    Search results are dicts with "product_id", "payload" and "score";
+    scroll returns (records, next_offset) like QdrantClient.scroll.
+    """
+
+    @abstractmethod
+    def initialize(self):
+        """Create the underlying collection if needed."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert(self, product_ids: List[Any], embeddings: np.ndarray, payloads: List[dict]):
+        raise NotImplementedError
+
+    @abstractmethod
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, exact: bool = False, oversampling: Optional[float] = None, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """
+        Nearest products by cosine similarity.
+
+        Args:
+            exact: Bypass quantization and approximate indexes
+            oversampling: Override the configured quantization oversampling
+            filters: Payload conditions applied during retrieval (see matches_filters)
+        """
+        raise NotImplementedError
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> List[List[dict]]:
+        """
+        Search several queries at once.
+
+        Args:
+            query_embeddings: One query vector per row
+            top_k: Number of results of each query
+            filters: Optional filter of each query
+
+        Returns:
+            One result list (as returned by search) per query, in order
+        """
+        filters = filters or [None] * len(top_k)
+        return [
+            self.search(query_embedding, top_k=k, filters=query_filters)
+            for query_embedding, k, query_filters in zip(query_embeddings, top_k, filters)
+        ]
+
+    async def search_async(self, query_embedding: np.ndarray, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        """
+        Search without blocking the event loop.
+
+        Backends without a native async client run `search` in a worker thread.
+        """
+        return await asyncio.to_thread(self.search, query_embedding, top_k=top_k, filters=filters)
+
+    async def search_batch_async(self, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> List[List[dict]]:
+        return await asyncio.to_thread(self.search_batch, query_embeddings, top_k, filters)
+
+    @abstractmethod
+    def scroll(self, limit: int = 1000, offset: Any = None) -> Tuple[List[Record], Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def count(self) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def sample_vectors(self, limit: int) -> np.ndarray:
+        """Up to `limit` stored vectors, e.g. to use as evaluation queries."""
+        raise NotImplementedError
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """Vector memory with and without quantization."""
+        count = self.count()
+        quantization = getattr(self, "quantization", "none")
+        full_bytes = count * quantized_bytes_per_vector(self.vector_size, "none")
+        first_pass_bytes = count * quantized_bytes_per_vector(self.vector_size, quantization)
+        return {
+            "vectors": count,
+            "quantization": quantization,
+            "full_precision_bytes": full_bytes,
+            "first_pass_bytes": first_pass_bytes,
+            "compression_ratio": round(full_bytes / first_pass_bytes, 2) if first_pass_bytes else 0.0,
+        }
+
+    def save(self):
+        """Persist the store, for backends that keep their data in-process."""
+
+
+class QdrantVectorStore(VectorStore):
+    """
+    Vector store backed by a Qdrant collection.
+
+    With quantization enabled, Qdrant keeps the int8 (or binary, server
+    1.5+) vectors in RAM for the first pass, the originals on disk, and
+    rescores `oversampling * top_k` candidates against the originals.
+
+    Searches and upserts retry transient errors `retries` times. The async
+    methods use a client from `async_client_factory`, created once per event
+    loop; large upserts are split into `upsert_batch_size` points sent
+    `max_in_flight` at a time over the (pooled) sync client. Keep
+    `max_in_flight=1` for local-mode clients (":memory:" or a path), which
+    are not thread-safe.
+
+    Searches use the query API, so the server must be at least
+    QDRANT_MIN_SERVER_VERSION; `initialize` refuses older servers.
+    """
+
+    def __init__(
+        self,
+        client,
+        collection_name: str,
+        vector_size: int = VECTOR_SIZE,
+        quantization: str = "none",
+        oversampling: float = 2.0,
+        async_client_factory: Optional[Callable[[], Any]] = None,
+        retries: int = 0,
+        retry_backoff: float = 0.1,
+        upsert_batch_size: int = 256,
+        max_in_flight: int = 1,
+    ):
+        self.client = client
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self.async_client_factory = async_client_factory
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.upsert_batch_size = upsert_batch_size
+        self.max_in_flight = max_in_flight
+        self._async_client = None
+        self._async_loop = None
+        self._upsert_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _call(self, description: str, operation: Callable[[], Any]) -> Any:
+        return call_with_retries(operation, self.retries, self.retry_backoff, description)
+
+    def _call_async(self, description: str, operation: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+        return call_with_retries_async(operation, self.retries, self.retry_backoff, description)
+
+    def _get_async_client(self):
+        # Async clients are bound to the event loop they first run on
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            self._async_client = self.async_client_factory()
+            self._async_loop = loop
+        return self._async_client
+
+    def _quantization_config(self):
+        from qdrant_client.http import models
+
+        if self.quantization == "int8":
+            return models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(
+                    type=models.ScalarType.INT8, quantile=INT8_QUANTILE, always_ram=True
+                )
+            )
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def _search_params(self, exact: bool, oversampling: Optional[float]):
+        from qdrant_client.http.models import SearchParams, QuantizationSearchParams
+
+        if exact:
+            return SearchParams(exact=True, quantization=QuantizationSearchParams(ignore=True))
+        if self.quantization == "none":
+            return None
+        return SearchParams(
+            quantization=QuantizationSearchParams(
+                rescore=True,
+                oversampling=oversampling if oversampling is not None else self.oversampling,
+            )
+        )
+
+    def _check_server_version(self):
+        try:
+            version = self.client.info().version
+        except Exception as e:
+            logger.warning("Could not read the Qdrant server version: %s", e)
+            return
+        parsed = tuple(int(part) for part in re.findall(r"\d+", str(version))[:3])
+        if parsed and parsed < QDRANT_MIN_SERVER_VERSION:
+            minimum = ".".join(str(part) for part in QDRANT_MIN_SERVER_VERSION)
+            raise RuntimeError(f"Qdrant server {version} is too old; searches need {minimum} or newer")
+
+    def initialize(self):
+        from qdrant_client.http.models import VectorParams, Distance
+
+        self._check_server_version()
+        quantization_config = self._quantization_config()
+        try:
+            # Check if the collection exists
+            self.client.get_collection(self.collection_name)
+            logger.info(f"Collection '{self.collection_name}' already exists in Qdrant.")
+            if quantization_config is not None:
+                try:
+                    self.client.update_collection(self.collection_name, quantization_config=quantization_config)
+                    logger.info(f"Enabled {self.quantization} quantization on '{self.collection_name}'.")
+                except Exception as e:
+                    logger.warning(f"Could not enable {self.quantization} quantization on '{self.collection_name}': {e}")
+        except Exception as e:
+            # Create the collection if it does not exist
+            self.client.create_collection(
+                collection_name=self.collection_name,
+                vectors_config=VectorParams(
+                    size=self.vector_size,
+                    distance=Distance.COSINE,
+                    # Originals are only read for rescoring once quantized
+                    on_disk=True if quantization_config is not None else None,
+                ),
+                quantization_config=quantization_config,
+            )
+            logger.info(f"Collection '{self.collection_name}' created in Qdrant.")
+            logger.error(f"Error while checking or creating collection: {e}")
+        self._create_payload_indexes()
+
+    def _create_payload_indexes(self):
+        from qdrant_client.http.models import PayloadSchemaType
+
+        schemas = {"float": PayloadSchemaType.FLOAT, "keyword": PayloadSchemaType.KEYWORD}
+        for field, schema in PAYLOAD_INDEXES.items():
+            try:
+                # Idempotent: re-creating an existing index is a no-op
+                self.client.create_payload_index(self.collection_name, field_name=field, field_schema=schemas[schema])
+            except Exception as e:
+                logger.warning(f"Could not create payload index on '{field}': {e}")
+
+    def _upsert_pool(self) -> ThreadPoolExecutor:
+        if self._upsert_executor is None:
+            with self._lock:
+                if self._upsert_executor is None:
+                    self._upsert_executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="qdrant-upsert")
+        return self._upsert_executor
+
+    def upsert(self, product_ids: List[Any], embeddings: np.ndarray, payloads: List[dict]):
+        from qdrant_client.models import PointStruct
+
+        points = [
+            PointStruct(id=product_id, vector=np.asarray(embedding).tolist(), payload=payload)
+            for product_id, embedding, payload in zip(product_ids, embeddings, payloads)
+        ]
+        chunks = [points[start:start + self.upsert_batch_size] for start in range(0, len(points), self.upsert_batch_size)]
+
+        def send(chunk):
+            # Upserts are idempotent by point id, so retrying a chunk is safe
+            return self._call("upsert", lambda: self.client.upsert(collection_name=self.collection_name, points=chunk))
+
+        if len(chunks) <= 1 or self.max_in_flight <= 1:
+            for chunk in chunks:
+                send(chunk)
+            return
+        for future in [self._upsert_pool().submit(send, chunk) for chunk in chunks]:
+            future.result()
+
+    @staticmethod
+    def _to_results(points) -> List[dict]:
+        return [
+            {
+                "product_id": result.id,
+                "payload": result.payload,
+                "score": result.score,
+            }
+            for result in points
+        ]
+
+    def _search_request(self, query_embedding: np.ndarray, top_k: int, exact: bool = False, oversampling: Optional[float] = None, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return {
+            "collection_name": self.collection_name,
+            "query": np.asarray(query_embedding).tolist(),
+            "query_filter": to_qdrant_filter(filters),
+            "limit": top_k,
+            "search_params": self._search_params(exact, oversampling),
+            "with_payload": True,
+        }
+
+    def _batch_requests(self, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]]) -> list:
+        from qdrant_client.http import models
+
+        filters = filters or [None] * len(top_k)
+        search_params = self._search_params(False, None)
+        return [
+            models.QueryRequest(
+                query=np.asarray(query_embedding).tolist(),
+                filter=to_qdrant_filter(query_filters),
+                limit=k,
+                params=search_params,
+                with_payload=True,
+            )
+            for query_embedding, k, query_filters in zip(query_embeddings, top_k, filters)
+        ]
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, exact: bool = False, oversampling: Optional[float] = None, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        request = self._search_request(query_embedding, top_k, exact, oversampling, filters)
+        return self._to_results(self._call("search", lambda: self.client.query_points(**request)).points)
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> List[List[dict]]:
+        # One round trip for the whole batch
+        requests = self._batch_requests(query_embeddings, top_k, filters)
+        batch = self._call(
+            "search_batch", lambda: self.client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        )
+        return [self._to_results(response.points) for response in batch]
+
+    async def search_async(self, query_embedding: np.ndarray, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        if self.async_client_factory is None:
+            return await super().search_async(query_embedding, top_k=top_k, filters=filters)
+        client = self._get_async_client()
+        request = self._search_request(query_embedding, top_k, filters=filters)
+        response = await self._call_async("search", lambda: client.query_points(**request))
+        return self._to_results(response.points)
+
+    async def search_batch_async(self, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> List[List[dict]]:
+        if self.async_client_factory is None:
+            return await super().search_batch_async(query_embeddings, top_k, filters)
+        client = self._get_async_client()
+        requests = self._batch_requests(query_embeddings, top_k, filters)
+        batch = await self._call_async(
+            "search_batch", lambda: client.query_batch_points(collection_name=self.collection_name, requests=requests)
+        )
+        return [self._to_results(response.points) for response in batch]
+
+    def scroll(self, limit: int = 1000, offset: Any = None) -> Tuple[List[Record], Any]:
+        return self.client.scroll(
+            collection_name=self.collection_name,
+            limit=limit,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name, exact=True).count
+
+    def sample_vectors(self, limit: int) -> np.ndarray:
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            limit=limit,
+            with_payload=False,
+            with_vectors=True,
+        )
+        return np.asarray([point.vector for point in points], dtype=np.float32).reshape(-1, self.vector_size)
+
+
+class SegmentedVectors:
+    """
+    Saved rows memory-mapped from disk, followed by an in-memory tail of
+    rows added since the save.
+
+    The saved rows are mapped copy-on-write, so updating one only copies its
+    page into memory, and appended rows never force the mapped rows into
+    memory. Supports the row access the store needs: leading slices, row
+    index arrays and row assignment.
+    """
+
+    def __init__(self, saved: np.ndarray, tail: Optional[np.ndarray] = None):
+        self.saved = saved
+        self.tail = tail if tail is not None else np.zeros((0, saved.shape[1]), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.saved) + len(self.tail)
+
+    def grow(self, rows: int) -> "SegmentedVectors":
+        """A copy with room for `rows` rows; only the tail is copied."""
+        tail = np.zeros((max(rows - len(self.saved), 2 * len(self.tail), 1024), self.saved.shape[1]), dtype=np.float32)
+        tail[:len(self.tail)] = self.tail
+        return SegmentedVectors(self.saved, tail)
+
+    def _split(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows, rows < len(self.saved)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise IndexError("SegmentedVectors only supports contiguous slices")
+            if stop <= len(self.saved):
+                return self.saved[start:stop]
+            if start >= len(self.saved):
+                return self.tail[start - len(self.saved):stop - len(self.saved)]
+            return np.concatenate((self.saved[start:], self.tail[:stop - len(self.saved)]))
+        rows, in_saved = self._split(index)
+        result = np.empty((len(rows), self.saved.shape[1]), dtype=np.float32)
+        result[in_saved] = self.saved[rows[in_saved]]
+        result[~in_saved] = self.tail[rows[~in_saved] - len(self.saved)]
+        return result
+
+    def __setitem__(self, index, values):
+        rows, in_saved = self._split(index)
+        values = np.asarray(values, dtype=np.float32)
+        if in_saved.any():
+            self.saved[rows[in_saved]] = values[in_saved]
+        self.tail[rows[~in_saved] - len(self.saved)] = values[~in_saved]
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index: k-means centroids over the vectors and
+    one row list per centroid. A query only scores the rows of its `nprobe`
+    nearest centroids.
+    """
+
+    def __init__(self, vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        nlist = max(1, min(nlist, len(vectors)))
+        sample = vectors[rng.choice(len(vectors), size=min(len(vectors), nlist * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for list_id in range(nlist):
+                members = sample[assignment == list_id]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[list_id] = centroid / (np.linalg.norm(centroid) or 1.0)
+        self.centroids = centroids.astype(np.float32)
+        self.trained_rows = len(vectors)
+        self.assignment = np.zeros(0, dtype=np.int32)
+        self.assign(np.arange(len(vectors)), vectors)
+
+    def assign(self, rows: np.ndarray, vectors: np.ndarray):
+        """Assign (new or updated) rows to the list of their nearest centroid."""
+        lists = np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+        end = int(rows.max()) + 1 if len(rows) else 0
+        if end > len(self.assignment):
+            grown = np.zeros(max(end, 2 * len(self.assignment)), dtype=np.int32)
+            grown[:len(self.assignment)] = self.assignment
+            self.assignment = grown
+        self.assignment[rows] = lists
+
+    def candidates(self, query: np.ndarray, nprobe: int, row_count: int) -> np.ndarray:
+        scores = self.centroids @ query
+        probe = np.argpartition(-scores, min(nprobe, len(scores)) - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self.assignment[:row_count], probe))
+
+
+class InMemoryVectorStore(VectorStore):
+    """
+    In-process vector store on a contiguous float32 matrix.
+
+    Rows are L2-normalized on insert, so cosine similarity is one
+    matrix-vector product; top-k uses argpartition. The matrix can be saved
+    to and memory-mapped from `path`. With `approximate=True`, catalogs above
+    `ann_min_rows` are searched through an IVF index instead.
+
+    With `quantization` set to "int8" or "binary", the first pass scans
+    compact codes and only `oversampling * top_k` candidates are rescored
+    against the float32 rows; after `save()` those rows are served from the
+    memory-mapped file, so only the codes stay resident.
+
+    The typed PAYLOAD_INDEXES fields are kept as column arrays, so filters
+    become a vectorized row mask applied before scoring.
+
+    Searches do not take the lock. Upserts write new rows past the size
+    searches see and publish them by swapping in a new `_StoreState`; rows
+    of products that are updated are rewritten in place while `_writes` is
+    odd, and a search that overlapped such a write is run again.
+    """
+
+    def __init__(
+        self,
+        vector_size: int = VECTOR_SIZE,
+        path: Optional[str] = None,
+        approximate: bool = False,
+        nlist: int = 256,
+        nprobe: int = 16,
+        ann_min_rows: int = 50000,
+        quantization: str = "none",
+        oversampling: float = 2.0,
+    ):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATION_MODES}")
+        self.vector_size = vector_size
+        self.path = path
+        self.approximate = approximate
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ann_min_rows = ann_min_rows
+        self.quantization = quantization
+        self.oversampling = oversampling
+        # Reentrant: reads that fall back to the lock may build the IVF index under it
+        self._lock = threading.RLock()
+        self._state = _StoreState(
+            vectors=np.zeros((0, vector_size), dtype=np.float32),
+            codes=self._empty_codes(0),
+            size=0,
+            ids=[],
+            payloads=[],
+            columns=self._empty_columns(0),
+        )
+        self._writes = 0
+        self._int8_scale: Optional[float] = None
+        self._version = 0
+        self._rows: Dict[Any, int] = {}
+        self._ivf: Optional[IVFIndex] = None
+
+    def initialize(self):
+        if not self.path or self._state.size:
+            return
+        if os.path.exists(os.path.join(self.path, "records.json")):
+            self.load()
+        elif os.path.exists(os.path.join(self.path, "records.pkl")):
+            # Pickles are never loaded: unpickling a file in the data directory can run arbitrary code
+            logger.warning("Ignoring the pickled vector store in %s; re-import the catalog to rebuild it", self.path)
+
+    def _empty_codes(self, rows: int) -> Optional[np.ndarray]:
+        if self.quantization == "int8":
+            return np.zeros((rows, self.vector_size), dtype=np.int8)
+        if self.quantization == "binary":
+            return np.zeros((rows, math.ceil(self.vector_size / 8)), dtype=np.uint8)
+        return None
+
+    @staticmethod
+    def _empty_columns(rows: int) -> Dict[str, np.ndarray]:
+        return {
+            field: np.full(rows, np.nan) if schema == "float" else np.full(rows, "", dtype=object)
+            for field, schema in PAYLOAD_INDEXES.items()
+        }
+
+    @staticmethod
+    def _column_value(payload: dict, field: str):
+        value = payload.get(field)
+        if PAYLOAD_INDEXES[field] == "float":
+            return np.nan if value is None else float(value)
+        return "" if value is None else value
+
+    def _filter_mask(self, columns: Dict[str, np.ndarray], size: int, filters: Dict[str, Any]) -> np.ndarray:
+        mask = np.ones(size, dtype=bool)
+        for field, condition in filters.items():
+            column = columns[field][:size]
+            if isinstance(condition, dict):
+                # NaN (no value) fails every comparison
+                if "lt" in condition:
+                    mask &= column < condition["lt"]
+                if "lte" in condition:
+                    mask &= column <= condition["lte"]
+                if "gt" in condition:
+                    mask &= column > condition["gt"]
+                if "gte" in condition:
+                    mask &= column >= condition["gte"]
+            else:
+                mask &= np.isin(column, list(condition)) | (column == "")
+        return mask
+
+    def _encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Quantize normalized float32 rows into first-pass codes"""
+        if self.quantization == "binary":
+            return np.packbits(vectors > 0, axis=1)
+        if self._int8_scale is None:
+            # Fixed on the first batch, like Qdrant's quantile calibration
+            bound = float(np.quantile(np.abs(vectors), INT8_QUANTILE)) if vectors.size else 0.0
+            self._int8_scale = 127.0 / (bound or 1.0)
+        return np.clip(np.rint(vectors * self._int8_scale), -127, 127).astype(np.int8)
+
+    def _encode_all(self, vectors: np.ndarray, size: int) -> np.ndarray:
+        codes = self._empty_codes(max(size, 1))
+        for start in range(0, size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, size)
+            codes[start:end] = self._encode(np.asarray(vectors[start:end]))
+        return codes
+
+    def _read(self, read: Callable[[_StoreState], Any]) -> Any:
+        """Run `read` against a state that no upsert rewrote while it ran."""
+        for _ in range(READ_RETRIES):
+            writes = self._writes
+            if writes % 2 == 0:
+                result = read(self._state)
+                if self._writes == writes:
+                    return result
+        # Upserts keep overlapping; wait for the current one instead
+        with self._lock:
+            return read(self._state)
+
+    def upsert(self, product_ids: List[Any], embeddings: np.ndarray, payloads: List[dict]):
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(product_ids), self.vector_size)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms == 0, 1.0, norms)
+
+        with self._lock:
+            state = self._state
+            ids, stored_payloads = state.ids, state.payloads
+            rows = []
+            updated = []
+            new_size = state.size
+            for product_id, payload in zip(product_ids, payloads):
+                row = self._rows.get(product_id)
+                if row is None:
+                    # Past the size searches see until the new state is published
+                    row = new_size
+                    new_size += 1
+                    self._rows[product_id] = row
+                    ids.append(product_id)
+                    stored_payloads.append(payload)
+                elif row < state.size:
+                    updated.append((row, payload))
+                else:
+                    stored_payloads[row] = payload
+                rows.append(row)
+            rows = np.asarray(rows, dtype=np.int64)
+
+            vectors = state.vectors
+            if isinstance(vectors, SegmentedVectors):
+                # New rows go to the in-memory tail; the saved rows stay mapped
+                if new_size > len(vectors):
+                    vectors = vectors.grow(new_size)
+            elif new_size > len(vectors) or not vectors.flags.writeable:
+                # Grow geometrically (and copy memory-mapped data on first write)
+                capacity = max(new_size, 2 * len(vectors), 1024)
+                grown = np.zeros((capacity, self.vector_size), dtype=np.float32)
+                grown[:state.size] = vectors[:state.size]
+                vectors = grown
+
+            codes = state.codes
+            if codes is not None and len(codes) < len(vectors):
+                grown = self._empty_codes(len(vectors))
+                grown[:state.size] = codes[:state.size]
+                codes = grown
+
+            columns = state.columns
+            if len(next(iter(columns.values()))) < len(vectors):
+                grown = self._empty_columns(len(vectors))
+                for field, column in columns.items():
+                    grown[field][:state.size] = column[:state.size]
+                columns = grown
+
+            # Odd while rows that searches can see are being rewritten
+            in_place = bool(updated)
+            if in_place:
+                self._writes += 1
+            try:
+                vectors[rows] = embeddings
+                if codes is not None:
+                    codes[rows] = self._encode(embeddings)
+                for row, payload in zip(rows.tolist(), payloads):
+                    for field in PAYLOAD_INDEXES:
+                        columns[field][row] = self._column_value(payload, field)
+                for row, payload in updated:
+                    stored_payloads[row] = payload
+                if self._ivf is not None:
+                    # Retrain once the catalog has doubled since the centroids were fit
+                    if new_size > 2 * self._ivf.trained_rows:
+                        self._ivf = None
+                    else:
+                        self._ivf.assign(rows, embeddings)
+            finally:
+                if in_place:
+                    self._writes += 1
+            self._state = _StoreState(vectors, codes, new_size, ids, stored_payloads, columns)
+            self._version += 1
+
+    def _ann_index(self, vectors: np.ndarray, size: int) -> Optional[IVFIndex]:
+        if not self.approximate or size < self.ann_min_rows:
+            return None
+        if self._ivf is None:
+            with self._lock:
+                if self._ivf is None:
+                    self._ivf = IVFIndex(vectors[:size], self.nlist)
+        return self._ivf
+
+    def _first_pass_scores(self, codes: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray], size: int) -> np.ndarray:
+        """Approximate scores from the quantized codes, block by block"""
+        if self.quantization == "binary":
+            query_code = np.packbits(query > 0)
+
+            def score(block):
+                return -_popcount(np.bitwise_xor(block, query_code))
+        else:
+            buffer = np.empty((SCAN_BLOCK_ROWS, self.vector_size), dtype=np.float32)
+
+            def score(block):
+                cast = buffer[:len(block)]
+                np.copyto(cast, block, casting="unsafe")
+                return cast @ query
+        count = size if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, count)
+            block = codes[start:end] if rows is None else codes[rows[start:end]]
+            scores[start:end] = score(block)
+        return scores
+
+    def search(self, query_embedding: np.ndarray, top_k: int = 5, exact: bool = False, oversampling: Optional[float] = None, filters: Optional[Dict[str, Any]] = None) -> List[dict]:
+        return self._read(lambda state: self._search(state, query_embedding, top_k, exact, oversampling, filters))
+
+    def _search(self, state: _StoreState, query_embedding: np.ndarray, top_k: int, exact: bool, oversampling: Optional[float], filters: Optional[Dict[str, Any]]) -> List[dict]:
+        vectors, codes, size = state.vectors, state.codes, state.size
+        if size == 0 or top_k <= 0:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        ivf = None if exact else self._ann_index(vectors, size)
+        rows = ivf.candidates(query, self.nprobe, size) if ivf is not None else None
+        if filters:
+            mask = self._filter_mask(state.columns, size, filters)
+            rows = np.flatnonzero(mask) if rows is None else rows[mask[rows]]
+            if len(rows) == 0:
+                return []
+        if codes is not None and not exact:
+            # Quantized first pass, then rescore the candidates in full precision
+            approx = self._first_pass_scores(codes, query, rows, size)
+            keep = min(candidate_count(top_k, oversampling or self.oversampling), len(approx))
+            if keep == 0:
+                return []
+            candidates = np.argpartition(-approx, keep - 1)[:keep]
+            rows = np.sort(candidates if rows is None else rows[candidates])
+        scores = vectors[:size] @ query if rows is None else vectors[rows] @ query
+
+        k = min(top_k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        result_rows = rows[top] if rows is not None else top
+        return [
+            {
+                "product_id": state.ids[row],
+                "payload": state.payloads[row],
+                "score": float(scores[index]),
+            }
+            for row, index in zip(result_rows.tolist(), top.tolist())
+        ]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]] = None) -> List[List[dict]]:
+        """
+        Exact, unfiltered queries are scored together with one matrix-matrix
+        product; filtered, quantized or IVF-routed queries run one by one.
+        """
+        return self._read(lambda state: self._search_batch(state, query_embeddings, top_k, filters))
+
+    def _search_batch(self, state: _StoreState, query_embeddings: np.ndarray, top_k: Sequence[int], filters: Optional[Sequence[Optional[Dict[str, Any]]]]) -> List[List[dict]]:
+        vectors, codes, size = state.vectors, state.codes, state.size
+        filters = filters or [None] * len(top_k)
+        results: List[Optional[List[dict]]] = [None] * len(top_k)
+
+        dense = []
+        if size and codes is None and self._ann_index(vectors, size) is None:
+            dense = [index for index, query_filters in enumerate(filters) if not query_filters and top_k[index] > 0]
+        if dense:
+            queries = np.asarray(query_embeddings, dtype=np.float32)[dense]
+            queries = queries / np.clip(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12, None)
+            all_scores = vectors[:size] @ queries.T
+            for column, index in enumerate(dense):
+                scores = all_scores[:, column]
+                k = min(top_k[index], size)
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top], kind="stable")]
+                results[index] = [
+                    {"product_id": state.ids[row], "payload": state.payloads[row], "score": float(scores[row])}
+                    for row in top.tolist()
+                ]
+
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = self._search(state, query_embeddings[index], top_k[index], False, None, filters[index])
+        return results
+
+    def scroll(self, limit: int = 1000, offset: Any = None) -> Tuple[List[Record], Any]:
+        state = self._state
+        start = int(offset or 0)
+        end = min(start + limit, state.size)
+        records = [Record(state.ids[row], state.payloads[row]) for row in range(start, end)]
+        return records, (end if end < state.size else None)
+
+    def count(self) -> int:
+        return self._state.size
+
+    def sample_vectors(self, limit: int) -> np.ndarray:
+        state = self._state
+        rows = np.random.default_rng(0).choice(state.size, size=min(limit, state.size), replace=False)
+        return np.asarray(state.vectors[np.sort(rows)], dtype=np.float32)
+
+    def memory_usage(self) -> Dict[str, Any]:
+        usage = super().memory_usage()
+        vectors = self._state.vectors
+        usage["originals_memory_mapped"] = isinstance(vectors, SegmentedVectors) or not vectors.flags.writeable
+        return usage
+
+    def save(self):
+        """Write vectors, ids and payloads under `path`."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            state = self._state
+            size, vectors = state.size, state.vectors
+            ids, payloads = state.ids[:size], state.payloads[:size]
+            version = self._version
+        # Copied block by block so a mapped store is never gathered into one array
+        target = np.lib.format.open_memmap(
+            os.path.join(self.path, "vectors.tmp.npy"), mode="w+", dtype=np.float32, shape=(size, self.vector_size)
+        )
+        for start in range(0, size, SCAN_BLOCK_ROWS):
+            end = min(start + SCAN_BLOCK_ROWS, size)
+            target[start:end] = vectors[start:end]
+        target.flush()
+        del target
+        with open(os.path.join(self.path, "records.tmp.json"), "w") as f:
+            json.dump({"ids": list(ids), "payloads": list(payloads)}, f, default=str)
+        os.replace(os.path.join(self.path, "vectors.tmp.npy"), os.path.join(self.path, "vectors.npy"))
+        os.replace(os.path.join(self.path, "records.tmp.json"), os.path.join(self.path, "records.json"))
+        logger.info("Saved %d vectors to %s", len(ids), self.path)
+
+        if self.quantization != "none":
+            # Rescoring only touches candidate rows, so let the OS page the originals
+            mapped = self._map_saved_vectors()
+            with self._lock:
+                if self._version == version:
+                    self._state = self._state._replace(vectors=mapped)
+
+    def _map_saved_vectors(self):
+        """
+        Memory-map the saved matrix. Quantized stores keep it mapped across
+        upserts (SegmentedVectors); full-precision scans read every row, so
+        other stores copy it into memory on their first upsert.
+        """
+        path = os.path.join(self.path, "vectors.npy")
+        if self.quantization == "none":
+            return np.load(path, mmap_mode="r")
+        return SegmentedVectors(np.load(path, mmap_mode="c"))
+
+    def load(self):
+        """Memory-map the saved matrix (see _map_saved_vectors)."""
+        vectors = self._map_saved_vectors()
+        with open(os.path.join(self.path, "records.json")) as f:
+            records = json.load(f)
+        codes = None
+        if self.quantization != "none":
+            self._int8_scale = None
+            codes = self._encode_all(vectors, len(vectors))
+        size = len(vectors)
+        columns = self._empty_columns(size)
+        for row, payload in enumerate(records["payloads"]):
+            for field in PAYLOAD_INDEXES:
+                columns[field][row] = self._column_value(payload, field)
+        with self._lock:
+            self._state = _StoreState(vectors, codes, size, records["ids"], records["payloads"], columns)
+            self._rows = {product_id: row for row, product_id in enumerate(records["ids"])}
+            self._ivf = None
+            self._version += 1
+        logger.info(f"Loaded {size} vectors from {self.path}")
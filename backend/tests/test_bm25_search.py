@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+import rank_bm25
+
+from src.utility import bm25_search
+from src.utility.bm25_search import BM25Index, LexicalSnapshot, tokenize
+
+VOCABULARY = [f"term{i}" for i in range(60)]
+
+
+def make_corpus(size: int, seed: int):
+    rng = np.random.default_rng(seed)
+    # Zipf-like term distribution so some terms are common (negative idf) and most are rare
+    weights = 1.0 / np.arange(1, len(VOCABULARY) + 1)
+    weights /= weights.sum()
+    return [
+        " ".join(rng.choice(VOCABULARY, size=rng.integers(3, 12), p=weights))
+        for _ in range(size)
+    ]
+
+
+QUERIES = ["term0", "term1 term5", "term3 term3 term17", "term40 term2 term9 term0", "missing term11"]
+
+
+def assert_matches_okapi(index: BM25Index, live_rows, live_corpus, top_k=10):
+    """Scores and top-k of `index` over `live_rows` equal BM25Okapi over `live_corpus`."""
+    reference = rank_bm25.BM25Okapi([tokenize(doc) for doc in live_corpus])
+    live_rows = np.asarray(live_rows)
+    for query in QUERIES:
+        tokens = tokenize(query)
+        expected = reference.get_scores(tokens)
+        scores = index.get_scores(tokens)
+        np.testing.assert_allclose(scores[live_rows], expected, rtol=1e-4, atol=1e-5)
+        removed = np.setdiff1d(np.arange(index.corpus_size), live_rows)
+        assert not scores[removed].any()
+
+        doc_ids, top_scores = index.search(tokens, top_k=top_k)
+        positive = np.sort(expected[expected > 0])[::-1][:top_k]
+        np.testing.assert_allclose(top_scores, positive, rtol=1e-4, atol=1e-5)
+        assert set(doc_ids.tolist()) <= set(live_rows.tolist())
+        np.testing.assert_allclose(scores[doc_ids], top_scores, rtol=1e-5)
+
+
+@pytest.fixture
+def small_merges(monkeypatch):
+    monkeypatch.setattr(bm25_search, "BM25_MERGE_MIN_DOCS", 40)
+    monkeypatch.setattr(bm25_search, "BM25_MERGE_RATIO", 0.5)
+
+
+def test_matches_okapi():
+    corpus = make_corpus(300, seed=1)
+    index = BM25Index([tokenize(doc) for doc in corpus])
+    assert_matches_okapi(index, np.arange(len(corpus)), corpus)
+
+
+def test_extend_matches_okapi_with_and_without_merges(small_merges):
+    corpus = make_corpus(100, seed=2)
+    index = BM25Index([tokenize(doc) for doc in corpus])
+    for batch_seed in range(3, 12):
+        batch = make_corpus(15, seed=batch_seed) + [f"newterm{batch_seed} term1"]
+        index = index.extend([tokenize(doc) for doc in batch])
+        corpus += batch
+        assert_matches_okapi(index, np.arange(len(corpus)), corpus)
+    # The delta segment was merged at least once and is still in use
+    assert 100 < index.delta_start < len(corpus)
+
+
+def test_extend_keeps_previous_index_intact(small_merges):
+    corpus = make_corpus(80, seed=3)
+    index = BM25Index([tokenize(doc) for doc in corpus])
+    extended = index.extend([tokenize(doc) for doc in make_corpus(60, seed=4)])
+    assert extended.corpus_size == 140
+    assert_matches_okapi(index, np.arange(len(corpus)), corpus)
+
+
+def test_tombstones_leave_statistics(small_merges):
+    corpus = make_corpus(120, seed=5)
+    product_ids = list(range(len(corpus)))
+    snapshot = LexicalSnapshot.build(corpus, [{} for _ in corpus], product_ids)
+
+    rng = np.random.default_rng(6)
+    for batch_seed in range(7, 13):
+        replaced = rng.choice(product_ids, size=10, replace=False).tolist()
+        batch = make_corpus(len(replaced) + 5, seed=batch_seed)
+        new_ids = replaced + [max(product_ids) + 1 + i for i in range(5)]
+        snapshot = snapshot.extend(batch, [{} for _ in batch], new_ids)
+        product_ids = sorted(set(product_ids) | set(new_ids))
+
+        live_rows = sorted(snapshot.rows.values())
+        assert snapshot.document_count == len(live_rows) == len(product_ids)
+        assert_matches_okapi(snapshot.index, live_rows, [snapshot.corpus[row] for row in live_rows])
+
+
+def test_duplicate_product_in_batch_keeps_last():
+    snapshot = LexicalSnapshot.build(["term1 term2"], [{}], [1])
+    snapshot = snapshot.extend(["term3 term4", "term5 term6"], [{}, {}], [2, 2])
+    assert snapshot.document_count == 2
+    assert snapshot.rows == {1: 0, 2: 2}
+    assert snapshot.index.get_scores(["term3"])[1] == 0
+
+
+def test_older_snapshot_can_still_be_extended():
+    base = LexicalSnapshot.build(["term1 term2", "term2 term3"], [{}, {}], [1, 2])
+    newer = base.extend(["term4"], [{}], [3])
+    branch = base.extend(["term5"], [{}], [1])
+    assert newer.product_ids == [1, 2, 3]
+    assert branch.product_ids == [1, 2, 1]
+    assert branch.document_count == 2
+    assert newer.document_count == 3
+
+
+def test_snapshot_round_trip(tmp_path, small_merges):
+    corpus = make_corpus(100, seed=13)
+    payloads = [{"title_left": doc, "price": float(i)} for i, doc in enumerate(corpus)]
+    snapshot = LexicalSnapshot.build(corpus, payloads, list(range(len(corpus))))
+    batch = make_corpus(30, seed=14)
+    snapshot = snapshot.extend(batch, [{"title_left": doc} for doc in batch], list(range(90, 120)))
+    fingerprint = {"points_count": 120, "ingest": {"stamp": "a", "complete": True}}
+
+    bm25_search.save_snapshot(str(tmp_path), fingerprint, snapshot)
+    assert not list(tmp_path.glob("**/*.pkl"))
+    assert bm25_search.load_snapshot(str(tmp_path), {**fingerprint, "ingest": {"stamp": "b", "complete": True}}) is None
+
+    loaded = bm25_search.load_snapshot(str(tmp_path), fingerprint)
+    assert loaded.document_count == snapshot.document_count == 120
+    assert loaded.payloads[5] == payloads[5]
+    assert loaded.product_ids[:3] == [0, 1, 2]
+    live_rows = sorted(snapshot.rows.values())
+    live_corpus = [snapshot.corpus[row] for row in live_rows]
+    assert_matches_okapi(loaded.index, live_rows, live_corpus)
+
+    # A loaded snapshot keeps accepting incremental adds
+    extended = loaded.extend(["term1 brandnew"], [{"title_left": "term1 brandnew"}], [500])
+    assert extended.payloads[-1] == {"title_left": "term1 brandnew"}
+    assert_matches_okapi(extended.index, live_rows + [len(snapshot.corpus)], live_corpus + ["term1 brandnew"])
@@ -0,0 +1,113 @@
+import zlib
+
+import numpy as np
+
+from src.utility.dedup import NearDuplicateIndex, _model_key, collapse_duplicates, normalize_text
+
+WORDS = [
+    "camera", "lens", "zoom", "digital", "compact", "wireless", "speaker", "portable", "waterproof", "black",
+    "silver", "kit", "optical", "battery", "charger", "case", "stereo", "headphones", "noise", "cancelling",
+    "monitor", "display", "inch", "full", "hd", "laptop", "backpack", "travel", "pro", "edition",
+]
+BRANDS = ["canon", "nikon", "sony", "bose", "samsung", "lenovo", "jbl", "fujifilm"]
+
+# Share of true duplicate pairs the index must cluster together
+PAIR_RECALL_THRESHOLD = 0.9
+
+
+def make_offer(rng: np.random.Generator, index: int) -> str:
+    words = " ".join(rng.choice(WORDS, size=int(rng.integers(8, 14))))
+    return f"{rng.choice(BRANDS)} {words} model x{1000 + index}"
+
+
+def perturb(rng: np.random.Generator, text: str) -> str:
+    """The same offer as another shop would list it: case, punctuation, one extra word and a missing field."""
+    words = text.split()
+    words.insert(int(rng.integers(1, len(words))), str(rng.choice(WORDS)))
+    text = " ".join(words)
+    if rng.random() < 0.5:
+        text = text.title().replace(" ", ", ", 1)
+    return f'"{text}"@en nan'
+
+
+def synthetic_pairs(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    originals = [make_offer(rng, i) for i in range(count)]
+    duplicates = [perturb(rng, text) for text in originals]
+    return originals, duplicates
+
+
+def test_model_key_is_stable_across_processes():
+    text = normalize_text("Casio G-Shock GA-1555 watch 200m")
+    assert _model_key(text) == zlib.crc32(b"1555 200m")
+    assert _model_key(normalize_text("plain watch")) == 0
+
+
+def test_pair_recall_above_threshold():
+    originals, duplicates = synthetic_pairs(400)
+    index = NearDuplicateIndex(path=None)
+    first = index.assign(list(range(400)), originals)
+    assert first == list(range(400))
+
+    # Duplicates arrive in a later batch and must find their original through LSH
+    canonical = index.assign(list(range(1000, 1400)), duplicates)
+    recall = np.mean([canonical[i] == i for i in range(400)])
+    assert recall >= PAIR_RECALL_THRESHOLD
+    # Every model number is unique, so no offer may join another pair's cluster
+    assert all(c in (i, 1000 + i) for i, c in enumerate(canonical))
+    assert index.stats()["duplicates"] == sum(c != p for c, p in zip(canonical, range(1000, 1400)))
+
+
+def test_distinct_model_numbers_stay_apart():
+    rng = np.random.default_rng(1)
+    base = " ".join(rng.choice(WORDS, size=12))
+    texts = [f"casio {base} ga-{1550 + i}" for i in range(20)]
+    index = NearDuplicateIndex(path=None)
+    assert index.assign(list(range(20)), texts) == list(range(20))
+
+
+def test_in_batch_cosine_links_paraphrases():
+    index = NearDuplicateIndex(path=None)
+    texts = ["nikon coolpix compact camera", "compact digital camera by nikon", "bose stereo speaker"]
+    embeddings = np.array([[1.0, 0.0], [0.999, 0.01], [0.0, 1.0]])
+    assert index.assign([1, 2, 3], texts, embeddings) == [1, 1, 3]
+
+
+def test_reimported_offer_keeps_its_cluster():
+    originals, duplicates = synthetic_pairs(5)
+    index = NearDuplicateIndex(path=None)
+    index.assign([1, 2], [originals[0], duplicates[0]])
+    assert index.assign([2], ["completely different text now"]) == [1]
+
+
+def test_saved_index_clusters_later_imports(tmp_path):
+    originals, duplicates = synthetic_pairs(200, seed=2)
+    path = str(tmp_path / "dedup.npz")
+    index = NearDuplicateIndex(path=path)
+    index.assign(list(range(100)), originals[:100])
+    index.assign(list(range(1000, 1100)), duplicates[:100])
+    index.save()
+
+    # A new process: loads the saved index before clustering the next import
+    restarted = NearDuplicateIndex(path=path)
+    canonical = restarted.assign(list(range(1100, 1200)), duplicates[:100])
+    fresh = NearDuplicateIndex(path=None).assign(list(range(1100, 1200)), duplicates[:100])
+    assert np.mean([c == i for i, c in enumerate(canonical)]) >= PAIR_RECALL_THRESHOLD
+    assert fresh == list(range(1100, 1200))
+    assert len(restarted) == 300
+    assert restarted._buckets.keys() >= index._buckets.keys()
+
+
+def test_collapse_duplicates_rekeys_lexical_hits():
+    semantic = [
+        {"product_id": 2, "score": 0.9, "payload": {"canonical_id": 1}},
+        {"product_id": 1, "score": 0.8, "payload": {"canonical_id": 1}},
+        {"product_id": 3, "score": 0.7, "payload": {"canonical_id": 3}},
+    ]
+    lexical = [
+        {"product_id": 1, "score": 5.0, "payload": {"canonical_id": 1}},
+        {"product_id": 4, "score": 4.0, "payload": {}},
+    ]
+    semantic, lexical = collapse_duplicates(semantic, lexical)
+    assert [r["product_id"] for r in semantic] == [2, 3]
+    assert [r["product_id"] for r in lexical] == [2, 4]
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from src.schemas.search_schemas import SearchRequest
+from src.utility.fusion import fuse_results, fuse_scores
+
+
+def results(pairs):
+    return [{"product_id": pid, "score": score, "payload": {"name": pid}} for pid, score in pairs]
+
+
+SEMANTIC = results([("a", 0.9), ("b", 0.7), ("c", 0.5)])
+LEXICAL = results([("c", 12.0), ("d", 8.0), ("a", 2.0)])
+
+
+def test_minmax_blends_normalized_scores():
+    fused = fuse_results(SEMANTIC, LEXICAL, top_k=10, method="minmax", semantic_weight=0.7)
+    scores = {r["id"]: r["score"] for r in fused}
+    # Semantic normalized: a=1, b=0.5, c=0; lexical normalized: c=1, d=0.6, a=0
+    assert scores == pytest.approx({"a": 0.7, "b": 0.35, "c": 0.3, "d": 0.3 * 0.6})
+    assert [r["id"] for r in fused] == ["a", "b", "c", "d"]
+
+
+def test_rrf_blends_reciprocal_ranks():
+    fused = fuse_results(SEMANTIC, LEXICAL, top_k=10, method="rrf", semantic_weight=0.5, rrf_k=60)
+    scores = {r["id"]: r["score"] for r in fused}
+    expected = {
+        "a": 0.5 / 61 + 0.5 / 63,
+        "b": 0.5 / 62,
+        "c": 0.5 / 63 + 0.5 / 61,
+        "d": 0.5 / 62,
+    }
+    assert scores == pytest.approx(expected)
+    assert fused[0]["id"] in ("a", "c")
+
+
+def test_missing_leg_contributes_nothing():
+    for method in ("minmax", "rrf"):
+        only_semantic = fuse_results(SEMANTIC, [], top_k=10, method=method, semantic_weight=0.7)
+        assert [r["id"] for r in only_semantic] == ["a", "b", "c"]
+        assert max(r["score"] for r in only_semantic) <= 0.7 + 1e-12
+
+        only_lexical = fuse_results([], LEXICAL, top_k=10, method=method, semantic_weight=0.7)
+        assert [r["id"] for r in only_lexical] == ["c", "d", "a"]
+        assert all(r["payload"] == {"name": r["id"]} for r in only_lexical)
+
+    assert fuse_results([], [], top_k=5) == []
+
+
+def test_single_lexical_hit_counts_fully():
+    fused = fuse_results([], results([("x", 3.0)]), top_k=5, method="minmax", semantic_weight=0.7)
+    assert fused[0]["score"] == pytest.approx(0.3)
+
+
+def test_duplicate_ids_keep_best_position():
+    product_ids, fused, semantic_position, lexical_position = fuse_scores(
+        ["a", "a", "b"], np.array([0.9, 0.1, 0.5]), [], np.array([]), method="minmax", semantic_weight=1.0
+    )
+    assert product_ids == ["a", "b"]
+    assert semantic_position.tolist() == [0, 2]
+    assert lexical_position.tolist() == [-1, -1]
+    assert fused.tolist() == pytest.approx([1.0, 0.5])
+
+
+def test_unknown_method_raises():
+    with pytest.raises(ValueError):
+        fuse_results(SEMANTIC, LEXICAL, top_k=3, method="borda")
+
+
+def test_search_request_semantic_weight_is_bounded():
+    assert SearchRequest(query="camera").semantic_weight == 0.7
+    for invalid in (None, -0.1, 1.5):
+        with pytest.raises(ValidationError):
+            SearchRequest(query="camera", semantic_weight=invalid)
@@ -0,0 +1,151 @@
+import asyncio
+
+from src.utility import result_cache as result_cache_module
+from src.utility.catalog_version import CatalogVersion
+from src.utility.query_cache import LRUCache
+from src.utility.result_cache import HIT_LOCAL, HIT_SHARED, MISS, RedisResultTier, ResultCache
+
+
+class FakeRedis:
+    """The subset of redis.Redis the shared tier uses; `down` makes every call fail."""
+
+    def __init__(self):
+        self.values = {}
+        self.calls = 0
+        self.down = False
+
+    def _check(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("connection refused")
+
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self._check()
+        self.values[key] = value
+
+    def incr(self, key):
+        self._check()
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+
+def make_cache(shared=None):
+    return ResultCache(local=LRUCache(max_entries=100, ttl_seconds=0, max_bytes=1 << 20), shared=shared, version=CatalogVersion())
+
+
+def counting(results):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return results
+
+    return compute, calls
+
+
+def test_hit_until_catalog_version_bump():
+    cache = make_cache()
+    compute, calls = counting([{"id": 1}])
+
+    assert cache.get_or_compute("Canon camera", 5, 0.7, "minmax", compute) == ([{"id": 1}], MISS)
+    assert cache.get_or_compute("  Canon   camera ", 5, 0.7, "minmax", compute) == ([{"id": 1}], HIT_LOCAL)
+    # Case is kept in the key
+    assert cache.get_or_compute("canon camera", 5, 0.7, "minmax", compute)[1] == MISS
+    # Other parameters are other entries
+    assert cache.get_or_compute("Canon camera", 10, 0.7, "minmax", compute)[1] == MISS
+    assert cache.get_or_compute("Canon camera", 5, 0.5, "minmax", compute)[1] == MISS
+    assert cache.get_or_compute("Canon camera", 5, 0.7, "rrf", compute)[1] == MISS
+
+    cache.version.bump("insert_products")
+    assert cache.get_or_compute("Canon camera", 5, 0.7, "minmax", compute)[1] == MISS
+    assert cache.get_or_compute("Canon camera", 5, 0.7, "minmax", compute)[1] == HIT_LOCAL
+    assert cache.stats()["catalog_change_reason"] == "insert_products"
+
+
+def test_bump_invalidates_shared_tier_of_other_processes():
+    client = FakeRedis()
+    first = make_cache(RedisResultTier("redis://fake", client=client))
+    second = make_cache(RedisResultTier("redis://fake", client=client))
+    compute, calls = counting([{"id": 2}])
+
+    assert first.get_or_compute("tv", 5, 0.7, "minmax", compute)[1] == MISS
+    assert second.get_or_compute("tv", 5, 0.7, "minmax", compute)[1] == HIT_SHARED
+    assert len(calls) == 1
+
+    first.version.bump("bm25_rebuild")
+    assert second.get_or_compute("tv", 5, 0.7, "minmax", compute)[1] == MISS
+    assert len(calls) == 2
+
+
+def test_unreachable_redis_is_skipped_until_retry(monkeypatch):
+    client = FakeRedis()
+    tier = RedisResultTier("redis://fake", client=client, retry_seconds=30, retry_max_seconds=60)
+    cache = make_cache(tier)
+    compute, calls = counting([{"id": 3}])
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+
+    client.down = True
+    assert cache.get_or_compute("phone", 5, 0.7, "minmax", compute)[1] == MISS
+    failed_calls = client.calls
+    for _ in range(20):
+        cache.get_or_compute("phone", 5, 0.7, "minmax", compute)
+    cache.version.bump("insert_products")
+    # The circuit is open: no further round trips, the bump is kept for later
+    assert client.calls == failed_calls
+    assert tier.errors == 1 and tier.skipped > 0 and tier.pending_bumps == 1
+    assert not tier.available()
+
+    client.down = False
+    now[0] += 31
+    cache.get_or_compute("phone", 5, 0.7, "minmax", compute)
+    assert tier.available() and tier.failures == 0
+    assert tier.pending_bumps == 0 and client.values[f"{tier.prefix}:version"] == 1
+
+
+def test_backoff_doubles_while_redis_stays_down(monkeypatch):
+    client = FakeRedis()
+    client.down = True
+    tier = RedisResultTier("redis://fake", client=client, retry_seconds=5, retry_max_seconds=12)
+    now = [0.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+
+    delays = []
+    for _ in range(4):
+        assert tier.version() is None
+        delays.append(tier.retry_at - now[0])
+        now[0] = tier.retry_at
+    assert delays == [5, 10, 12, 12]
+
+
+def test_degraded_results_are_not_stored():
+    client = FakeRedis()
+    cache = make_cache(RedisResultTier("redis://fake", client=client))
+    compute, calls = counting([{"id": 4, "source": "bm25"}])
+    degraded = ["vector_search"]
+
+    for _ in range(2):
+        assert cache.get_or_compute("lens", 5, 0.7, "minmax", compute, cacheable=lambda: not degraded)[1] == MISS
+
+    async def compute_async():
+        return compute()
+
+    assert asyncio.run(cache.get_or_compute_async("lens", 5, 0.7, "minmax", compute_async, cacheable=lambda: not degraded))[1] == MISS
+    assert len(calls) == 3 and len(cache.local) == 0
+    assert set(client.values) <= {f"{cache.shared.prefix}:version"}
+
+    degraded.clear()
+    cache.get_or_compute("lens", 5, 0.7, "minmax", compute, cacheable=lambda: not degraded)
+    assert cache.get_or_compute("lens", 5, 0.7, "minmax", compute)[1] == HIT_LOCAL
+
+
+def test_disabled_cache_always_computes():
+    cache = ResultCache(local=LRUCache(max_entries=10, ttl_seconds=0), version=CatalogVersion(), enabled=False)
+    compute, calls = counting([])
+    for _ in range(3):
+        assert cache.get_or_compute("q", 5, 0.7, None, compute)[1] == MISS
+    assert len(calls) == 3
@@ -0,0 +1,172 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.utility.vector_store import InMemoryVectorStore, QdrantVectorStore, SegmentedVectors, VectorStore
+
+ROWS = 3000
+VECTOR_SIZE = 384
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    # Clustered vectors, like embeddings of a product catalog
+    rng = np.random.default_rng(0)
+    centroids = rng.standard_normal((40, VECTOR_SIZE)).astype(np.float32)
+    vectors = centroids[rng.integers(0, len(centroids), ROWS)]
+    vectors += 0.8 * rng.standard_normal((ROWS, VECTOR_SIZE)).astype(np.float32)
+    queries = vectors[rng.choice(ROWS, 50, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+    payloads = [{"price": float(i % 100), "brand": ("canon", "nikon", "sony")[i % 3]} for i in range(ROWS)]
+    return vectors, queries, payloads
+
+
+def make_store(catalog, **options) -> InMemoryVectorStore:
+    vectors, _, payloads = catalog
+    store = InMemoryVectorStore(**options)
+    store.upsert(list(range(len(vectors))), vectors, payloads)
+    return store
+
+
+def exact_top(catalog, query, top_k, filters=None):
+    vectors, _, payloads = catalog
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    if filters:
+        allowed = [i for i, payload in enumerate(payloads) if payload["brand"] in filters["brand"]]
+        order = sorted(allowed, key=lambda i: -scores[i])
+    else:
+        order = np.argsort(-scores).tolist()
+    return order[:top_k]
+
+
+def recall(store, catalog, top_k=10) -> float:
+    _, queries, _ = catalog
+    found = [
+        len({r["product_id"] for r in store.search(query, top_k=top_k)} & set(exact_top(catalog, query, top_k))) / top_k
+        for query in queries
+    ]
+    return float(np.mean(found))
+
+
+def test_vector_store_is_abstract():
+    with pytest.raises(TypeError):
+        VectorStore()
+
+
+@pytest.mark.parametrize(
+    "options, minimum",
+    [
+        ({"quantization": "none"}, 1.0),
+        ({"quantization": "int8", "oversampling": 2.0}, 0.95),
+        ({"quantization": "binary", "oversampling": 4.0}, 0.8),
+        ({"quantization": "binary", "oversampling": 8.0}, 0.95),
+        ({"approximate": True, "ann_min_rows": 0, "nlist": 32, "nprobe": 4}, 0.95),
+    ],
+)
+def test_recall_against_exact_search(catalog, options, minimum):
+    store = make_store(catalog, **options)
+    assert recall(store, catalog) >= minimum
+
+
+@pytest.mark.parametrize("quantization", ["none", "int8", "binary"])
+def test_exact_search_and_batch_match_brute_force(catalog, quantization):
+    _, queries, _ = catalog
+    store = make_store(catalog, quantization=quantization)
+    filters = [None, {"brand": ["nikon"]}] * 5
+    batch = store.search_batch(queries[:10], [5] * 10, filters)
+    for query, query_filters, results in zip(queries[:10], filters, batch):
+        expected = exact_top(catalog, query, 5, query_filters)
+        assert [r["product_id"] for r in store.search(query, top_k=5, exact=True, filters=query_filters)] == expected
+        if quantization == "none":
+            assert [r["product_id"] for r in results] == expected
+
+
+def test_upsert_replaces_existing_products(catalog):
+    vectors, queries, payloads = catalog
+    store = make_store(catalog, quantization="int8")
+    store.upsert([7], queries[:1], [{"brand": "leica"}])
+    assert store.count() == ROWS
+    top = store.search(queries[0], top_k=1)[0]
+    assert top["product_id"] == 7
+    assert top["payload"] == {"brand": "leica"}
+    assert store.search(queries[0], top_k=1, filters={"brand": ["leica"]})[0]["product_id"] == 7
+
+
+def test_search_during_in_place_write_falls_back_to_lock(catalog):
+    _, queries, _ = catalog
+    store = make_store(catalog)
+    # An upsert rewriting visible rows leaves the counter odd until it is done
+    store._writes += 1
+    assert store.search(queries[0], top_k=3) == store.search(queries[0], top_k=3, exact=True)
+    store._writes += 1
+
+
+def test_qdrant_store_uses_query_api(catalog):
+    qdrant_client = pytest.importorskip("qdrant_client")
+    vectors, queries, payloads = catalog
+    store = QdrantVectorStore(qdrant_client.QdrantClient(":memory:"), "test_products")
+    store.initialize()
+    store.upsert(list(range(500)), vectors[:500], payloads[:500])
+
+    expected = exact_top((vectors[:500], queries, payloads[:500]), queries[0], 5)
+    assert [r["product_id"] for r in store.search(queries[0], top_k=5)] == expected
+    batch = store.search_batch(queries[:2], [5, 3], [None, {"brand": ["sony"]}])
+    assert [r["product_id"] for r in batch[0]] == expected
+    assert all(r["payload"]["brand"] == "sony" for r in batch[1]) and len(batch[1]) == 3
+    assert [r["product_id"] for r in asyncio.run(store.search_async(queries[0], top_k=5))] == expected
+
+
+def test_qdrant_store_refuses_servers_without_query_api():
+    class OldServer:
+        def info(self):
+            return type("VersionInfo", (), {"version": "1.3.0"})()
+
+    store = QdrantVectorStore(OldServer(), "products", vector_size=VECTOR_SIZE)
+    with pytest.raises(RuntimeError, match="1.10.0"):
+        store.initialize()
+
+
+def test_in_memory_store_round_trips_without_pickle(catalog, tmp_path):
+    vectors, queries, payloads = catalog
+    store = make_store((vectors[:300], queries, payloads[:300]), path=str(tmp_path), quantization="int8")
+    store.save()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["records.json", "vectors.npy"]
+
+    restored = InMemoryVectorStore(path=str(tmp_path), quantization="int8")
+    restored.initialize()
+    assert restored.count() == 300
+    assert restored.search(queries[0], top_k=5) == store.search(queries[0], top_k=5)
+
+    # A store saved by an older version is not unpickled
+    (tmp_path / "records.json").rename(tmp_path / "records.pkl")
+    legacy = InMemoryVectorStore(path=str(tmp_path))
+    legacy.initialize()
+    assert legacy.count() == 0
+
+
+def test_upsert_after_load_keeps_saved_rows_mapped(catalog, tmp_path):
+    vectors, queries, payloads = catalog
+    make_store((vectors[:2000], queries, payloads[:2000]), path=str(tmp_path), quantization="int8").save()
+    store = InMemoryVectorStore(path=str(tmp_path), quantization="int8")
+    store.initialize()
+
+    # One saved row rewritten, the rest of the catalog appended
+    store.upsert([7], queries[:1], [{"brand": "leica"}])
+    store.upsert(list(range(2000, ROWS)), vectors[2000:], payloads[2000:])
+    mapped = store._state.vectors
+    assert isinstance(mapped, SegmentedVectors) and isinstance(mapped.saved, np.memmap)
+    assert store.memory_usage()["originals_memory_mapped"]
+
+    expected = np.array(vectors)
+    expected[7] = queries[0]
+    for query in queries[:5]:
+        top = exact_top((expected, queries, payloads), query, 5)
+        assert [r["product_id"] for r in store.search(query, top_k=5, exact=True)] == top
+    assert store.search(queries[0], top_k=1)[0]["payload"] == {"brand": "leica"}
+
+    # Saving again writes the tail through and maps the whole matrix
+    store.save()
+    assert len(store._state.vectors.saved) == ROWS and len(store._state.vectors.tail) == 0
+    assert np.allclose(np.load(tmp_path / "vectors.npy")[7], queries[0] / np.linalg.norm(queries[0]))